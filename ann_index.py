@@ -0,0 +1,140 @@
+import os
+import json
+import math
+import numpy as np
+import faiss
+
+# Index type and tuning, selected through config.env
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # flat, ivf_flat, ivf_pq or hnsw
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = 4 * sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "48"))  # sub-quantizers; must divide the embedding dimension
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+INDEX_CONFIG_FILE = "index_config.json"
+
+# FAISS wants ~39 training points per centroid and 2^8 per PQ codebook
+MIN_POINTS_PER_CENTROID = 39
+PQ_NBITS = 8
+
+
+def resolve_config(index_type, n_vectors, dim):
+    """
+    Pick index parameters for a catalog of `n_vectors` embeddings.
+    Falls back to a simpler index type when there are too few vectors to train the requested one.
+
+    Returns:
+        dict: {"type": ..., "dim": ...} plus the parameters of that index type.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of {INDEX_TYPES}.")
+    config = {"type": index_type, "dim": dim}
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = IVF_NLIST or int(4 * math.sqrt(max(n_vectors, 1)))
+        nlist = min(nlist, n_vectors // MIN_POINTS_PER_CENTROID)
+        if nlist < 2:
+            print(f"Only {n_vectors} vectors: too few to train {index_type}, using a flat index.")
+            return {"type": "flat", "dim": dim}
+        config.update(nlist=nlist, nprobe=min(IVF_NPROBE, nlist))
+
+    if index_type == "ivf_pq":
+        if n_vectors < 2 ** PQ_NBITS * MIN_POINTS_PER_CENTROID // 4 or dim % PQ_M:
+            print(f"Cannot train PQ with m={PQ_M} on {n_vectors} {dim}-d vectors, using ivf_flat.")
+            config["type"] = "ivf_flat"
+        else:
+            config.update(m=PQ_M, nbits=PQ_NBITS)
+
+    if index_type == "hnsw":
+        config.update(M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH)
+    return config
+
+
+def create_index(config):
+    """Create an empty, untrained FAISS index of the configured type (L2 distance)."""
+    dim = config["dim"]
+    index_type = config["type"]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, config["nlist"])
+    elif index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, config["nlist"], config["m"], config["nbits"])
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config["M"])
+        index.hnsw.efConstruction = config["ef_construction"]
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'.")
+    return index
+
+
+def train_size(config):
+    """
+    Vectors to collect before training an index that is filled incrementally (0 if the type
+    needs no training): twice FAISS's minimum per IVF centroid, and enough for the PQ codebooks.
+    """
+    if "nlist" not in config:
+        return 0
+    size = 2 * MIN_POINTS_PER_CENTROID * config["nlist"]
+    if "nbits" in config:
+        size = max(size, 2 ** config["nbits"] * MIN_POINTS_PER_CENTROID)
+    return size
+
+
+def build_index(vectors, config):
+    """
+    Build, train and fill a FAISS index of the configured type (L2 distance).
+
+    Args:
+        vectors (np.ndarray): (n, dim) float32 embeddings.
+        config (dict): Output of resolve_config.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_index(config)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, config)
+    return index
+
+
+def apply_search_params(index, config):
+    """Set query-time parameters (nprobe, efSearch) from the saved config."""
+    if "nprobe" in config:
+        faiss.extract_index_ivf(index).nprobe = config["nprobe"]
+    if "ef_search" in config and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = config["ef_search"]
+    return index
+
+
+def supports_remove(index):
+    """
+    Whether LangChain's FAISS.delete can remove documents from this index. It maps docstore
+    ids to positions and expects remove_ids to shift later vectors down, which only a flat
+    index does (IVF removes leave the positions out of step, HNSW cannot remove at all);
+    every other type is rebuilt instead.
+    """
+    return isinstance(index, faiss.IndexFlat)
+
+
+def index_memory_bytes(index):
+    """Approximate resident size of an index, measured as its serialized size."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def save_config(index_dir, config):
+    with open(os.path.join(index_dir, INDEX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+
+def load_config(index_dir):
+    """Load the config of a saved index; indexes saved before this file existed are flat."""
+    path = os.path.join(index_dir, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        return {"type": "flat"}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
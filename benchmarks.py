@@ -0,0 +1,916 @@
+"""
+Benchmarks for the sales assistant's hot paths.
+
+Usage:
+    python benchmarks.py classifiers --texts 256 --batch-sizes 1 8 32
+    python benchmarks.py classifier-backends --backends torch torch-int8 onnx-int8
+    python benchmarks.py model-server --concurrency 1 8 32 --processes 4
+    python benchmarks.py prefilter --rows 100000
+    python benchmarks.py ann --rows 10000 100000 1000000
+    python benchmarks.py ingest --rows 20000 200000 --format csv
+    python benchmarks.py sheets --rows 200 --latency 0.3
+    python benchmarks.py db-pool --threads 1 2 4 8 16 32
+    python benchmarks.py crm-lookup --customers 50000 --interactions 3000000
+    python benchmarks.py crm --scales 10000 100000 1000000 --baseline crm_baseline.json
+    python benchmarks.py import --rows 20000 --batch-sizes 100 1000 5000
+    python benchmarks.py transcription --seconds 10 30 60 120
+"""
+import argparse
+import os
+import sys
+import random
+import time
+
+
+SAMPLE_UTTERANCES = [
+    "I'm looking for a family car under 8 lakhs.",
+    "That price is way too high, I saw the same model cheaper elsewhere.",
+    "Can you tell me more about the mileage of the diesel variant?",
+    "Great, I love the color and the interior, let's talk about the paperwork.",
+    "I'm not sure, my wife wants an automatic and this one is manual.",
+    "Why does a 2014 car with 90,000 km cost this much?",
+    "Do you offer any warranty or free servicing with second-hand cars?",
+    "Honestly I'm disappointed, the last dealer promised a discount and never delivered.",
+    "Is the seven-seater available for a test drive this weekend?",
+    "Okay.",
+]
+
+
+def _sample_texts(n_texts, seed=0):
+    """Build `n_texts` utterances of mixed length from the sample set."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_texts):
+        parts = rng.randint(1, 4)
+        texts.append(" ".join(rng.choice(SAMPLE_UTTERANCES) for _ in range(parts)))
+    return texts
+
+
+def benchmark_classifiers(n_texts=256, batch_sizes=(1, 8, 32), max_length=128):
+    """
+    Measure sentiment + tone throughput of utils.analyze_batch on CPU at several batch sizes.
+    """
+    from utils import analyze_batch
+
+    texts = _sample_texts(n_texts)
+    # Warm up so model loading and first-call overhead are not counted
+    analyze_batch(texts[:8], batch_size=8, max_length=max_length)
+
+    rows = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        analyze_batch(texts, batch_size=batch_size, max_length=max_length)
+        elapsed = time.perf_counter() - start
+        rows.append((batch_size, elapsed, n_texts / elapsed))
+
+    print(f"{'batch':>6} {'seconds':>10} {'texts/sec':>10}")
+    for batch_size, elapsed, throughput in rows:
+        print(f"{batch_size:>6} {elapsed:>10.2f} {throughput:>10.1f}")
+    return rows
+
+
+def _rss_mb():
+    """Resident memory of this process in MB (Linux /proc, else peak RSS from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def _measure_classifier_backend(backend, n_texts, batch_size, max_length, queue):
+    # Runs in a fresh process so each backend's memory is measured on its own
+    from classifier_backends import load_classifier, SENTIMENT_MODEL, TONE_MODEL
+
+    texts = _sample_texts(n_texts)
+    base_rss = _rss_mb()
+    start = time.perf_counter()
+    classifiers = [load_classifier(*SENTIMENT_MODEL, backend=backend), load_classifier(*TONE_MODEL, backend=backend)]
+    load_s = time.perf_counter() - start
+    kwargs = {"truncation": True, "max_length": max_length}
+    for classifier in classifiers:
+        classifier(texts[:8], batch_size=8, **kwargs)  # warm-up
+
+    latencies = []
+    for text in texts[:min(200, n_texts)]:
+        start = time.perf_counter()
+        for classifier in classifiers:
+            classifier([text], batch_size=1, **kwargs)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for classifier in classifiers:
+        classifier(texts, batch_size=batch_size, **kwargs)
+    throughput = n_texts / (time.perf_counter() - start)
+    queue.put({
+        "backend": backend, "load_s": load_s, "rss_mb": _rss_mb() - base_rss, **_percentiles(latencies),
+        "throughput": throughput,
+    })
+
+
+def benchmark_classifier_backends(backends=("torch", "torch-int8", "onnx-int8"), n_texts=256, batch_size=32, max_length=128):
+    """
+    Sentiment + tone latency per utterance (batch of 1), batch throughput and resident memory of
+    the models for each classifier backend. Each backend is measured in its own process.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for backend in backends:
+        queue = context.Queue()
+        process = context.Process(target=_measure_classifier_backend, args=(backend, n_texts, batch_size, max_length, queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{backend}: failed (exit code {process.exitcode})")
+            continue
+        rows.append(queue.get())
+
+    print(f"{'backend':<11} {'load s':>7} {'model MB':>9} {'p50 ms':>7} {'p99 ms':>7} {'texts/sec':>10}")
+    for row in rows:
+        print(f"{row['backend']:<11} {row['load_s']:>7.1f} {row['rss_mb']:>9.0f} {row['p50_ms']:>7.1f} "
+              f"{row['p99_ms']:>7.1f} {row['throughput']:>10.1f}")
+    return rows
+
+
+def benchmark_model_server(concurrency=(1, 8, 32), requests_per_worker=50, processes=4, max_wait_ms=5.0, stub=False):
+    """
+    Per-utterance sentiment + tone latency (p50/p99) and throughput under concurrent load:
+    in-process classifiers shared by the threads (one Streamlit process today) against the
+    shared model server with micro-batching. Also compares model memory for `processes`
+    Streamlit processes. With `stub`, timed stand-ins replace the real models on both sides.
+    """
+    import tempfile
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor
+    import model_server
+
+    texts = _sample_texts(max(concurrency) * requests_per_worker)
+    socket_path = os.path.join(tempfile.mkdtemp(), "models.sock")
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_server.py"),
+               "--socket", socket_path, "--max-wait-ms", str(max_wait_ms)] + (["--stub"] if stub else [])
+    server = subprocess.Popen(command)
+    try:
+        client = model_server.ModelClient(socket_path)
+        while True:
+            try:
+                client.ping()
+                break
+            except model_server.ModelServerError:
+                if server.poll() is not None:
+                    raise
+                time.sleep(0.2)
+
+        base_rss = _rss_mb()
+        if stub:
+            local = {
+                "sentiment": model_server.StubClassifier(["POSITIVE", "NEGATIVE"]),
+                "tone": model_server.StubClassifier(["joy", "neutral", "anger"]),
+            }
+        else:
+            from classifier_backends import load_classifier, SENTIMENT_MODEL, TONE_MODEL
+
+            local = {"sentiment": load_classifier(*SENTIMENT_MODEL), "tone": load_classifier(*TONE_MODEL)}
+        local_mb = _rss_mb() - base_rss
+        remote = {task: model_server.RemoteClassifier(task, client) for task in local}
+
+        def run(classifiers, workers):
+            latencies = []
+
+            def worker(i):
+                for j in range(requests_per_worker):
+                    text = texts[(i * requests_per_worker + j) % len(texts)]
+                    start = time.perf_counter()
+                    for task in ("sentiment", "tone"):
+                        classifiers[task]([text], batch_size=1, truncation=True, max_length=128)
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(worker, range(workers)))
+            return _percentiles(latencies), workers * requests_per_worker / (time.perf_counter() - start)
+
+        for classifiers in (local, remote):  # warm-up
+            run(classifiers, 1)
+
+        print(f"{'mode':<11} {'workers':>7} {'p50 ms':>8} {'p99 ms':>8} {'utterances/s':>13}")
+        for workers in concurrency:
+            for mode, classifiers in (("in-process", local), ("server", remote)):
+                stats, throughput = run(classifiers, workers)
+                print(f"{mode:<11} {workers:>7} {stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f} {throughput:>13.1f}")
+
+        info = client.ping()
+        print(f"\nBatching: {info['batchers']}")
+        print(f"Classifier memory for {processes} Streamlit processes: in-process {local_mb:.0f} MB each "
+              f"({processes * local_mb:.0f} MB total); model server {info['rss_mb']:.0f} MB shared "
+              f"(embedder included once loaded)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _synthetic_catalog(rows, seed=0):
+    """Random catalog with the structured columns used by catalog_filter."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Price": rng.gamma(2.0, 4.0, rows).round(2),
+        "Year": rng.integers(2005, 2021, rows),
+        "Kilometers_Driven": rng.integers(5000, 200000, rows),
+        "Seats": rng.choice([4, 5, 7, 8], rows, p=[0.1, 0.7, 0.15, 0.05]),
+        "Fuel_Type": rng.choice(["Diesel", "Petrol", "CNG", "LPG", "Electric"], rows, p=[0.45, 0.45, 0.06, 0.02, 0.02]),
+        "Transmission": rng.choice(["Manual", "Automatic"], rows, p=[0.7, 0.3]),
+        "Location": rng.choice(["Mumbai", "Pune", "Chennai", "Delhi", "Kochi", "Jaipur"], rows),
+    })
+
+
+def _synthetic_products(rows, seed=0):
+    """_synthetic_catalog plus the text-only columns: every column the product ingest requires."""
+    import numpy as np
+
+    catalog = _synthetic_catalog(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    catalog["Name"] = rng.choice(["Maruti Swift VDI", "Hyundai i20 Asta 1.2", "Honda City 1.5 V MT",
+                                  "Toyota Innova Crysta 2.8 ZX", "Mahindra XUV500 W8", "Tata Nexon XZ Plus"], rows)
+    catalog["Owner_Type"] = rng.choice(["First", "Second", "Third"], rows, p=[0.8, 0.15, 0.05])
+    catalog["Mileage"] = [f"{value:.1f} kmpl" for value in rng.uniform(10, 28, rows)]
+    catalog["Engine"] = [f"{value} CC" for value in rng.choice([998, 1197, 1248, 1498, 1995, 2755], rows)]
+    catalog["Power"] = [f"{value:.1f} bhp" for value in rng.uniform(60, 180, rows)]
+    catalog.loc[rng.random(rows) < 0.01, "Seats"] = np.nan  # missing values turn the column to float
+    return catalog
+
+
+def benchmark_ingest(row_counts=(20000, 200000), file_format="csv", chunk_rows=5000, end_to_end=False):
+    """
+    Rows/s and peak Python memory of preparing the catalog for embedding (read, product text,
+    row keys, content hashes, and the key -> hash manifest built from them): the whole-file read with a per-row apply(axis=1) against the
+    chunked reader with column-wise text. With `end_to_end`, also times a full
+    indexing.ingest_product_data run (loads the real embedding model) into a temporary index.
+    """
+    import hashlib
+    import tempfile
+    import tracemalloc
+    import pandas as pd
+    from catalog_source import ROW_KEY_COLUMNS, read_catalog_chunks, product_texts, row_keys
+
+    def whole_file(path):
+        # The ingest before chunking: the catalog in one DataFrame, product text built per row
+        data = {"csv": pd.read_csv, "parquet": pd.read_parquet, "xlsx": pd.read_excel}[file_format](path)
+        texts = data.apply(
+            lambda row: (
+                f"Name: {row['Name']} | Location: {row['Location']} | Year: {row['Year']} | "
+                f"Kilometers Driven: {row['Kilometers_Driven']} | Fuel Type: {row['Fuel_Type']} | "
+                f"Transmission: {row['Transmission']} | Owner Type: {row['Owner_Type']} | "
+                f"Mileage: {row['Mileage']} | Engine: {row['Engine']} | Power: {row['Power']} | "
+                f"Seats: {row['Seats']} | Price: {row['Price']} lakhs"
+            ),
+            axis=1
+        ).tolist()
+        base = data[ROW_KEY_COLUMNS].astype(str).agg("|".join, axis=1)
+        seen, keys = {}, []
+        for value in base:
+            seen[value] = seen.get(value, 0) + 1
+            keys.append(f"{value}#{seen[value]}")
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        return len(dict(zip(keys, hashes)))
+
+    def chunked(path):
+        manifest, seen = {}, {}
+        for chunk in read_catalog_chunks(path, chunk_rows):
+            texts = product_texts(chunk)
+            keys = row_keys(chunk, seen)
+            manifest.update(zip(keys, [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]))
+        return len(manifest)
+
+    print(f"{'rows':>8} {'preparation':<26} {'rows/s':>9} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in row_counts:
+            path = os.path.join(tmp, f"catalog_{rows}.{file_format}")
+            catalog = _synthetic_products(rows)
+            if file_format == "csv":
+                catalog.to_csv(path, index=False)
+            elif file_format == "parquet":
+                catalog.to_parquet(path, index=False)
+            else:
+                catalog.to_excel(path, index=False)
+            del catalog
+
+            for label, prepare in (("whole file + apply(axis=1)", whole_file), (f"chunks of {chunk_rows}", chunked)):
+                start = time.perf_counter()
+                prepare(path)
+                elapsed = time.perf_counter() - start
+                # Separate run: tracemalloc slows the Python-level work down
+                tracemalloc.start()
+                prepare(path)
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                print(f"{rows:>8} {label:<26} {rows / elapsed:>9.0f} {peak:>8.1f}")
+
+            if end_to_end:
+                import indexing
+
+                start = time.perf_counter()
+                indexing.ingest_product_data(path, os.path.join(tmp, f"index_{rows}"), chunk_rows=chunk_rows, resume=False)
+                elapsed = time.perf_counter() - start
+                print(f"{rows:>8} {'end-to-end ingest':<26} {rows / elapsed:>9.0f} {'':>8}")
+
+
+def benchmark_prefilter(rows=100000, dim=768, n_queries=50, k=10):
+    """
+    Compare plain FAISS search against attribute pre-filtering + selector search and
+    post-filtering with over-fetch, for questions of different selectivity.
+    """
+    import numpy as np
+    import faiss
+    from catalog_filter import AttributeIndex, extract_constraints, search_positions
+
+    catalog = _synthetic_catalog(rows)
+    ids = [str(i) for i in range(rows)]
+    attribute_index = AttributeIndex.from_dataframe(catalog, ids).bind(dict(enumerate(ids)))
+
+    rng = np.random.default_rng(1)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.standard_normal((rows, dim)).astype(np.float32))
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+
+    questions = [
+        "diesel car",
+        "diesel automatic under 8 lakhs",
+        "7 seater automatic after 2018 in Pune under 10 lakhs",
+    ]
+
+    def per_query_ms(func):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        return (time.perf_counter() - start) / n_queries * 1000
+
+    print(f"{rows} rows, {dim}-d, k={k}")
+    print(f"{'question':<55} {'match':>7} {'filter ms':>10} {'plain ms':>9} {'selector ms':>12} {'post ms':>8}")
+    for question in questions:
+        constraints = extract_constraints(question, attribute_index.locations)
+        start = time.perf_counter()
+        for _ in range(n_queries):
+            positions = attribute_index.candidate_positions(constraints)
+        filter_ms = (time.perf_counter() - start) / n_queries * 1000
+
+        plain_ms = per_query_ms(lambda q: search_positions(index, q, k))
+        selector_ms = per_query_ms(lambda q: search_positions(index, q, k, positions))
+        post_ms = per_query_ms(lambda q: search_positions(index, q, k, positions, use_selector=False))
+        print(f"{question:<55} {len(positions):>7} {filter_ms:>10.2f} {plain_ms:>9.2f} {selector_ms:>12.2f} {post_ms:>8.2f}")
+
+
+def _clustered_vectors(rows, dim, n_clusters=256, seed=0):
+    """Synthetic embeddings drawn around random centroids, closer to real text embeddings than pure noise."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, n_clusters, rows)]
+    vectors += 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors
+
+
+def benchmark_ann(row_counts=(10000, 100000), dim=768, n_queries=200, k=10, index_types=None):
+    """
+    Build each ANN index type on synthetic catalogs and report recall@k against the
+    exact flat index, queries/sec, build time and index memory.
+    """
+    import numpy as np
+    import ann_index
+
+    index_types = index_types or ann_index.INDEX_TYPES
+    print(f"{'rows':>9} {'index':>9} {'build s':>8} {'QPS':>9} {'recall@' + str(k):>10} {'memory MB':>10}")
+    for rows in row_counts:
+        vectors = _clustered_vectors(rows, dim)
+        queries = _clustered_vectors(n_queries, dim, seed=1)
+        truth = None
+        for index_type in ["flat"] + [t for t in index_types if t != "flat"]:
+            config = ann_index.resolve_config(index_type, rows, dim)
+            start = time.perf_counter()
+            index = ann_index.build_index(vectors, config)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            qps = n_queries / (time.perf_counter() - start)
+            if truth is None:
+                truth = found
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            memory_mb = ann_index.index_memory_bytes(index) / 2 ** 20
+            print(f"{rows:>9} {config['type']:>9} {build_s:>8.2f} {qps:>9.0f} {recall:>10.3f} {memory_mb:>10.1f}")
+            del index
+
+
+def benchmark_sheets_writer(n_rows=200, latency=0.3, batch_size=50):
+    """
+    Compare per-turn latency of a synchronous append_row against enqueueing into the
+    spooled SheetsWriter, using a FakeSheet that sleeps `latency` seconds per API call.
+    """
+    import os
+    import tempfile
+    from sheets_writer import SheetsWriter, FakeSheet
+
+    row = ["sam", "Customer", "Car A: 5 lakhs", "negotiating", "joy", "POSITIVE", "notes", "2024-01-01 00:00:00"]
+
+    direct_sheet = FakeSheet(latency=latency)
+    direct_rows = max(1, min(n_rows, int(10 / latency) if latency else n_rows))
+    start = time.perf_counter()
+    for _ in range(direct_rows):
+        direct_sheet.append_row(row)
+    direct_ms = (time.perf_counter() - start) / direct_rows * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet = FakeSheet(latency=latency)
+        writer = SheetsWriter(lambda: sheet, spool_path=os.path.join(tmp, "spool.db"),
+                              batch_size=batch_size, flush_interval=0.5).start()
+        start = time.perf_counter()
+        for _ in range(n_rows):
+            writer.enqueue(row)
+        enqueue_ms = (time.perf_counter() - start) / n_rows * 1000
+        while writer.pending():
+            time.sleep(0.05)
+        drain_s = time.perf_counter() - start
+        writer.stop(flush=False)
+
+    print(f"sync append_row:   {direct_ms:8.2f} ms per turn ({direct_rows} rows, {direct_rows} API calls)")
+    print(f"spooled enqueue:   {enqueue_ms:8.2f} ms per turn ({n_rows} rows, {sheet.calls} API calls)")
+    print(f"spool drained in:  {drain_s:8.2f} s")
+
+
+def benchmark_db_pool(thread_counts=(1, 2, 4, 8, 16, 32), ops_per_thread=500, db_path="SalesCRM.db"):
+    """
+    Compare opening a new SQLite connection per call (the old get_db_connection) against
+    the pooled connections in db.py, running customer lookups from concurrent threads.
+    Works on a temporary copy of the database.
+    """
+    import shutil
+    import sqlite3
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from db import ConnectionPool
+
+    query = "SELECT CustomerID, Name, Email, Phone FROM Customers WHERE Name = ?"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = shutil.copy(db_path, tmp)
+        names = [row[0] for row in sqlite3.connect(path).execute("SELECT Name FROM Customers")] or ["Nobody"]
+
+        def per_call(i):
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute(query, (names[i % len(names)],)).fetchone()
+            conn.close()
+
+        def run(worker, threads):
+            def loop(_):
+                for i in range(ops_per_thread):
+                    worker(i)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(loop, range(threads)))
+            return threads * ops_per_thread / (time.perf_counter() - start)
+
+        print(f"{'threads':>8} {'per-call ops/s':>15} {'pooled ops/s':>13} {'speedup':>8}")
+        for threads in thread_counts:
+            pool = ConnectionPool(path, max_connections=threads)
+
+            def pooled(i):
+                with pool.connection() as conn:
+                    conn.execute(query, (names[i % len(names)],)).fetchone()
+
+            per_call_ops = run(per_call, threads)
+            pooled_ops = run(pooled, threads)
+            pool.close_all()
+            print(f"{threads:>8} {per_call_ops:>15.0f} {pooled_ops:>13.0f} {pooled_ops / per_call_ops:>7.1f}x")
+
+
+LEGACY_CUSTOMER_QUERY = """
+SELECT c.CustomerID, c.Name, c.Email, c.Phone,
+       ih.LastDealStatus, ih.InteractionDate, ih.Notes, ih.Sentiment, ih.Tone, ih.Intention, r.RecommendedDeal
+FROM Customers c
+LEFT JOIN InteractionHistory ih ON c.CustomerID = ih.CustomerID
+LEFT JOIN Recommendations r ON c.CustomerID = r.CustomerID
+WHERE c.Name = ?
+ORDER BY ih.InteractionDate DESC, r.Date DESC
+LIMIT 1
+"""
+
+# The Customer Info page's query before it was paginated: every customer with every interaction
+LEGACY_CUSTOMER_LIST_QUERY = """
+SELECT c.CustomerID, c.Name, c.Email, c.Phone,
+       ih.LastDealStatus, ih.InteractionDate, ih.Notes,
+       ih.Sentiment, ih.Tone, ih.Intention
+FROM Customers c
+LEFT JOIN InteractionHistory ih ON c.CustomerID = ih.CustomerID
+ORDER BY c.Name
+"""
+
+
+def benchmark_crm_lookup(n_customers=50000, n_interactions=3000000, n_recommendations=500000, n_lookups=10):
+    """
+    fetch_customer_data latency before and after migration 2: the old join-and-sort query on the
+    unindexed schema against the per-customer latest-row lookups on the indexed schema.
+    """
+    import os
+    import sqlite3
+    import tempfile
+    from crm_database_create import migrate, LATEST_VERSION
+    from db import CUSTOMER_QUERY
+
+    rng = random.Random(0)
+
+    def timestamp():
+        return f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_crm.db")
+        migrate(path, target=1)
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO Customers (Name, Email, Phone) VALUES (?, ?, ?)",
+            ((f"Customer {i}", f"customer{i}@example.com", f"{9000000000 + i}") for i in range(n_customers)),
+        )
+        conn.executemany(
+            "INSERT INTO InteractionHistory (CustomerID, LastDealStatus, InteractionDate, Notes, Sentiment, Tone, Intention) "
+            "VALUES (?, 'Open', ?, 'Asked about the price.', 'Neutral', 'calm', 'Inquiry')",
+            ((rng.randint(1, n_customers), timestamp()) for _ in range(n_interactions)),
+        )
+        conn.executemany(
+            "INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date) VALUES (?, 'Maruti Swift VDI', ?)",
+            ((rng.randint(1, n_customers), timestamp()) for _ in range(n_recommendations)),
+        )
+        conn.commit()
+        print(f"Generated {n_customers} customers, {n_interactions} interactions and "
+              f"{n_recommendations} recommendations in {time.perf_counter() - start:.1f}s")
+
+        names = [f"Customer {rng.randrange(n_customers)}" for _ in range(n_lookups)]
+
+        def measure(label, query):
+            start = time.perf_counter()
+            rows = [conn.execute(query, (name,)).fetchone() for name in names]
+            elapsed = (time.perf_counter() - start) / len(names)
+            print(f"{label:<32} {elapsed * 1000:>10.2f} ms/lookup")
+            return rows
+
+        before = measure("before (no indexes, join)", LEGACY_CUSTOMER_QUERY)
+        measure("new query, no indexes", CUSTOMER_QUERY)
+        conn.close()
+
+        start = time.perf_counter()
+        migrate(path, target=LATEST_VERSION)
+        print(f"Migration to version {LATEST_VERSION} took {time.perf_counter() - start:.1f}s")
+
+        conn = sqlite3.connect(path)
+        measure("old query, indexed", LEGACY_CUSTOMER_QUERY)
+        after = measure("after (indexed, latest lookups)", CUSTOMER_QUERY)
+        # The latest interaction must match; the old query's recommendation is arbitrary under ties
+        mismatches = sum(b[:10] != a[:10] for b, a in zip(before, after))
+        print(f"Latest-interaction mismatches between old and new query: {mismatches}")
+        conn.close()
+
+
+def _percentiles(samples):
+    import numpy as np
+
+    ms = np.asarray(samples) * 1000
+    return {
+        "samples": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def benchmark_crm(scales=(10000, 100000, 1000000), interactions=3, recommendations=1, samples=200,
+                  full_scan_samples=5, data_dir=None, baseline_path="crm_baseline.json",
+                  update_baseline=False, tolerance=0.25, min_delta_ms=1.0):
+    """
+    Latency percentiles of the db.py data-access functions on synthetic CRM databases.
+
+    Each scale is a number of customers, generated once per `data_dir` with crm_generator and
+    copied before every run so write benchmarks never change the source data. Results are
+    compared against the p50/p95 in `baseline_path`, which is written when missing or when
+    `update_baseline` is set. A metric regresses when it is more than `tolerance` slower and
+    at least `min_delta_ms` slower, so timer noise on sub-millisecond lookups is ignored.
+
+    Returns:
+        list: (scale, function, metric, baseline, current) for every regression.
+    """
+    import os
+    import json
+    import shutil
+    import sqlite3
+    import platform
+    import tempfile
+    import pandas as pd
+    import db
+    from crm_generator import generate_crm_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        results = {}
+        for scale in scales:
+            source = os.path.join(data_dir, f"crm_{scale}_{interactions}x{recommendations}.db")
+            if not os.path.exists(source):
+                start = time.perf_counter()
+                generate_crm_database(source, scale, interactions, recommendations)
+                print(f"Generated {scale} customers in {time.perf_counter() - start:.1f}s")
+            path = os.path.join(tmp, "crm_run.db")
+            shutil.copyfile(source, path)
+
+            db.pool.close_all()
+            db.pool = db.ConnectionPool(path)  # The data-access functions use the module pool
+            rng = random.Random(scale)
+            names = [row[0] for row in sqlite3.connect(path).execute(
+                "SELECT Name FROM Customers WHERE CustomerID IN (%s)" % ",".join(
+                    str(rng.randint(1, scale)) for _ in range(samples)))]
+
+            timings = {name: [] for name in (
+                "fetch_customer_data", "fetch_customer_page", "add_customer_to_db", "update_customer_interaction",
+                "legacy_customer_list")}
+            for i in range(samples):
+                start = time.perf_counter()
+                db.fetch_customer_data(names[i % len(names)])
+                timings["fetch_customer_data"].append(time.perf_counter() - start)
+
+                # A page at a random depth of the Customer Info list
+                start = time.perf_counter()
+                db.fetch_customer_page(after=(names[i % len(names)], 0))
+                timings["fetch_customer_page"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.update_customer_interaction(
+                    rng.randint(1, scale), "Active", "Followed up on the quote.", "Maruti Swift VDI",
+                    "POSITIVE", "joy", "Purchase")
+                timings["update_customer_interaction"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.add_customer_to_db(
+                    f"Bench Customer {i}", f"bench{i}@example.com", "9000000000",
+                    "NEGATIVE", "neutral", "Inquiry", "New lead from the benchmark.", "Hyundai i20 Asta")
+                timings["add_customer_to_db"].append(time.perf_counter() - start)
+
+            for _ in range(full_scan_samples):
+                start = time.perf_counter()
+                with db.pool.connection() as conn:
+                    pd.read_sql_query(LEGACY_CUSTOMER_LIST_QUERY, conn)
+                timings["legacy_customer_list"].append(time.perf_counter() - start)
+            db.pool.close_all()
+
+            results[str(scale)] = {name: _percentiles(values) for name, values in timings.items()}
+            print(f"\n{scale} customers ({interactions} interactions, {recommendations} recommendations each)")
+            print(f"{'function':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for name, stats in results[str(scale)].items():
+                print(f"{name:<30} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+    regressions = []
+    if os.path.exists(baseline_path) and not update_baseline:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        for scale, functions in results.items():
+            for name, stats in functions.items():
+                for metric in ("p50_ms", "p95_ms"):
+                    old = baseline.get(scale, {}).get(name, {}).get(metric)
+                    if old and stats[metric] > old * (1 + tolerance) and stats[metric] - old >= min_delta_ms:
+                        regressions.append((scale, name, metric, old, stats[metric]))
+        for scale, name, metric, old, new in regressions:
+            print(f"REGRESSION {name} @ {scale}: {metric} {old:.2f} -> {new:.2f} ms")
+        print(f"{len(regressions)} regressions against {baseline_path} (tolerance {tolerance:.0%})")
+    else:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {"interactions": interactions, "recommendations": recommendations, "samples": samples},
+                "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                                "machine": platform.machine()},
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    return regressions
+
+
+def benchmark_import(n_rows=20000, batch_sizes=(100, 1000, 5000), n_single=2000, threads=8):
+    """
+    Customer creation throughput: add_customer_to_db one row at a time, concurrent
+    add_customer_to_db from several threads (checking IDs never collide), and the batched
+    CSV import at several batch sizes. Each run uses a fresh database.
+    """
+    import os
+    import csv
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    import db
+    import crm_generator
+    from crm_database_create import migrate
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "customers.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(db.IMPORT_COLUMNS)
+            for i in range(n_rows):
+                first, last = rng.choice(crm_generator.FIRST_NAMES), rng.choice(crm_generator.LAST_NAMES)
+                writer.writerow([
+                    f"{first} {last} {i}", f"{first.lower()}{i}@example.com", f"9{rng.randrange(10 ** 9):09d}",
+                    rng.choice(list(crm_generator.DEAL_STATUSES)), "2024-06-01 10:00:00",
+                    crm_generator._make_note(rng, 600), rng.choice(list(crm_generator.SENTIMENTS)),
+                    rng.choice(list(crm_generator.TONES)), rng.choice(list(crm_generator.INTENTIONS)),
+                    f"I recommend the {rng.choice(crm_generator.CARS)}.", "2024-06-01 10:00:00",
+                ])
+
+        def fresh_db(name):
+            path = os.path.join(tmp, name)
+            migrate(path)
+            db.pool.close_all()
+            db.pool = db.ConnectionPool(path)  # The data-access functions use the module pool
+            return path
+
+        def add(i):
+            return db.add_customer_to_db(f"Single {i}", None, None, "POSITIVE", "joy", "Purchase",
+                                         "Walk-in customer.", "Maruti Swift VDI")
+
+        print(f"{'method':<36} {'rows':>7} {'seconds':>8} {'rows/s':>9}")
+        fresh_db("single.db")
+        start = time.perf_counter()
+        for i in range(n_single):
+            add(i)
+        elapsed = time.perf_counter() - start
+        print(f"{'add_customer_to_db (1 thread)':<36} {n_single:>7} {elapsed:>8.2f} {n_single / elapsed:>9.0f}")
+
+        fresh_db("concurrent.db")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            ids = list(executor.map(add, range(n_single)))
+        elapsed = time.perf_counter() - start
+        label = f"add_customer_to_db ({threads} threads)"
+        print(f"{label:<36} {n_single:>7} {elapsed:>8.2f} {n_single / elapsed:>9.0f}"
+              f"   {len(set(ids))} unique IDs")
+
+        for batch_size in batch_sizes:
+            fresh_db(f"import_{batch_size}.db")
+            start = time.perf_counter()
+            report = db.import_customers_csv(csv_path, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            label = f"import_customers_csv (batch {batch_size})"
+            print(f"{label:<36} {report['customers']:>7} {elapsed:>8.2f} {report['customers'] / elapsed:>9.0f}")
+        db.pool.close_all()
+
+
+def benchmark_transcription(clip_seconds=(10, 30, 60, 120), wav_path="temp_audio.wav", latency=0.4,
+                            real_time_factor=0.1, workers=4):
+    """
+    Transcription latency against clip length: the whole clip in one request (the old path)
+    against silence-split segments transcribed concurrently. Clips are built by repeating
+    `wav_path` with short pauses; a StubBackend mimics the recognizer's request latency.
+    """
+    import io
+    import wave
+    import numpy as np
+    import transcription
+
+    with open(wav_path, "rb") as f:
+        samples, rate = transcription.decode_wav(f.read())
+    pause = np.zeros(int(rate * 0.8), dtype=np.float32)
+    backend = transcription.StubBackend(latency=latency, real_time_factor=real_time_factor)
+
+    print(f"{'clip s':>7} {'segments':>9} {'prep ms':>8} {'single s':>9} {'chunked s':>10} {'speedup':>8}")
+    for seconds in clip_seconds:
+        repeats = int(np.ceil(seconds * rate / (len(samples) + len(pause))))
+        clip = np.concatenate([np.concatenate([samples, pause])] * repeats)[: int(seconds * rate)]
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(transcription.to_pcm16(clip))
+        data = buffer.getvalue()
+
+        start = time.perf_counter()
+        mono = transcription.resample(*transcription.decode_wav(data))
+        segments = transcription.split_on_silence(mono)
+        prep_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        backend.transcribe(mono)
+        single_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        transcription.transcribe_bytes(data, backend=backend, max_workers=workers)
+        chunked_s = time.perf_counter() - start
+        print(f"{seconds:>7} {len(segments):>9} {prep_ms:>8.1f} {single_s:>9.2f} {chunked_s:>10.2f} {single_s / chunked_s:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the AI sales assistant.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    classifiers = subparsers.add_parser("classifiers", help="Sentiment + tone batch throughput")
+    classifiers.add_argument("--texts", type=int, default=256)
+    classifiers.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    classifiers.add_argument("--max-length", type=int, default=128)
+    classifiers.set_defaults(run=lambda args: benchmark_classifiers(args.texts, args.batch_sizes, args.max_length))
+
+    backends = subparsers.add_parser("classifier-backends", help="Latency, throughput and memory per classifier backend")
+    backends.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx-int8"])
+    backends.add_argument("--texts", type=int, default=256)
+    backends.add_argument("--batch-size", type=int, default=32)
+    backends.add_argument("--max-length", type=int, default=128)
+    backends.set_defaults(run=lambda args: benchmark_classifier_backends(
+        args.backends, args.texts, args.batch_size, args.max_length))
+
+    server = subparsers.add_parser("model-server", help="In-process classifiers vs the shared model server under load")
+    server.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent client threads")
+    server.add_argument("--requests", type=int, default=50, help="Utterances per thread")
+    server.add_argument("--processes", type=int, default=4, help="Streamlit processes to project memory for")
+    server.add_argument("--max-wait-ms", type=float, default=5.0)
+    server.add_argument("--stub", action="store_true", help="Timed stand-ins instead of the real models")
+    server.set_defaults(run=lambda args: benchmark_model_server(
+        args.concurrency, args.requests, args.processes, args.max_wait_ms, args.stub))
+
+    prefilter = subparsers.add_parser("prefilter", help="Attribute pre-filter + vector search latency")
+    prefilter.add_argument("--rows", type=int, default=100000)
+    prefilter.add_argument("--dim", type=int, default=768)
+    prefilter.add_argument("--queries", type=int, default=50)
+    prefilter.set_defaults(run=lambda args: benchmark_prefilter(args.rows, args.dim, args.queries))
+
+    ann = subparsers.add_parser("ann", help="Recall/latency/memory of the FAISS index types")
+    ann.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ann.add_argument("--dim", type=int, default=768)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--types", nargs="+", default=None, help="Subset of flat ivf_flat ivf_pq hnsw")
+    ann.set_defaults(run=lambda args: benchmark_ann(args.rows, args.dim, args.queries, index_types=args.types))
+
+    ingest = subparsers.add_parser("ingest", help="Catalog ingest rows/s: whole-file apply vs chunked column-wise text")
+    ingest.add_argument("--rows", type=int, nargs="+", default=[20000, 200000])
+    ingest.add_argument("--format", choices=["csv", "parquet", "xlsx"], default="csv")
+    ingest.add_argument("--chunk-rows", type=int, default=5000)
+    ingest.add_argument("--end-to-end", action="store_true", help="Also run the full ingest with the embedding model")
+    ingest.set_defaults(run=lambda args: benchmark_ingest(args.rows, args.format, args.chunk_rows, args.end_to_end))
+
+    sheets = subparsers.add_parser("sheets", help="Spooled Sheets writer vs synchronous append_row")
+    sheets.add_argument("--rows", type=int, default=200)
+    sheets.add_argument("--latency", type=float, default=0.3, help="Fake Sheets API latency in seconds")
+    sheets.add_argument("--batch-size", type=int, default=50)
+    sheets.set_defaults(run=lambda args: benchmark_sheets_writer(args.rows, args.latency, args.batch_size))
+
+    db_pool = subparsers.add_parser("db-pool", help="Per-call SQLite connections vs the connection pool")
+    db_pool.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    db_pool.add_argument("--ops", type=int, default=500, help="Queries per thread")
+    db_pool.add_argument("--db", default="SalesCRM.db")
+    db_pool.set_defaults(run=lambda args: benchmark_db_pool(args.threads, args.ops, args.db))
+
+    crm_lookup = subparsers.add_parser("crm-lookup", help="fetch_customer_data before/after the index migration")
+    crm_lookup.add_argument("--customers", type=int, default=50000)
+    crm_lookup.add_argument("--interactions", type=int, default=3000000)
+    crm_lookup.add_argument("--recommendations", type=int, default=500000)
+    crm_lookup.add_argument("--lookups", type=int, default=10)
+    crm_lookup.set_defaults(run=lambda args: benchmark_crm_lookup(
+        args.customers, args.interactions, args.recommendations, args.lookups))
+
+    crm = subparsers.add_parser("crm", help="Data-access latency percentiles on synthetic CRM data vs a JSON baseline")
+    crm.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000], help="Customers per run")
+    crm.add_argument("--interactions", type=int, default=3, help="Interactions per customer")
+    crm.add_argument("--recommendations", type=int, default=1, help="Recommendations per customer")
+    crm.add_argument("--samples", type=int, default=200)
+    crm.add_argument("--full-scan-samples", type=int, default=5, help="Runs of the unpaginated customer list query")
+    crm.add_argument("--data-dir", default=None, help="Keep generated databases here for reuse")
+    crm.add_argument("--baseline", default="crm_baseline.json")
+    crm.add_argument("--update-baseline", action="store_true")
+    crm.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    crm.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    crm.set_defaults(run=lambda args: sys.exit(1 if benchmark_crm(
+        args.scales, args.interactions, args.recommendations, args.samples, args.full_scan_samples,
+        args.data_dir, args.baseline, args.update_baseline, args.tolerance, args.min_delta_ms) else 0))
+
+    bulk_import = subparsers.add_parser("import", help="Customer creation and bulk CSV import throughput")
+    bulk_import.add_argument("--rows", type=int, default=20000, help="Rows in the generated CSV")
+    bulk_import.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    bulk_import.add_argument("--single", type=int, default=2000, help="Rows added one at a time")
+    bulk_import.add_argument("--threads", type=int, default=8)
+    bulk_import.set_defaults(run=lambda args: benchmark_import(args.rows, args.batch_sizes, args.single, args.threads))
+
+    speech = subparsers.add_parser("transcription", help="Whole-clip vs chunked concurrent transcription latency")
+    speech.add_argument("--seconds", type=int, nargs="+", default=[10, 30, 60, 120], help="Clip lengths")
+    speech.add_argument("--wav", default="temp_audio.wav")
+    speech.add_argument("--latency", type=float, default=0.4, help="Stub recognizer latency per request (s)")
+    speech.add_argument("--real-time-factor", type=float, default=0.1, help="Stub seconds per second of audio")
+    speech.add_argument("--workers", type=int, default=4)
+    speech.set_defaults(run=lambda args: benchmark_transcription(
+        args.seconds, args.wav, args.latency, args.real_time_factor, args.workers))
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+ATTRIBUTES_FILE = "attributes.npz"
+
+NUMERIC_COLUMNS = {"price": "Price", "year": "Year", "km": "Kilometers_Driven", "seats": "Seats"}
+CATEGORICAL_COLUMNS = {"fuel": "Fuel_Type", "transmission": "Transmission", "location": "Location"}
+
+FUEL_TYPES = ["diesel", "petrol", "cng", "lpg", "electric"]
+TRANSMISSIONS = {"automatic": "automatic", "auto": "automatic", "manual": "manual"}
+
+_NUMBER = r"(\d+(?:\.\d+)?)(?![\d.])"
+_PRICE_UNIT = r"\s*(?:lakhs?|lacs?|l)\b"
+_UPPER = r"(?:under|below|less than|within|upto|up to|max(?:imum)?|not more than|budget(?: of)?|at most)"
+_LOWER = r"(?:above|over|more than|at least|min(?:imum)?|starting)"
+# A whole four-digit year, not the start of a longer number or a kilometer figure
+_YEAR = r"\b((?:19|20)\d\d)\b(?!\s*k?\s*(?:km|kms|kilomet))"
+
+
+def _lakhs(value, unit):
+    """Convert a price mention to lakhs; bare numbers >= 10000 are read as rupees."""
+    value = float(value)
+    if unit:
+        return value
+    return value / 100000 if value >= 10000 else None
+
+
+def extract_constraints(text, locations=()):
+    """
+    Extract hard filters (price, year, kilometers, fuel, transmission, seats, location)
+    from a free-text customer question.
+
+    Args:
+        text (str): The customer question.
+        locations (iterable): Known catalog locations to look for in the text.
+
+    Returns:
+        dict: Constraint name to value, e.g. {"price_max": 8.0, "fuel": {"diesel"}}; empty if none found.
+    """
+    if not text:
+        return {}
+    text = text.lower().replace(",", "")
+    constraints = {}
+
+    # Price in lakhs
+    match = re.search(rf"between\s*(?:rs\.?|inr|₹)?\s*{_NUMBER}\s*(?:and|to|-)\s*(?:rs\.?|inr|₹)?\s*{_NUMBER}({_PRICE_UNIT})?", text)
+    if match:
+        low, high = _lakhs(match.group(1), match.group(3)), _lakhs(match.group(2), match.group(3))
+        if low is not None and high is not None:
+            constraints["price_min"], constraints["price_max"] = min(low, high), max(low, high)
+    for bound, pattern in (("price_max", _UPPER), ("price_min", _LOWER)):
+        match = re.search(rf"{pattern}\s*(?:rs\.?|inr|₹)?\s*{_NUMBER}({_PRICE_UNIT})?(?!\s*(?:km|kms|kilomet|k\b))", text)
+        if match and bound not in constraints:
+            value = _lakhs(match.group(1), match.group(2))
+            if value is not None:
+                constraints[bound] = value
+
+    # Model year
+    match = re.search(rf"(after|newer than|since|from|or newer|or later)\s*{_YEAR}", text)
+    if match:
+        year = int(match.group(2))
+        constraints["year_min"] = year + 1 if match.group(1) in ("after", "newer than") else year
+    match = re.search(rf"{_YEAR}\s*(?:or newer|or later|and above|onwards)", text)
+    if match:
+        constraints["year_min"] = int(match.group(1))
+    match = re.search(rf"(before|older than)\s*{_YEAR}", text)
+    if match:
+        constraints["year_max"] = int(match.group(2)) - 1
+
+    # Kilometers driven
+    match = re.search(rf"{_UPPER}\s*{_NUMBER}\s*(k)?\s*(?:km|kms|kilometers|kilometres)", text)
+    if match:
+        constraints["km_max"] = float(match.group(1)) * (1000 if match.group(2) else 1)
+
+    # Categorical attributes
+    fuels = {fuel for fuel in FUEL_TYPES if re.search(rf"\b{fuel}\b", text)}
+    if fuels:
+        constraints["fuel"] = fuels
+    transmissions = {value for word, value in TRANSMISSIONS.items() if re.search(rf"\b{word}\b", text)}
+    if len(transmissions) == 1:
+        constraints["transmission"] = transmissions
+    match = re.search(r"(\d+)\s*-?\s*seater", text)
+    if match:
+        constraints["seats_min"] = int(match.group(1))
+    found = {loc for loc in locations if re.search(rf"\b{re.escape(loc.lower())}\b", text)}
+    if found:
+        constraints["location"] = {loc.lower() for loc in found}
+
+    return constraints
+
+
+class AttributeIndex:
+    """
+    Columnar NumPy index over the structured catalog columns.
+
+    Rows are aligned with `ids`, the docstore ids used in the FAISS store. Numeric columns are
+    float arrays (NaN when missing); categorical columns are small-int codes into `categories`.
+    """
+
+    def __init__(self, ids, numeric, codes, categories):
+        self.ids = np.asarray(ids)
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+        self.positions = None
+
+    @classmethod
+    def from_dataframe(cls, product_data, ids):
+        numeric = {
+            name: pd.to_numeric(product_data[column], errors="coerce").to_numpy(dtype=np.float64)
+            for name, column in NUMERIC_COLUMNS.items()
+        }
+        codes, categories = {}, {}
+        for name, column in CATEGORICAL_COLUMNS.items():
+            values = product_data[column].astype(str).str.strip().str.lower()
+            code, uniques = pd.factorize(values)
+            codes[name] = code.astype(np.int16)
+            categories[name] = np.asarray(uniques, dtype=str)
+        return cls(ids, numeric, codes, categories)
+
+    def save(self, index_dir):
+        arrays = {"ids": self.ids.astype(str)}
+        arrays.update({f"num_{name}": values for name, values in self.numeric.items()})
+        arrays.update({f"code_{name}": values for name, values in self.codes.items()})
+        arrays.update({f"cat_{name}": values for name, values in self.categories.items()})
+        np.savez(os.path.join(index_dir, ATTRIBUTES_FILE), **arrays)
+
+    @classmethod
+    def load(cls, index_dir):
+        """Load the attribute index saved next to a vector store, or None if there is none."""
+        path = os.path.join(index_dir, ATTRIBUTES_FILE)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        numeric = {name: data[f"num_{name}"] for name in NUMERIC_COLUMNS}
+        codes = {name: data[f"code_{name}"] for name in CATEGORICAL_COLUMNS}
+        categories = {name: data[f"cat_{name}"] for name in CATEGORICAL_COLUMNS}
+        return cls(data["ids"], numeric, codes, categories)
+
+    @property
+    def locations(self):
+        return [str(value) for value in self.categories["location"]]
+
+    def bind(self, index_to_docstore_id):
+        """Map every attribute row to its current position in the FAISS index (-1 if absent)."""
+        position_of = {doc_id: pos for pos, doc_id in index_to_docstore_id.items()}
+        self.positions = np.array([position_of.get(doc_id, -1) for doc_id in self.ids], dtype=np.int64)
+        return self
+
+    def mask(self, constraints):
+        """Boolean mask over rows satisfying every constraint."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        bounds = {
+            "price_max": ("price", np.less_equal), "price_min": ("price", np.greater_equal),
+            "year_max": ("year", np.less_equal), "year_min": ("year", np.greater_equal),
+            "km_max": ("km", np.less_equal), "seats_min": ("seats", np.greater_equal),
+        }
+        for key, (column, op) in bounds.items():
+            if key in constraints:
+                mask &= op(self.numeric[column], constraints[key])  # NaN compares False
+        for name in CATEGORICAL_COLUMNS:
+            if name in constraints:
+                wanted = [i for i, value in enumerate(self.categories[name]) if value in constraints[name]]
+                mask &= np.isin(self.codes[name], wanted)
+        return mask
+
+    def candidate_positions(self, constraints):
+        """FAISS positions of the rows satisfying `constraints`; requires `bind` first."""
+        positions = self.positions[self.mask(constraints)]
+        return positions[positions >= 0]
+
+
+def _search_params(index, selector):
+    """Build search parameters restricting `index` to `selector`, matching the index family."""
+    import faiss
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    except (RuntimeError, AttributeError):
+        pass
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_positions(index, vector, k, positions=None, over_fetch=4, use_selector=True):
+    """
+    k-nearest-neighbour search over a FAISS index, optionally restricted to `positions`.
+
+    Uses a FAISS id selector when the index supports it (and `use_selector` is set); otherwise
+    over-fetches and post-filters, widening the search until k candidates are found or the
+    index is exhausted.
+
+    Returns:
+        tuple: (distances, positions) as 1-d arrays of length <= k.
+    """
+    vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    if positions is None:
+        distances, found = index.search(vector, k)
+        keep = found[0] >= 0
+        return distances[0][keep], found[0][keep]
+    if len(positions) == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+    import faiss
+
+    positions = np.ascontiguousarray(positions, dtype=np.int64)
+    k = min(k, len(positions))
+    if use_selector:
+        try:
+            selector = faiss.IDSelectorBatch(len(positions), faiss.swig_ptr(positions))
+            distances, found = index.search(vector, k, params=_search_params(index, selector))
+            keep = found[0] >= 0
+            return distances[0][keep], found[0][keep]
+        except (TypeError, AttributeError, RuntimeError):
+            pass
+
+    allowed = set(positions.tolist())
+    fetch = k * over_fetch
+    while True:
+        fetch = min(fetch, index.ntotal)
+        distances, found = index.search(vector, fetch)
+        keep = np.array([pos in allowed for pos in found[0]], dtype=bool)
+        if keep.sum() >= k or fetch >= index.ntotal:
+            return distances[0][keep][:k], found[0][keep][:k]
+        fetch *= over_fetch
+
+
+def filtered_similarity_search(vector_store, query, k, positions=None):
+    """
+    Similarity search on a LangChain FAISS store restricted to the given index positions.
+
+    Returns:
+        list: Matching Documents, closest first.
+    """
+    embed = getattr(vector_store.embedding_function, "embed_query", vector_store.embedding_function)
+    vector = np.asarray([embed(query)], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(vector)
+    _, found = search_positions(vector_store.index, vector, k, positions)
+    return [vector_store.docstore.search(vector_store.index_to_docstore_id[pos]) for pos in found]
@@ -0,0 +1,140 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+
+# Rows read from the catalog at a time, configurable through config.env
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+
+REQUIRED_COLUMNS = [
+    "Name", "Location", "Year", "Kilometers_Driven", "Fuel_Type",
+    "Transmission", "Owner_Type", "Mileage", "Engine", "Power",
+    "Seats", "Price"
+]
+
+# Columns that identify a listing when the catalog has no explicit ID column
+ROW_KEY_COLUMNS = ["Name", "Location", "Year", "Kilometers_Driven", "Owner_Type"]
+
+# (label, column) of every field of the product text, in order
+TEXT_FIELDS = [
+    ("Name", "Name"), ("Location", "Location"), ("Year", "Year"),
+    ("Kilometers Driven", "Kilometers_Driven"), ("Fuel Type", "Fuel_Type"),
+    ("Transmission", "Transmission"), ("Owner Type", "Owner_Type"), ("Mileage", "Mileage"),
+    ("Engine", "Engine"), ("Power", "Power"), ("Seats", "Seats"), ("Price", "Price"),
+]
+
+FORMATS = {".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}
+
+
+def catalog_format(path):
+    """
+    Raises:
+        ValueError: If the file extension is not one of FORMATS.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported catalog format '{extension}', expected one of {sorted(FORMATS)}.")
+    return FORMATS[extension]
+
+
+def read_catalog_chunks(path, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    Yield the catalog as DataFrames of at most `chunk_rows` rows without loading the whole file.
+    xlsx is streamed with openpyxl's read-only mode, Parquet by record batch (needs pyarrow).
+    """
+    file_format = catalog_format(path)
+    if file_format == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value) for value in next(rows, ())]
+            while True:
+                block = list(itertools.islice(rows, chunk_rows))
+                if not block:
+                    break
+                # Read-only sheets can report formatted but empty rows at the end
+                chunk = pd.DataFrame.from_records(block, columns=header).dropna(how="all")
+                if len(chunk):
+                    yield chunk
+        finally:
+            workbook.close()
+
+
+def catalog_row_count(path):
+    """
+    Number of data rows, for progress reporting and index sizing: exact for Parquet (file
+    metadata), a line count for CSV, the sheet dimension for xlsx. Sheets written without a
+    dimension record are counted by streaming through their rows.
+    """
+    file_format = catalog_format(path)
+    if file_format == "csv":
+        with open(path, "rb") as f:
+            lines = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+        return max(lines - 1, 0)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        sheet = workbook.active
+        max_row = sheet.max_row
+        if max_row is None:
+            max_row = sum(1 for row in sheet.iter_rows(values_only=True) if any(value is not None for value in row))
+    finally:
+        workbook.close()
+    return max(max_row - 1, 0)
+
+
+def text_column(values):
+    """
+    Render a column as cell text. Integral floats lose their ".0", so a chunk that happens to
+    contain a missing value (and is read as float) gives the same text as one that does not;
+    missing values render as "nan".
+    """
+    text = values.astype(str)
+    if pd.api.types.is_float_dtype(values):
+        integral = values.notna() & (values % 1 == 0)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+    text[values.isna()] = "nan"
+    return text
+
+
+def product_texts(chunk):
+    """The text embedded for each catalog row, concatenated column by column."""
+    text = None
+    for label, column in TEXT_FIELDS:
+        field = f"{label}: " + text_column(chunk[column])
+        text = field if text is None else text + " | " + field
+    return (text + " lakhs").tolist()
+
+
+def row_keys(chunk, seen=None):
+    """
+    Build a stable document id for every catalog row.
+    Uses the `ID` column when present, otherwise the listing's identifying columns;
+    repeated listings get an occurrence suffix so ids stay unique. Pass the same `seen`
+    dict for every chunk of a catalog to number repeats across chunks.
+    """
+    seen = {} if seen is None else seen
+    if "ID" in chunk.columns:
+        base = text_column(chunk["ID"])
+    else:
+        base = text_column(chunk[ROW_KEY_COLUMNS[0]])
+        for column in ROW_KEY_COLUMNS[1:]:
+            base = base + "|" + text_column(chunk[column])
+    occurrence = base.groupby(base, sort=False).cumcount() + 1 + base.map(seen).fillna(0).astype(np.int64)
+    for value, count in base.value_counts(sort=False).items():
+        seen[value] = seen.get(value, 0) + int(count)
+    return (base + "#" + occurrence.astype(str)).tolist()
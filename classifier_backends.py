@@ -0,0 +1,219 @@
+"""
+Inference backends for the sentiment and tone classifiers.
+
+    torch       full-precision transformers pipeline (the reference)
+    torch-int8  the same pipeline with its Linear layers dynamically quantized to int8
+    onnx-int8   the model exported to ONNX, weights quantized to int8, run with onnxruntime
+
+Every backend is called like a transformers text-classification pipeline:
+    classifier(texts, batch_size=8, truncation=True, max_length=512) -> [{"label", "score"}, ...]
+
+Parity check of the int8 backends against fp32 on a labeled sample:
+    python classifier_backends.py --backends torch-int8 onnx-int8 --min-agreement 0.95
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import numpy as np
+
+# Backend settings, configurable through config.env
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "torch")
+CLASSIFIER_THREADS = int(os.getenv("CLASSIFIER_THREADS", "0"))  # 0 = library default
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+
+BACKENDS = ("torch", "torch-int8", "onnx-int8")
+
+SENTIMENT_MODEL = ("sentiment-analysis", "distilbert-base-uncased-finetuned-sst-2-english")
+TONE_MODEL = ("text-classification", "j-hartmann/emotion-english-distilroberta-base")
+
+# Hand-labeled customer utterances: (text, sentiment, tone)
+PARITY_SAMPLE = [
+    ("I'm looking for a family car under 8 lakhs.", "POSITIVE", "neutral"),
+    ("That price is way too high, I saw the same model cheaper elsewhere.", "NEGATIVE", "anger"),
+    ("Can you tell me more about the mileage of the diesel variant?", "POSITIVE", "neutral"),
+    ("Great, I love the color and the interior, let's talk about the paperwork.", "POSITIVE", "joy"),
+    ("Honestly I'm disappointed, the last dealer promised a discount and never delivered.", "NEGATIVE", "sadness"),
+    ("Why does a 2014 car with 90,000 km cost this much?", "NEGATIVE", "surprise"),
+    ("Is the seven-seater available for a test drive this weekend?", "POSITIVE", "neutral"),
+    ("This is a rip-off, you are wasting my time.", "NEGATIVE", "anger"),
+    ("The seats smell terrible and the dashboard is sticky, gross.", "NEGATIVE", "disgust"),
+    ("I'm worried the engine might fail on the highway.", "NEGATIVE", "fear"),
+    ("Wow, I didn't expect the automatic to be this cheap!", "POSITIVE", "surprise"),
+    ("Perfect, my kids are going to be thrilled with this SUV.", "POSITIVE", "joy"),
+    ("I'm scared of buying a car with a hidden accident history.", "NEGATIVE", "fear"),
+    ("My old car was stolen last month and I really miss it.", "NEGATIVE", "sadness"),
+    ("Stop calling me every day, I already told you I'm not interested.", "NEGATIVE", "anger"),
+    ("Thanks, the test drive was smooth and the staff were very helpful.", "POSITIVE", "joy"),
+    ("Please send me the service history and the insurance papers.", "POSITIVE", "neutral"),
+    ("The previous owner smoked in it, that's disgusting.", "NEGATIVE", "disgust"),
+    ("Really? The warranty covers the gearbox too?", "POSITIVE", "surprise"),
+    ("I'm sad to sell my first car, but I need something bigger.", "NEGATIVE", "sadness"),
+]
+
+
+def _linear_int8(pipe):
+    """Replace the pipeline's Linear layers with dynamically quantized int8 versions."""
+    import torch
+
+    pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def _torch_pipeline(task, model):
+    from transformers import pipeline
+
+    if CLASSIFIER_THREADS:
+        import torch
+
+        torch.set_num_threads(CLASSIFIER_THREADS)
+    return pipeline(task, model=model)
+
+
+class OnnxClassifier:
+    """
+    Sequence classifier exported to ONNX with int8 weights, run on onnxruntime's CPU provider.
+
+    The export and quantization run once per model; later loads reuse the files under `model_dir`.
+    """
+
+    def __init__(self, model, model_dir=ONNX_MODEL_DIR):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = os.path.join(model_dir, model.replace("/", "--"))
+        int8_path = os.path.join(path, "model.int8.onnx")
+        if not os.path.exists(int8_path):
+            export_onnx(model, path)
+        with open(os.path.join(path, "labels.json"), "r", encoding="utf-8") as f:
+            self.id2label = {int(i): label for i, label in json.load(f).items()}
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        options = ort.SessionOptions()
+        if CLASSIFIER_THREADS:
+            options.intra_op_num_threads = CLASSIFIER_THREADS
+        self.session = ort.InferenceSession(int8_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, texts, batch_size=8, truncation=True, max_length=512, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                list(texts[start:start + batch_size]), padding=True, truncation=truncation,
+                max_length=max_length, return_tensors="np",
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            logits = self.session.run(["logits"], feed)[0]
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            for row in probs:
+                best = int(row.argmax())
+                results.append({"label": self.id2label[best], "score": float(row[best])})
+        return results
+
+
+def export_onnx(model, path):
+    """Export a transformers sequence classifier to `path`/model.onnx and quantize it to model.int8.onnx."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(path, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    network = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    sample = tokenizer(["Export sample"], return_tensors="pt")
+    fp32_path = os.path.join(path, "model.onnx")
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            network, (sample["input_ids"], sample["attention_mask"]), fp32_path,
+            input_names=["input_ids", "attention_mask"], output_names=["logits"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "logits": {0: "batch"}},
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, os.path.join(path, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    with open(os.path.join(path, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(network.config.id2label, f)
+    print(f"Exported {model} to {path}.")
+
+
+def load_classifier(task, model, backend=None):
+    """
+    Load a text classifier on the given backend (default: CLASSIFIER_BACKEND).
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or CLASSIFIER_BACKEND
+    if backend == "torch":
+        return _torch_pipeline(task, model)
+    if backend == "torch-int8":
+        return _linear_int8(_torch_pipeline(task, model))
+    if backend == "onnx-int8":
+        return OnnxClassifier(model)
+    raise ValueError(f"Unknown classifier backend '{backend}', expected one of {BACKENDS}.")
+
+
+def load_labeled_sample(csv_path=None):
+    """
+    The labeled sample for parity checks: PARITY_SAMPLE, or a CSV with text, sentiment and tone columns.
+
+    Returns:
+        tuple: (texts, sentiment labels, tone labels)
+    """
+    rows = PARITY_SAMPLE
+    if csv_path:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [(row["text"], row["sentiment"], row["tone"]) for row in csv.DictReader(f)]
+    texts, sentiments, tones = zip(*rows)
+    return list(texts), list(sentiments), list(tones)
+
+
+def parity_report(backends=("torch-int8", "onnx-int8"), csv_path=None, batch_size=8, max_length=512):
+    """
+    Compare each backend with the fp32 pipelines on the labeled sample.
+
+    Returns:
+        list[dict]: One row per backend and task with the label agreement with fp32, the accuracy
+        of both against the labels and the largest score difference on agreeing predictions.
+    """
+    texts, sentiments, tones = load_labeled_sample(csv_path)
+    kwargs = {"batch_size": batch_size, "truncation": True, "max_length": max_length}
+    rows = []
+    for task_name, (task, model), gold in (("sentiment", SENTIMENT_MODEL, sentiments), ("tone", TONE_MODEL, tones)):
+        reference = load_classifier(task, model, "torch")(texts, **kwargs)
+        reference_accuracy = np.mean([r["label"] == g for r, g in zip(reference, gold)])
+        for backend in backends:
+            outputs = load_classifier(task, model, backend)(texts, **kwargs)
+            agree = [o["label"] == r["label"] for o, r in zip(outputs, reference)]
+            score_diffs = [abs(o["score"] - r["score"]) for o, r, same in zip(outputs, reference, agree) if same]
+            rows.append({
+                "backend": backend,
+                "task": task_name,
+                "agreement": float(np.mean(agree)),
+                "accuracy": float(np.mean([o["label"] == g for o, g in zip(outputs, gold)])),
+                "fp32_accuracy": float(reference_accuracy),
+                "max_score_diff": float(max(score_diffs, default=0.0)),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check int8 classifier backends against the fp32 pipelines.")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx-int8"], choices=BACKENDS)
+    parser.add_argument("--csv", default=None, help="Labeled sample with text, sentiment and tone columns")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Fail below this label agreement with fp32")
+    args = parser.parse_args()
+
+    report = parity_report(args.backends, args.csv)
+    print(f"{'backend':<11} {'task':<10} {'agreement':>10} {'accuracy':>9} {'fp32 acc':>9} {'max score diff':>15}")
+    for row in report:
+        print(f"{row['backend']:<11} {row['task']:<10} {row['agreement']:>10.1%} {row['accuracy']:>9.1%} "
+              f"{row['fp32_accuracy']:>9.1%} {row['max_score_diff']:>15.4f}")
+    failed = [row for row in report if row["agreement"] < args.min_agreement]
+    for row in failed:
+        print(f"FAIL: {row['backend']} {row['task']} agreement {row['agreement']:.1%} < {args.min_agreement:.0%}")
+    sys.exit(1 if failed else 0)
@@ -1,23 +1,21 @@
+import os
 import sqlite3
 
-def create_crm_database():
-    try:
-        # Connect to SQLite database (it will create the file if it doesn't exist)
-        connection = sqlite3.connect("SalesCRM.db")
-        cursor = connection.cursor()
+DB_PATH = os.getenv("CRM_DB_PATH", "SalesCRM.db")
 
-        # Create Customers table
-        cursor.execute('''
+# Versioned schema migrations, applied in order. The applied version is kept in PRAGMA user_version.
+# Never edit a released migration; append a new one instead.
+MIGRATIONS = [
+    (1, "Create Customers, InteractionHistory and Recommendations tables", [
+        '''
             CREATE TABLE IF NOT EXISTS Customers (
                 CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
                 Name TEXT NOT NULL,
                 Email TEXT,
                 Phone TEXT
             )
-        ''')
-
-        # Create InteractionHistory table
-        cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS InteractionHistory (
                 InteractionID INTEGER PRIMARY KEY AUTOINCREMENT,
                 CustomerID INTEGER,
@@ -29,10 +27,8 @@ def create_crm_database():
                 Tone TEXT,        -- e.g., Happy, Angry, Concerned
                 FOREIGN KEY (CustomerID) REFERENCES Customers(CustomerID)
             )
-        ''')
-
-        # Create Recommendations table
-        cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS Recommendations (
                 RecommendationID INTEGER PRIMARY KEY AUTOINCREMENT,
                 CustomerID INTEGER,
@@ -40,17 +36,64 @@ def create_crm_database():
                 Date TEXT,
                 FOREIGN KEY (CustomerID) REFERENCES Customers(CustomerID)
             )
-        ''')
+        ''',
+    ]),
+    (2, "Index customer lookups and latest interaction / recommendation per customer", [
+        "CREATE INDEX IF NOT EXISTS idx_name ON Customers (Name)",
+        "CREATE INDEX IF NOT EXISTS idx_interaction_customer_date ON InteractionHistory (CustomerID, InteractionDate)",
+        "CREATE INDEX IF NOT EXISTS idx_recommendation_customer_date ON Recommendations (CustomerID, Date)",
+        "ANALYZE",
+    ]),
+]
 
-        print("CRM database and tables created successfully!")
+LATEST_VERSION = MIGRATIONS[-1][0]
 
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
 
+def migrate(db_path=DB_PATH, target=LATEST_VERSION):
+    """
+    Bring the database schema up to `target`, applying each pending migration in its own transaction.
+
+    Args:
+        db_path (str): SQLite database file; created if it doesn't exist.
+        target (int): Schema version to migrate to (defaults to the latest).
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    connection = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        for number, description, statements in MIGRATIONS:
+            if number <= version or number > target:
+                continue
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read under the write lock, in case another process migrated meanwhile
+                if connection.execute("PRAGMA user_version").fetchone()[0] >= number:
+                    connection.execute("ROLLBACK")
+                    continue
+                for statement in statements:
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {number}")
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            version = number
+            print(f"Applied migration {number}: {description}")
+        return version
     finally:
-        if connection:
-            connection.commit()
-            connection.close()
+        connection.close()
+
+
+def create_crm_database(db_path=DB_PATH):
+    try:
+        # Connect to SQLite database (it will create the file if it doesn't exist) and apply all migrations
+        version = migrate(db_path)
+        print(f"CRM database and tables created successfully! (schema version {version})")
+
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
 
 # Call the function to create the database
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+"""
+Synthetic CRM data generator for load testing.
+
+Builds a database with the crm_database_create schema and fills it with customers, interactions
+and recommendations whose labels and note lengths follow what the app writes in production.
+
+Usage:
+    python crm_generator.py crm_100k.db --customers 100000 --interactions 3 --recommendations 1
+"""
+import os
+import random
+import sqlite3
+import argparse
+import time
+from datetime import datetime, timedelta
+from crm_database_create import migrate, LATEST_VERSION
+
+# Label distributions, roughly matching the classifiers and the intention prompt in main.py
+SENTIMENTS = {"POSITIVE": 0.55, "NEGATIVE": 0.45}
+TONES = {"neutral": 0.40, "joy": 0.20, "anger": 0.10, "sadness": 0.08, "surprise": 0.08, "fear": 0.07, "disgust": 0.07}
+INTENTIONS = {"Inquiry": 0.35, "Purchase": 0.25, "Negotiation": 0.15, "Complaint": 0.10, "Comparison": 0.10, "Financing": 0.05}
+DEAL_STATUSES = {"New": 0.35, "Active": 0.35, "Negotiating": 0.15, "Closed-Won": 0.10, "Closed-Lost": 0.05}
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Rohan", "Karan", "Rahul", "Vikram", "Sanjay", "Amit",
+    "Priya", "Ananya", "Diya", "Isha", "Kavya", "Meera", "Neha", "Pooja", "Riya", "Sneha",
+    "John", "Jane", "Alice", "Bob", "Maria", "David", "Sarah", "Michael", "Emma", "James",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Patel", "Gupta", "Singh", "Kumar", "Reddy", "Iyer", "Nair", "Mehta",
+    "Joshi", "Rao", "Das", "Khan", "Chopra", "Doe", "Smith", "Brown", "Johnson", "Williams",
+]
+CARS = [
+    "Maruti Swift VDI", "Hyundai i20 Asta", "Honda City 1.5 V MT", "Toyota Innova 2.5 G", "Mahindra XUV500 W8",
+    "Hyundai Creta 1.6 SX", "Maruti Ertiga VDI", "Honda Amaze S i-DTEC", "Tata Nexon XZ", "Ford EcoSport Titanium",
+]
+NOTE_SENTENCES = [
+    "Customer is looking for a budget-friendly family car.",
+    "Asked about mileage and service history of the diesel variants.",
+    "Prefers an automatic transmission for city driving.",
+    "Was unhappy with the price quoted by another dealer.",
+    "Wants a test drive this weekend.",
+    "Concerned about the number of previous owners.",
+    "Interested in financing options and EMI plans.",
+    "Compared our offer with a listing on an online marketplace.",
+    "Requested more photos of the interior.",
+    "Mentioned a budget of around 6 lakhs.",
+    "Needs a seven-seater for a large family.",
+    "Asked whether the insurance can be transferred.",
+    "Negotiated for free servicing for the first year.",
+    "Positive about the condition of the car after inspection.",
+]
+
+NOTE_LENGTH = 800  # mean characters per interaction note; the checked-in data averages ~840
+NOTE_POOL_SIZE = 2000  # distinct notes to sample from, so generation stays fast at millions of rows
+
+
+def _weighted(rng, distribution, n):
+    return rng.choices(list(distribution), weights=list(distribution.values()), k=n)
+
+
+def _make_note(rng, length):
+    """Concatenate random sentences (summary, highlights, recommendations) up to about `length` characters."""
+    parts = [f"**Summary**: {rng.choice(NOTE_SENTENCES)}"]
+    size = len(parts[0])
+    while size < length:
+        sentence = rng.choice(NOTE_SENTENCES + [f"Recommended {rng.choice(CARS)}."])
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)[:max(length, 1)]
+
+
+def _timestamp(rng, start, span_seconds):
+    return (start + timedelta(seconds=rng.randrange(span_seconds))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def generate_crm_database(db_path, n_customers, interactions_per_customer=3, recommendations_per_customer=1,
+                          note_length=NOTE_LENGTH, days=730, seed=0, batch_size=10000, overwrite=False):
+    """
+    Create a synthetic CRM database.
+
+    Args:
+        db_path (str): Output SQLite file.
+        n_customers (int): Number of customers.
+        interactions_per_customer (int): InteractionHistory rows per customer.
+        recommendations_per_customer (int): Recommendations rows per customer.
+        note_length (int): Mean length of interaction notes in characters.
+        days (int): Dates are spread over this many days before 2025-01-01 (fixed, for repeatable data).
+        seed (int): Random seed; the same arguments always produce the same data.
+        overwrite (bool): Replace `db_path` if it exists.
+
+    Returns:
+        dict: Row counts per table.
+    """
+    if os.path.exists(db_path):
+        if not overwrite:
+            raise FileExistsError(f"{db_path} already exists (use overwrite=True to replace it).")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1) - timedelta(days=days)
+    span = days * 86400
+    note_pool = [_make_note(rng, max(20, int(rng.gauss(note_length, note_length * 0.4)))) for _ in range(NOTE_POOL_SIZE)]
+
+    # Load into the base tables first and build the indexes afterwards, which is much faster
+    migrate(db_path, target=1)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL;")
+    connection.execute("PRAGMA synchronous=OFF;")
+    try:
+        for first_id in range(1, n_customers + 1, batch_size):
+            ids = range(first_id, min(first_id + batch_size, n_customers + 1))
+            customers = []
+            for customer_id in ids:
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                customers.append((
+                    customer_id, f"{first} {last} {customer_id}",
+                    f"{first.lower()}.{last.lower()}{customer_id}@example.com", f"9{rng.randrange(10 ** 9):09d}",
+                ))
+            connection.executemany("INSERT INTO Customers (CustomerID, Name, Email, Phone) VALUES (?, ?, ?, ?)", customers)
+
+            n = len(ids) * interactions_per_customer
+            connection.executemany(
+                """
+                INSERT INTO InteractionHistory (CustomerID, LastDealStatus, InteractionDate, Notes, Intention, Sentiment, Tone)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                zip(
+                    (customer_id for customer_id in ids for _ in range(interactions_per_customer)),
+                    _weighted(rng, DEAL_STATUSES, n),
+                    (_timestamp(rng, start, span) for _ in range(n)),
+                    rng.choices(note_pool, k=n),
+                    _weighted(rng, INTENTIONS, n),
+                    _weighted(rng, SENTIMENTS, n),
+                    _weighted(rng, TONES, n),
+                ),
+            )
+
+            n = len(ids) * recommendations_per_customer
+            connection.executemany(
+                "INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date) VALUES (?, ?, ?)",
+                zip(
+                    (customer_id for customer_id in ids for _ in range(recommendations_per_customer)),
+                    (f"Based on your requirements, I recommend the {' or the '.join(rng.sample(CARS, 2))}." for _ in range(n)),
+                    (_timestamp(rng, start, span) for _ in range(n)),
+                ),
+            )
+            connection.commit()
+    finally:
+        connection.close()
+    migrate(db_path, target=LATEST_VERSION)
+
+    return {
+        "Customers": n_customers,
+        "InteractionHistory": n_customers * interactions_per_customer,
+        "Recommendations": n_customers * recommendations_per_customer,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CRM database.")
+    parser.add_argument("db_path")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--interactions", type=int, default=3, help="Interactions per customer")
+    parser.add_argument("--recommendations", type=int, default=1, help="Recommendations per customer")
+    parser.add_argument("--note-length", type=int, default=NOTE_LENGTH, help="Mean note length in characters")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_crm_database(
+        args.db_path, args.customers, args.interactions, args.recommendations,
+        note_length=args.note_length, days=args.days, seed=args.seed, overwrite=args.overwrite,
+    )
+    print(f"Generated {counts} in {time.perf_counter() - start:.1f}s -> {args.db_path}")
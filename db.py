@@ -0,0 +1,483 @@
+import csv
+import queue
+import argparse
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from crm_database_create import DB_PATH, migrate
+import tracing
+
+# Bulk import
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COLUMNS = [
+    "Name", "Email", "Phone", "LastDealStatus", "InteractionDate", "Notes",
+    "Sentiment", "Tone", "Intention", "RecommendedDeal", "RecommendationDate",
+]
+
+# Applied once per pooled connection instead of on every call
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",          # readers do not block the writer
+    "synchronous": "NORMAL",        # safe with WAL, avoids an fsync per commit
+    "cache_size": -20000,           # ~20 MB page cache per connection
+    "mmap_size": 268435456,         # map up to 256 MB of the database file
+    "busy_timeout": 5000,           # wait up to 5 s for a lock instead of failing
+    "temp_store": "MEMORY",
+}
+
+
+class PoolExhaustedError(sqlite3.OperationalError):
+    """No pooled connection became free within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections.
+
+    Connections are opened lazily up to `max_connections`, configured once with `pragmas`,
+    and keep their prepared-statement cache (`cached_statements`) across borrows.
+    Connections run in autocommit mode; use `transaction()` to group writes.
+    """
+
+    def __init__(self, path=DB_PATH, max_connections=8, pragmas=None, cached_statements=256, timeout=30):
+        self.path = path
+        self.max_connections = max_connections
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+            timeout=self.timeout,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value};")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.max_connections:
+                self._opened += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolExhaustedError(
+                f"connection pool exhausted: all {self.max_connections} connections busy for {self.timeout}s"
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the `with` block.
+
+        Raises:
+            PoolExhaustedError: If every connection stays borrowed for `timeout` seconds.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # Never hand out a connection with a half-finished transaction
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Run the `with` block in one transaction, committed on success and rolled back on error.
+
+        Args:
+            immediate (bool): Take the write lock up front (BEGIN IMMEDIATE), so the
+                transaction cannot fail later on lock upgrade.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def close_all(self):
+        """Close idle connections (e.g. before replacing the database file)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+pool = ConnectionPool()
+
+
+# The latest interaction and the latest recommendation are looked up independently, each as one
+# seek on its (CustomerID, date) index, instead of joining every interaction with every
+# recommendation of the customer and sorting the product
+CUSTOMER_QUERY = """
+SELECT c.CustomerID, c.Name, c.Email, c.Phone,
+       ih.LastDealStatus, ih.InteractionDate, ih.Notes, ih.Sentiment, ih.Tone, ih.Intention,
+       (SELECT r.RecommendedDeal FROM Recommendations r
+        WHERE r.CustomerID = c.CustomerID
+        ORDER BY r.Date DESC, r.RecommendationID DESC
+        LIMIT 1) AS RecommendedDeal
+FROM Customers c
+LEFT JOIN InteractionHistory ih ON ih.InteractionID = (
+    SELECT InteractionID FROM InteractionHistory
+    WHERE CustomerID = c.CustomerID
+    ORDER BY InteractionDate DESC, InteractionID DESC
+    LIMIT 1
+)
+WHERE c.Name = ?
+ORDER BY ih.InteractionDate DESC
+LIMIT 1
+"""
+
+
+# to get customer details
+@tracing.traced(kind="db")
+def fetch_customer_data(customer_name):
+    """
+    Fetch customer details and interaction history from the database.
+    Returns the data as a dictionary or None if the customer is not found.
+    """
+    try:
+        with pool.connection() as conn:
+            cursor = conn.execute(CUSTOMER_QUERY, (customer_name,))
+            customer = cursor.fetchone()
+        if customer:
+            columns = [
+                "CustomerID", "Name", "Email", "Phone", "LastDealStatus",
+                "InteractionDate", "Notes", "Sentiment", "Tone", "Intention",
+                "RecommendedDeal"
+            ]
+            return dict(zip(columns, customer))
+        return None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+# to insert new customer details
+@tracing.traced(kind="db")
+def add_customer_to_db(name, email, phone, sentiment, tone, intention, notes, recommendations):
+    """
+    Insert a new customer with its first interaction and recommendation in one transaction.
+
+    The write lock is taken up front (BEGIN IMMEDIATE) and the ID comes from AUTOINCREMENT, so
+    concurrent inserts cannot collide; a busy database is waited on through busy_timeout.
+
+    Returns:
+        int: The new CustomerID.
+    """
+    with pool.transaction(immediate=True) as conn:
+        # Insert the new customer into the Customers table
+        new_customer_id = conn.execute(
+            """
+            INSERT INTO Customers (Name, Email, Phone)
+            VALUES (?, ?, ?)
+            """,
+            (name, email, phone)
+        ).lastrowid
+
+        # Insert interaction data for the new customer
+        conn.execute(
+            """
+            INSERT INTO InteractionHistory (CustomerID, LastDealStatus, InteractionDate, Notes, Sentiment, Tone, Intention)
+            VALUES (?, ?, DATETIME('now'), ?, ?, ?, ?)
+            """,
+            (new_customer_id, "New", notes, sentiment, tone, intention)
+        )
+
+        conn.execute(
+            """
+            INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date)
+            VALUES (?, ?, datetime('now'))
+            """,
+            (new_customer_id, recommendations)
+        )
+    return new_customer_id
+
+
+# Function to update customer interaction in the database
+@tracing.traced(kind="db")
+def update_customer_interaction(customer_id, last_deal_status, notes, recommendations, sentiment, tone, intention):
+    """
+    Update the customer interaction details in the database for an existing customer.
+    If the customer interaction does not exist, this will update the latest entry for the customer.
+    """
+    # Immediate, so the read below cannot fail later on upgrading to a write lock
+    with pool.transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE InteractionHistory
+            SET
+                LastDealStatus = ?,
+                Notes = ?,
+                Sentiment = ?,
+                Tone = ?,
+                Intention = ?,
+                InteractionDate = datetime('now')
+            WHERE CustomerID = ?
+            """,
+            (last_deal_status, notes, sentiment, tone, intention, customer_id)
+        )
+        # Check if CustomerID exists in the Recommendations table
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM Recommendations WHERE CustomerID = ?
+            """,
+            (customer_id,)
+        )
+        exists = cursor.fetchone()[0]  # Fetch the count
+        if exists:
+            cursor.execute(
+                """
+                UPDATE Recommendations
+                SET
+                    RecommendedDeal = ?,
+                    Date = datetime('now')
+                WHERE CustomerID = ?
+                """,
+                (recommendations, customer_id)
+            )
+
+        else:
+            cursor.execute(
+                """
+                INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date)
+                VALUES (?, ?, datetime('now'))
+                """,
+                (customer_id, recommendations)
+            )
+
+
+# Columns shown in the customer list; notes are only loaded for one customer on demand
+CUSTOMER_PAGE_COLUMNS = [
+    "CustomerID", "Name", "Email", "Phone", "LastDealStatus",
+    "InteractionDate", "Sentiment", "Tone", "Intention",
+]
+
+
+def _prefix_successor(prefix):
+    """
+    The smallest string greater than every string starting with `prefix`, or None if there is
+    none. Text compares by UTF-8 bytes, which is code point order, so this bumps the last
+    character that is below the largest code point (skipping surrogates, which cannot be stored).
+    """
+    for end in range(len(prefix) - 1, -1, -1):
+        code = ord(prefix[end]) + 1
+        if code <= 0x10FFFF:
+            return prefix[:end] + chr(0xE000 if 0xD800 <= code <= 0xDFFF else code)
+    return None
+
+
+def _customer_filters(name=None, status=None, sentiment=None):
+    """WHERE clauses and parameters shared by the paginated list and its count."""
+    clauses, params = [], []
+    if name:
+        # Prefix range instead of LIKE, so the Customers(Name) index can be used
+        clauses.append("c.Name >= ?")
+        params.append(name)
+        upper = _prefix_successor(name)
+        if upper is not None:
+            clauses.append("c.Name < ?")
+            params.append(upper)
+    if status:
+        clauses.append("ih.LastDealStatus = ?")
+        params.append(status)
+    if sentiment:
+        clauses.append("UPPER(ih.Sentiment) = UPPER(?)")
+        params.append(sentiment)
+    return clauses, params
+
+
+_LATEST_INTERACTION_JOIN = """
+FROM Customers c
+LEFT JOIN InteractionHistory ih ON ih.InteractionID = (
+    SELECT InteractionID FROM InteractionHistory
+    WHERE CustomerID = c.CustomerID
+    ORDER BY InteractionDate DESC, InteractionID DESC
+    LIMIT 1
+)
+"""
+
+
+@tracing.traced(kind="db")
+def fetch_customer_page(after=None, page_size=50, name=None, status=None, sentiment=None):
+    """
+    Fetch one page of customers with their latest interaction, ordered by name.
+
+    Uses keyset pagination: pass the (Name, CustomerID) of the last row of the previous page as
+    `after`, so every page costs the same regardless of how deep it is. Notes are not included.
+
+    Args:
+        after (tuple): (Name, CustomerID) to continue after, or None for the first page.
+        page_size (int): Maximum number of rows.
+        name (str): Only customers whose name starts with this prefix (case-sensitive).
+        status (str): Only customers whose latest LastDealStatus equals this.
+        sentiment (str): Only customers whose latest sentiment equals this (case-insensitive).
+
+    Returns:
+        tuple: (DataFrame of CUSTOMER_PAGE_COLUMNS, cursor for the next page or None on the last page).
+    """
+    clauses, params = _customer_filters(name, status, sentiment)
+    if after is not None:
+        clauses.append("(c.Name, c.CustomerID) > (?, ?)")
+        params += list(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+    SELECT c.CustomerID, c.Name, c.Email, c.Phone,
+           ih.LastDealStatus, ih.InteractionDate, ih.Sentiment, ih.Tone, ih.Intention
+    {_LATEST_INTERACTION_JOIN}
+    {where}
+    ORDER BY c.Name, c.CustomerID
+    LIMIT ?
+    """
+    with pool.connection() as conn:
+        rows = conn.execute(query, params + [page_size + 1]).fetchall()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][1], rows[-1][0])
+    return pd.DataFrame(rows, columns=CUSTOMER_PAGE_COLUMNS), next_cursor
+
+
+@tracing.traced(kind="db")
+def count_customers(name=None, status=None, sentiment=None):
+    """Number of customers matching the same filters as fetch_customer_page."""
+    clauses, params = _customer_filters(name, status, sentiment)
+    # The latest-interaction join is only needed when filtering on it
+    join = _LATEST_INTERACTION_JOIN if status or sentiment else "FROM Customers c"
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with pool.connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) {join} {where}", params).fetchone()[0]
+
+
+@tracing.traced(kind="db")
+def fetch_customer_notes(customer_id, limit=20):
+    """
+    Fetch the most recent interactions of one customer, notes included.
+
+    Returns:
+        DataFrame: InteractionDate, LastDealStatus, Sentiment, Tone, Intention and Notes, newest first.
+    """
+    query = """
+    SELECT InteractionDate, LastDealStatus, Sentiment, Tone, Intention, Notes
+    FROM InteractionHistory
+    WHERE CustomerID = ?
+    ORDER BY InteractionDate DESC, InteractionID DESC
+    LIMIT ?
+    """
+    with pool.connection() as conn:
+        return pd.read_sql_query(query, conn, params=(customer_id, limit))
+
+
+@tracing.traced("db.import_batch", kind="db")
+def _import_batch(rows):
+    """Insert one batch of CSV rows in a single write transaction; returns (interactions, recommendations)."""
+    with pool.transaction(immediate=True) as conn:
+        # IDs are assigned explicitly so executemany can link the three tables; holding the write
+        # lock makes this safe, and AUTOINCREMENT's sequence is never reused
+        last_id = conn.execute(
+            """
+            SELECT MAX(IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'Customers'), 0),
+                       IFNULL((SELECT MAX(CustomerID) FROM Customers), 0))
+            """
+        ).fetchone()[0]
+        ids = range(last_id + 1, last_id + 1 + len(rows))
+        conn.executemany(
+            "INSERT INTO Customers (CustomerID, Name, Email, Phone) VALUES (?, ?, ?, ?)",
+            [(customer_id, row["Name"], row.get("Email"), row.get("Phone")) for customer_id, row in zip(ids, rows)],
+        )
+        interactions = [
+            (customer_id, row.get("LastDealStatus") or "New", row.get("InteractionDate"), row.get("Notes"),
+             row.get("Sentiment"), row.get("Tone"), row.get("Intention"))
+            for customer_id, row in zip(ids, rows)
+            if any(row.get(column) for column in ("LastDealStatus", "InteractionDate", "Notes", "Sentiment", "Tone", "Intention"))
+        ]
+        conn.executemany(
+            """
+            INSERT INTO InteractionHistory (CustomerID, LastDealStatus, InteractionDate, Notes, Sentiment, Tone, Intention)
+            VALUES (?, ?, COALESCE(?, datetime('now')), ?, ?, ?, ?)
+            """,
+            interactions,
+        )
+        recommendations = [
+            (customer_id, row["RecommendedDeal"], row.get("RecommendationDate"))
+            for customer_id, row in zip(ids, rows)
+            if row.get("RecommendedDeal")
+        ]
+        conn.executemany(
+            "INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date) VALUES (?, ?, COALESCE(?, datetime('now')))",
+            recommendations,
+        )
+    return len(interactions), len(recommendations)
+
+
+def import_customers_csv(csv_path, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Bulk-load customers from a CSV file, one customer per row with optional interaction and
+    recommendation columns (see IMPORT_COLUMNS; only Name is required).
+
+    Rows are inserted with executemany in transactions of `batch_size` customers, so a failure
+    only rolls back the batch it happened in. Rows without a Name are skipped; empty cells are
+    stored as NULL and missing dates default to now.
+
+    Returns:
+        dict: Counts of imported customers, interactions, recommendations and skipped rows.
+    """
+    report = {"customers": 0, "interactions": 0, "recommendations": 0, "skipped": 0}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = {"Name"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{csv_path} has no {', '.join(sorted(missing))} column.")
+        batch = []
+        for row in reader:
+            row = {key: (value.strip() or None) if isinstance(value, str) else value for key, value in row.items()}
+            if not row.get("Name"):
+                report["skipped"] += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                interactions, recommendations = _import_batch(batch)
+                report["customers"] += len(batch)
+                report["interactions"] += interactions
+                report["recommendations"] += recommendations
+                batch = []
+        if batch:
+            interactions, recommendations = _import_batch(batch)
+            report["customers"] += len(batch)
+            report["interactions"] += interactions
+            report["recommendations"] += recommendations
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import customers into the CRM database from CSV.")
+    parser.add_argument("csv_path", help=f"CSV with the columns {', '.join(IMPORT_COLUMNS)} (only Name is required)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    migrate(DB_PATH)
+    print(import_customers_csv(args.csv_path, args.batch_size))
@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: exclusive byte-range locks instead of flock
+    fcntl = None
+    import msvcrt
+
+# Cache settings
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # or float16 to halve disk/RAM
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+KEY_SIZE = 16  # bytes per content hash
+ACCESS_FLUSH_SECONDS = 60  # how often lookups persist last-use times
+
+
+class EmbeddingStore:
+    """
+    Content-hash-keyed embedding store backed by a memory-mapped array.
+
+    Files in `path`:
+        vectors.bin  raw (capacity x dim) array of float32/float16 rows, memory-mapped
+        keys.bin     append-only 16-byte content hashes; the i-th hash owns row i
+        access.npy   last-use time (ms) per row, merged from every process; decides what compaction keeps
+        meta.json    dim, dtype, capacity and a generation bumped by every compaction
+        lock         held shared while reading rows and exclusively while appending, growing or compacting
+
+    Several processes (indexing.py and every app process) may share the directory. Under the
+    lock, each one picks up the keys the others appended before it looks up or appends, and
+    reloads everything when another process has compacted the store.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_DIR, dim=768, dtype=EMBEDDING_CACHE_DTYPE, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(self._file("lock"), "a+b")
+
+        with self._locked(exclusive=True):
+            if not os.path.exists(self._file("meta.json")):
+                self.dim, self.dtype, self.capacity, self.generation = dim, np.dtype(dtype), 1024, 0
+                self._write_meta()
+            self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _locked(self, exclusive):
+        # The thread lock orders this process's threads; the file lock orders processes
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                else:
+                    self._lock_file.seek(0)
+                    msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read_meta(self):
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "capacity": self.capacity,
+                       "generation": self.generation}, f)
+
+    def _open_vectors(self):
+        nbytes = self.capacity * self.dim * self.dtype.itemsize
+        with open(self._file("vectors.bin"), "ab+") as f:
+            if os.path.getsize(self._file("vectors.bin")) < nbytes:
+                f.truncate(nbytes)
+        return np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r+", shape=(self.capacity, self.dim))
+
+    def _load(self):
+        # Read the whole store from disk; caller holds the file lock
+        meta = self._read_meta()
+        self.dim, self.dtype, self.capacity = meta["dim"], np.dtype(meta["dtype"]), meta["capacity"]
+        self.generation = meta.get("generation", 0)
+        self._vectors = self._open_vectors()
+        with open(self._file("keys.bin"), "ab+") as f:
+            f.seek(0)
+            raw = f.read()
+        count = min(len(raw) // KEY_SIZE, self.capacity)
+        self._index = {raw[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(count)}
+        self._count = count
+        self._keys_stat = self._stat_keys()
+
+        access_path = self._file("access.npy")
+        self._access = np.zeros(self.capacity, dtype=np.uint64)
+        if os.path.exists(access_path):
+            saved = np.load(access_path)
+            n = min(len(saved), self.capacity)
+            self._access[:n] = saved[:n]
+        self._last_flush = time.monotonic()
+
+    def _stat_keys(self):
+        stat = os.stat(self._file("keys.bin"))
+        return stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        # Pick up what other processes appended, grew or compacted; caller holds the file lock
+        keys_stat = self._stat_keys()
+        if keys_stat == self._keys_stat:
+            return
+        meta = self._read_meta()
+        if meta.get("generation", 0) != self.generation:
+            self._load()
+            return
+        if meta["capacity"] != self.capacity:
+            self._resize(meta["capacity"])
+        with open(self._file("keys.bin"), "rb") as f:
+            f.seek(self._count * KEY_SIZE)
+            raw = f.read()
+        appended = min(len(raw) // KEY_SIZE, self.capacity - self._count)
+        for i in range(appended):
+            self._index[raw[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = self._count + i
+        self._count += appended
+        self._keys_stat = keys_stat
+
+    def _resize(self, capacity):
+        self._vectors.flush()
+        del self._vectors
+        self.capacity = capacity
+        self._vectors = self._open_vectors()
+        access = np.zeros(capacity, dtype=np.uint64)
+        access[:min(len(self._access), capacity)] = self._access[:capacity]
+        self._access = access
+
+    @staticmethod
+    def _now():
+        return np.uint64(time.time() * 1000)
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key):
+        """Return the cached vector for a content hash as float32, or None."""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Return the cached float32 vector of each content hash, None where there is none."""
+        with self._locked(exclusive=False):
+            self._refresh()
+            now = self._now()
+            vectors = []
+            for key in keys:
+                row = self._index.get(key)
+                if row is None:
+                    vectors.append(None)
+                    continue
+                self._access[row] = now
+                vectors.append(np.array(self._vectors[row], dtype=np.float32))
+            due = time.monotonic() - self._last_flush > ACCESS_FLUSH_SECONDS
+        if due:
+            self.flush_access()
+        return vectors
+
+    def put_many(self, keys, vectors):
+        """Append vectors for content hashes that are not in the store yet."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index:
+                    new.setdefault(key, vector)
+            if not new:
+                return
+            if self._count + len(new) > self.max_entries:
+                self._compact(max(int(self.max_entries * 0.75) - len(new), 0))
+            while self._count + len(new) > self.capacity:
+                self._grow(self.capacity * 2)
+
+            start = self._count
+            block = np.asarray(list(new.values()), dtype=np.float32)
+            if block.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vectors, got {block.shape[1]}-d.")
+            self._vectors[start:start + len(new)] = block.astype(self.dtype)
+            self._vectors.flush()
+            # Keys are appended only after their rows are on disk
+            now = self._now()
+            with open(self._file("keys.bin"), "ab") as f:
+                f.write(b"".join(new))
+            for offset, key in enumerate(new):
+                self._index[key] = start + offset
+                self._access[start + offset] = now
+            self._count += len(new)
+            self._keys_stat = self._stat_keys()
+
+    def _grow(self, capacity):
+        self._resize(capacity)
+        self._write_meta()
+
+    def _merge_access(self):
+        # Combine our last-use times with those other processes saved, keeping the latest
+        access_path = self._file("access.npy")
+        if os.path.exists(access_path):
+            saved = np.load(access_path)
+            n = min(len(saved), self._count)
+            np.maximum(self._access[:n], saved[:n], out=self._access[:n])
+
+    def _save_access(self):
+        tmp_path = self._file("access.tmp.npy")
+        np.save(tmp_path, self._access[:self._count])
+        os.replace(tmp_path, self._file("access.npy"))
+        self._last_flush = time.monotonic()
+
+    def _compact(self, keep):
+        # Keep the `keep` most recently used rows and rewrite the files densely
+        self._merge_access()
+        rows = np.argsort(self._access[:self._count])[::-1][:keep]
+        rows = np.sort(rows)
+        keys_by_row = {row: key for key, row in self._index.items()}
+        kept_keys = [keys_by_row[row] for row in rows]
+        kept_vectors = np.array(self._vectors[rows])
+        kept_access = self._access[rows]
+
+        self._vectors[:len(rows)] = kept_vectors
+        self._vectors.flush()
+        with open(self._file("keys.bin.tmp"), "wb") as f:
+            f.write(b"".join(kept_keys))
+        os.replace(self._file("keys.bin.tmp"), self._file("keys.bin"))
+
+        self._index = {key: i for i, key in enumerate(kept_keys)}
+        self._count = len(kept_keys)
+        self._access = np.zeros(self.capacity, dtype=np.uint64)
+        self._access[:self._count] = kept_access
+        self._save_access()
+        # Tells the other processes that rows moved and they must reload
+        self.generation += 1
+        self._write_meta()
+        self._keys_stat = self._stat_keys()
+        print(f"Compacted embedding cache to {self._count} entries.")
+
+    def compact(self, keep=None):
+        """Drop all but the `keep` most recently used entries (default: 75% of max_entries)."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._compact(min(self._count, keep if keep is not None else int(self.max_entries * 0.75)))
+
+    def flush_access(self):
+        """Persist last-use times, merged with other processes', so compaction keeps the hot entries."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._merge_access()
+            self._save_access()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only runs the encoder for texts not already in the store.
+
+    Args:
+        embeddings: The underlying embeddings model (e.g. HuggingFaceEmbeddings).
+        store (EmbeddingStore): Where vectors are cached; created on first use if None.
+    """
+
+    def __init__(self, embeddings, store=None):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model_name", type(embeddings).__name__)
+        self._store = store
+        self._store_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = EmbeddingStore()
+        return self._store
+
+    def _key(self, kind, text):
+        return hashlib.blake2b(f"{self.model_name}\0{kind}\0{text}".encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    def _embed(self, kind, texts, compute):
+        keys = [self._key(kind, text) for text in texts]
+        vectors = self.store.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+        with self._stats_lock:
+            self.stats["hits"] += len(texts) - len(missing)
+            self.stats["misses"] += len(missing)
+
+        if missing:
+            computed = compute(list(missing.values()))
+            self.store.put_many(list(missing.keys()), computed)
+            by_key = dict(zip(missing.keys(), computed))
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_documents(self, texts):
+        return self._embed("doc", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def get_stats(self):
+        """Encoder forward passes avoided (hits) and run (misses) since startup."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return dict(stats, entries=len(self.store))
+
+
+if __name__ == "__main__":
+    # Compact the on-disk cache, e.g. from a nightly job
+    store = EmbeddingStore()
+    print(f"Embedding cache holds {len(store)} entries (capacity {store.capacity}).")
+    store.compact()
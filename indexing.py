@@ -1,74 +1,371 @@
 import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
 from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.embeddings.huggingface import HuggingFaceEmbeddings
+from embedding_cache import CachedEmbeddings
+from catalog_filter import AttributeIndex, NUMERIC_COLUMNS, CATEGORICAL_COLUMNS
+from catalog_source import (
+    INGEST_CHUNK_ROWS, REQUIRED_COLUMNS,
+    read_catalog_chunks, catalog_row_count, product_texts, row_keys,
+)
+import semantic_cache
+from profile_candidates import compute_profile_candidates, save_profile_candidates
+import ann_index
 load_dotenv(dotenv_path="config.env")
 
 # Set Hugging Face API key
 os.environ["HUGGINGFACE_API_KEY"] = os.getenv("HUGGINGFACE_API_KEY")
 
-# Initialize embeddings model
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+# Initialize embeddings model; vectors are cached on disk by content hash
+embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2"))
 
 # Initialize FAISS vector store globally (empty at the start)
 vector_store = None
 
-def ingest_product_data(xlsx_path: str):
+# Per-row content hashes of the indexed catalog, saved next to the index
+MANIFEST_FILE = "manifest.json"
+manifest = {}
+
+# Structured columns (price, year, fuel, ...) used to pre-filter searches
+attribute_index = None
+
+# Type and parameters of the FAISS index (see ann_index.py)
+index_config = {"type": "flat"}
+
+# Nearest products of every (tone, sentiment, intention) profile query (see profile_candidates.py)
+profile_candidates = None
+
+# Streaming ingestion settings, configurable through config.env
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "256"))  # texts per encoder call
+INGEST_CHECKPOINT_ROWS = int(os.getenv("INGEST_CHECKPOINT_ROWS", "100000"))  # 0 disables checkpoints
+INGEST_PROGRESS_SECONDS = 10
+
+# An interrupted ingest is checkpointed in "<index_dir>.checkpoint" until save_index succeeds
+CHECKPOINT_SUFFIX = ".checkpoint"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# The only columns kept from each chunk once it is embedded, for the AttributeIndex
+ATTRIBUTE_COLUMNS = list(NUMERIC_COLUMNS.values()) + list(CATEGORICAL_COLUMNS.values())
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(index_dir: str):
+    """
+    Load the row-id -> content-hash manifest stored next to the index, or {} if there is none.
+    """
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StreamingIndex:
+    """
+    Adds embedded batches to a FAISS vector store as they arrive.
+
+    Without an existing store, the index is created on the first batch, sized for
+    `expected_rows`. An IVF index must be trained before anything is added, so its first
+    ann_index.train_size vectors are held back, trained on and then added.
     """
-    Ingest product data from an XLSX file and add it to the FAISS vector store.
+
+    def __init__(self, store=None, index_type=ann_index.INDEX_TYPE, expected_rows=0, config=None):
+        self.store = store
+        self.index_type = index_type
+        self.expected_rows = expected_rows
+        self.config = config
+        self._pending = []  # (ids, texts, vectors) waiting for the index to be trained
+        self._pending_rows = 0
+
+    @property
+    def ready(self):
+        """True when every vector added so far is in the index, i.e. the store can be checkpointed."""
+        return self.store is not None and not self._pending
+
+    def add(self, ids, texts, vectors):
+        if self.store is None:
+            self.config = ann_index.resolve_config(self.index_type, self.expected_rows, vectors.shape[1])
+            self.store = FAISS(embeddings, ann_index.create_index(self.config), InMemoryDocstore({}), {})
+        if self.store.index.is_trained:
+            self._add(ids, texts, vectors)
+            return
+        self._pending.append((ids, texts, vectors))
+        self._pending_rows += len(ids)
+        if self._pending_rows >= ann_index.train_size(self.config):
+            self.flush()
+
+    def flush(self):
+        """Train the index on the held-back vectors if it still needs training, then add them."""
+        if not self._pending:
+            return
+        if not self.store.index.is_trained:
+            self.store.index.train(np.concatenate([vectors for _, _, vectors in self._pending]))
+        for ids, texts, vectors in self._pending:
+            self._add(ids, texts, vectors)
+        self._pending, self._pending_rows = [], 0
+
+    def _add(self, ids, texts, vectors):
+        self.store.add_embeddings(list(zip(texts, vectors)), ids=ids)
+
+
+class _Progress:
+    """Prints rows done, throughput and ETA, at most every INGEST_PROGRESS_SECONDS."""
+
+    def __init__(self, total_rows, start_rows=0):
+        self.total_rows = total_rows
+        self.start_rows = start_rows
+        self.started = self._printed = time.perf_counter()
+
+    def update(self, rows, force=False):
+        now = time.perf_counter()
+        if not force and now - self._printed < INGEST_PROGRESS_SECONDS:
+            return
+        self._printed = now
+        rate = (rows - self.start_rows) / max(now - self.started, 1e-9)
+        if self.total_rows and rate:
+            remaining = max(self.total_rows - rows, 0) / rate
+            print(f"Ingested {rows}/{self.total_rows} rows ({min(rows / self.total_rows, 1):.0%}), "
+                  f"{rate:.0f} rows/s, ETA {remaining // 60:.0f}m {remaining % 60:02.0f}s.")
+        else:
+            print(f"Ingested {rows} rows, {rate:.0f} rows/s.")
+
+
+def _checkpoint_dir(index_dir):
+    return index_dir.rstrip("/\\") + CHECKPOINT_SUFFIX
+
+
+def _save_checkpoint(index_dir, writer, state):
+    # Written next to the old checkpoint and swapped in, so a crash never leaves half of one
+    path = _checkpoint_dir(index_dir)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    writer.store.save_local(tmp_path)
+    ann_index.save_config(tmp_path, writer.config)
+    with open(os.path.join(tmp_path, CHECKPOINT_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(index_dir, state):
+    """
+    Load the checkpoint of an interrupted ingest of the same catalog with the same settings.
+    Returns:
+        tuple: (partial vector store, its index config, ingest mode, rows done), or None.
+    """
+    path = _checkpoint_dir(index_dir)
+    try:
+        with open(os.path.join(path, CHECKPOINT_FILE), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    mode, rows_done = saved.pop("mode"), saved.pop("rows_done")
+    if saved != state:
+        print("Catalog or ingest settings changed since the last checkpoint, starting over.")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+    store = load_index(path)
+    if store is None:
+        return None
+    print(f"Resuming ingestion after row {rows_done}.")
+    return store, ann_index.load_config(path), mode, rows_done
+
+
+def _stream_catalog(catalog_path, mode, writer, old_manifest, expected_rows, chunk_rows, batch_size,
+                    skip_rows=0, checkpoint=None):
+    """
+    Read, embed and index the catalog chunk by chunk.
+    In "rebuild" mode every row is embedded into `writer`. In "update" mode `writer` holds the
+    saved index and only rows whose content hash differs from `old_manifest` are embedded, after
+    deleting their old vectors. The first `skip_rows` rows are already in the store (resumed
+    from a checkpoint): they are read for the manifest but not embedded again.
+    Returns:
+        tuple: (new manifest, DataFrame of ATTRIBUTE_COLUMNS in manifest order), or None if an
+        update has to delete rows from an index that cannot delete.
+    """
+    new_manifest = {}
+    attributes = []
+    seen = {}
+    removable = writer.store is None or ann_index.supports_remove(writer.store.index)
+    progress = _Progress(expected_rows, skip_rows)
+    rows_read = 0
+    checkpointed = skip_rows
+
+    for chunk in read_catalog_chunks(catalog_path, chunk_rows):
+        if not rows_read:
+            for col in REQUIRED_COLUMNS:
+                if col not in chunk.columns:
+                    raise KeyError(f"Missing required column: {col}")
+        texts = product_texts(chunk)
+        keys = row_keys(chunk, seen)
+        hashes = [content_hash(text) for text in texts]
+        new_manifest.update(zip(keys, hashes))
+        attributes.append(chunk[ATTRIBUTE_COLUMNS].copy())
+        rows_read += len(chunk)
+        if rows_read <= skip_rows:
+            continue
+
+        if mode == "update":
+            changed = [key for key, digest in zip(keys, hashes) if old_manifest.get(key, digest) != digest]
+            if changed:
+                if not removable:
+                    return None
+                writer.store.delete(changed)
+            rows = [i for i, (key, digest) in enumerate(zip(keys, hashes)) if old_manifest.get(key) != digest]
+        else:
+            rows = list(range(len(keys)))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            batch_texts = [texts[i] for i in batch]
+            vectors = np.asarray(embeddings.embed_documents(batch_texts), dtype=np.float32)
+            writer.add([keys[i] for i in batch], batch_texts, vectors)
+
+        progress.update(rows_read)
+        if checkpoint and INGEST_CHECKPOINT_ROWS and rows_read - checkpointed >= INGEST_CHECKPOINT_ROWS and writer.ready:
+            checkpoint(writer, mode, rows_read)
+            checkpointed = rows_read
+
+    if mode == "update":
+        removed = [key for key in old_manifest if key not in new_manifest]
+        if removed:
+            if not removable:
+                return None
+            writer.store.delete(removed)
+    writer.flush()
+    if writer.store is None:
+        raise ValueError(f"No product rows in '{catalog_path}'.")
+    progress.update(rows_read, force=True)
+    return new_manifest, pd.concat(attributes, ignore_index=True)
+
+
+def ingest_product_data(catalog_path: str, index_dir: str = "vector_store_index", index_type: str = ann_index.INDEX_TYPE,
+                        chunk_rows: int = INGEST_CHUNK_ROWS, batch_size: int = INGEST_EMBED_BATCH, resume: bool = True):
+    """
+    Stream product data from an xlsx, CSV or Parquet catalog into the FAISS vector store.
+    The catalog is read `chunk_rows` rows at a time and embedded `batch_size` texts per call,
+    so apart from the index itself, memory does not grow with the catalog.
+    If an index with a manifest already exists in `index_dir`, only new or changed rows are
+    embedded and removed rows are deleted; otherwise the store is built from scratch.
+    Progress is checkpointed every INGEST_CHECKPOINT_ROWS rows until save_index succeeds.
     Args:
-        xlsx_path (str): Path to the XLSX file containing product data.
+        catalog_path (str): Path to the .xlsx, .csv or .parquet file containing product data.
+        index_dir (str): Directory of the previously saved index to update.
+        index_type (str): One of ann_index.INDEX_TYPES; changing it forces a rebuild.
+        chunk_rows (int): Catalog rows read at a time.
+        batch_size (int): Texts per embedding call.
+        resume (bool): Continue from the checkpoint of an interrupted ingest of the same catalog.
+    Returns:
+        dict: Counts of added, changed, removed and unchanged rows, or None on error.
     """
-    global vector_store
+    global vector_store, manifest, attribute_index, index_config, profile_candidates
 
     try:
-        # Read product data from Excel file
-        product_data = pd.read_excel(xlsx_path)
-        
-        # Required columns
-        required_columns = [
-            "Name", "Location", "Year", "Kilometers_Driven", "Fuel_Type", 
-            "Transmission", "Owner_Type", "Mileage", "Engine", "Power", 
-            "Seats", "Price"
-        ]
-        
-        # Validate required columns
-        for col in required_columns:
-            if col not in product_data.columns:
-                raise KeyError(f"Missing required column: {col}")
-        
-        # Generate text representations
-        product_texts = product_data.apply(
-            lambda row: (
-                f"Name: {row['Name']} | Location: {row['Location']} | Year: {row['Year']} | "
-                f"Kilometers Driven: {row['Kilometers_Driven']} | Fuel Type: {row['Fuel_Type']} | "
-                f"Transmission: {row['Transmission']} | Owner Type: {row['Owner_Type']} | "
-                f"Mileage: {row['Mileage']} | Engine: {row['Engine']} | Power: {row['Power']} | "
-                f"Seats: {row['Seats']} | Price: {row['Price']} lakhs"
-            ),
-            axis=1
-        ).tolist()
-        
-        # Add texts to FAISS vector store
-        vector_store = FAISS.from_texts(product_texts, embeddings)
-        print(f"Indexed {len(product_texts)} product records.")
+        expected_rows = catalog_row_count(catalog_path)
+
+        # Reuse the saved index when its manifest tells us what is already embedded
+        old_manifest = load_manifest(index_dir)
+        saved_config = ann_index.load_config(index_dir)
+        wanted_type = ann_index.resolve_config(index_type, expected_rows, saved_config.get("dim", 768))["type"]
+        mode = "update" if old_manifest and saved_config["type"] == wanted_type else "rebuild"
+
+        stat = os.stat(catalog_path)
+        state = {
+            "catalog": [os.path.abspath(catalog_path), stat.st_size, stat.st_mtime_ns],
+            "chunk_rows": chunk_rows,
+            "index_type": index_type,
+            "base_index": semantic_cache.index_version(index_dir),
+        }
+        resumed = _load_checkpoint(index_dir, state) if resume else None
+        if resumed:
+            store, config, stream_mode, skip_rows = resumed
+        else:
+            store, config, stream_mode, skip_rows = None, None, mode, 0
+            if mode == "update":
+                store, config = load_index(index_dir), saved_config
+                if store is None:
+                    mode = stream_mode = "rebuild"
+        base_manifest = old_manifest if mode == "update" else {}
+
+        def checkpoint(writer, stream_mode, rows_done):
+            _save_checkpoint(index_dir, writer, {**state, "mode": stream_mode, "rows_done": rows_done})
+
+        started = time.perf_counter()
+        writer = StreamingIndex(store, index_type, expected_rows, config)
+        result = _stream_catalog(catalog_path, stream_mode, writer, old_manifest, expected_rows,
+                                 chunk_rows, batch_size, skip_rows, checkpoint)
+        if result is None:
+            # Only flat indexes delete in step with the docstore ids; rebuilding is cheap since unchanged rows hit the embedding cache
+            print(f"{saved_config['type']} index cannot delete rows, rebuilding it.")
+            writer = StreamingIndex(None, index_type, expected_rows)
+            result = _stream_catalog(catalog_path, "rebuild", writer, {}, expected_rows,
+                                     chunk_rows, batch_size, 0, checkpoint)
+        new_manifest, attribute_data = result
+        elapsed = time.perf_counter() - started
+
+        added = [key for key in new_manifest if key not in base_manifest]
+        changed = [key for key in new_manifest if key in base_manifest and base_manifest[key] != new_manifest[key]]
+        removed = [key for key in base_manifest if key not in new_manifest]
+        report = {
+            "added": len(added),
+            "changed": len(changed),
+            "removed": len(removed),
+            "unchanged": len(new_manifest) - len(added) - len(changed),
+        }
+
+        store = writer.store
+        index_config = writer.config
+        ann_index.apply_search_params(store.index, index_config)
+        vector_store = store
+        manifest = new_manifest
+        attribute_index = AttributeIndex.from_dataframe(attribute_data, list(new_manifest))
+        # Recomputed on every ingest: positions shift when rows are added or removed
+        profile_candidates = compute_profile_candidates(store)
+        embeddings.store.flush_access()
+        stats = embeddings.get_stats()
+        print(f"Embedding cache: {stats['hits']} encoder passes avoided, {stats['misses']} computed.")
+        print(
+            f"Indexed {len(new_manifest)} product records in {elapsed:.1f}s "
+            f"({len(new_manifest) / max(elapsed, 1e-9):.0f} rows/s; {report['added']} added, "
+            f"{report['changed']} changed, {report['removed']} removed, {report['unchanged']} unchanged)."
+        )
+        return report
     except FileNotFoundError:
-        print(f"Error: File '{xlsx_path}' not found. Please check the path and try again.")
-    except KeyError as e:
+        print(f"Error: File '{catalog_path}' not found. Please check the path and try again.")
+    except (KeyError, ValueError) as e:
         print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred during ingestion: {e}")
+    return None
 
 def save_index(index_file: str):
     """
-    Save the FAISS vector store index to a file.
+    Save the FAISS vector store index and its row manifest to a file.
+    Removes the checkpoint of the ingest that built it.
     Args:
         index_file (str): Path to save the index file.
     """
     try:
         if vector_store:
             vector_store.save_local(index_file)
+            with open(os.path.join(index_file, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            if attribute_index is not None:
+                attribute_index.save(index_file)
+            ann_index.save_config(index_file, index_config)
+            if profile_candidates is not None:
+                save_profile_candidates(index_file, profile_candidates)
+            shutil.rmtree(_checkpoint_dir(index_file), ignore_errors=True)
             print(f"Index successfully saved to '{index_file}'.")
         else:
             print("No vector store to save.")
@@ -84,6 +381,7 @@ def load_index(index_file: str):
     try:
         # Enable dangerous deserialization explicitly
         vector_store = FAISS.load_local(index_file, embeddings, allow_dangerous_deserialization=True)
+        ann_index.apply_search_params(vector_store.index, ann_index.load_config(index_file))
         print(f"Index successfully loaded from '{index_file}'.")
         return vector_store
     except Exception as e:
@@ -91,17 +389,22 @@ def load_index(index_file: str):
         return None
 
 if __name__ == "__main__":
-    # Paths for data and index
-    product_xlsx = "product_details.xlsx"  # Replace with your Excel file path
-    index_output = "vector_store_index"   # Desired FAISS index file name
+    parser = argparse.ArgumentParser(description="Embed the product catalog into the FAISS vector store.")
+    parser.add_argument("catalog", nargs="?", default="product_details.xlsx", help="Catalog file (.xlsx, .csv or .parquet)")
+    parser.add_argument("--index-dir", default="vector_store_index", help="Desired FAISS index directory")
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_EMBED_BATCH)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
 
     # Ingest data and save index
     print("Starting product data ingestion...")
-    ingest_product_data(product_xlsx)
-    
+    ingest_product_data(args.catalog, args.index_dir, chunk_rows=args.chunk_rows, batch_size=args.batch_size,
+                        resume=not args.no_resume)
+
     print("Saving the vector store index...")
-    save_index(index_output)
-    
+    save_index(args.index_dir)
+
     # Load the index
     print("Loading the vector store index...")
-    loaded_vector_store = load_index(index_output)
\ No newline at end of file
+    loaded_vector_store = load_index(args.index_dir)
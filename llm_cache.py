@@ -0,0 +1,235 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from langchain.schema import AIMessage
+from langchain_core.messages import AIMessageChunk
+from prompt_builder import count_tokens
+import tracing
+
+# Cache settings
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Counters shared by every cached client in the process
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "latency_saved": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_cache_stats():
+    """
+    Return a snapshot of the hit/miss counters and the LLM latency saved by cache hits (seconds).
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def normalize_prompt(prompt):
+    """
+    Flatten a prompt (string or list of messages) and collapse whitespace,
+    so reformatted copies of the same prompt share a cache entry.
+    """
+    if isinstance(prompt, str):
+        text = prompt
+    else:
+        text = "\n".join(f"{getattr(m, 'type', 'human')}: {getattr(m, 'content', m)}" for m in prompt)
+    return " ".join(text.split())
+
+
+class CachedLLM:
+    """
+    Wraps a chat model with a persistent, prompt-keyed response cache.
+
+    Entries are keyed by model name plus a hash of the normalized prompt and stored in SQLite.
+    Entries older than `ttl` seconds are ignored, and the least recently used entries are
+    evicted once the cache holds more than `max_entries`. Any attribute not defined here
+    is forwarded to the wrapped model.
+    """
+
+    def __init__(self, llm, db_path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self._llm = llm
+        self.model_name = getattr(llm, "model_name", type(llm).__name__)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS LLMCache (
+                Key TEXT PRIMARY KEY,
+                Model TEXT,
+                Response TEXT,
+                CreatedAt REAL,
+                LastAccess REAL,
+                Latency REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llmcache_lastaccess ON LLMCache (LastAccess)")
+        self._conn.commit()
+
+    def __getattr__(self, name):
+        if name == "_llm":
+            raise AttributeError(name)
+        return getattr(self._llm, name)
+
+    def cache_key(self, prompt):
+        digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT Response, CreatedAt, Latency FROM LLMCache WHERE Key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at, latency = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM LLMCache WHERE Key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE LLMCache SET LastAccess = ? WHERE Key = ?", (now, key))
+            self._conn.commit()
+        return response, latency
+
+    def _store(self, key, response, latency):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO LLMCache (Key, Model, Response, CreatedAt, LastAccess, Latency) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.model_name, response, now, now, latency),
+            )
+            # Drop expired entries, then the least recently used ones above the size bound
+            self._conn.execute("DELETE FROM LLMCache WHERE CreatedAt < ?", (now - self.ttl,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM LLMCache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM LLMCache WHERE Key IN (SELECT Key FROM LLMCache ORDER BY LastAccess LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def invoke(self, prompt, use_cache=True, **kwargs):
+        """
+        Invoke the wrapped model, serving identical prompts from the cache.
+
+        Args:
+            prompt: A prompt string or a list of messages.
+            use_cache (bool): Set to False at call sites that must always get a fresh completion.
+        """
+        with tracing.span("llm.invoke", kind="llm", model=self.model_name) as span:
+            span.set(prompt_tokens=count_tokens(normalize_prompt(prompt)))
+            response = self._invoke(prompt, use_cache, span, **kwargs)
+            span.set(response_tokens=count_tokens(response.content))
+            return response
+
+    def _invoke(self, prompt, use_cache, span, **kwargs):
+        if not use_cache:
+            _count("bypassed")
+            span.set(cache="bypassed")
+            return self._llm.invoke(prompt, **kwargs)
+
+        key = self.cache_key(prompt)
+        try:
+            cached = self._lookup(key)
+        except sqlite3.Error as e:
+            print(f"LLM cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            response, latency = cached
+            _count("hits")
+            _count("latency_saved", latency or 0.0)
+            span.set(cache="hit")
+            return AIMessage(content=response)
+
+        _count("misses")
+        span.set(cache="miss")
+        start = time.perf_counter()
+        response = self._llm.invoke(prompt, **kwargs)
+        latency = time.perf_counter() - start
+        try:
+            self._store(key, response.content, latency)
+        except sqlite3.Error as e:
+            print(f"LLM cache store failed: {e}")
+        return response
+
+    def stream(self, prompt, use_cache=True, **kwargs):
+        """
+        Stream the wrapped model's completion chunk by chunk.
+
+        A cache hit is yielded as a single chunk. On a miss the full text is stored once the
+        stream completes, so an interrupted stream never leaves a truncated entry behind.
+        """
+        span = tracing.start_span("llm.stream", kind="llm", model=self.model_name)
+        span.set(prompt_tokens=count_tokens(normalize_prompt(prompt)))
+        start = time.perf_counter()
+        parts = []
+        try:
+            for chunk in self._stream(prompt, use_cache, span, **kwargs):
+                if not parts:
+                    span.set(first_token_ms=round((time.perf_counter() - start) * 1000, 1))
+                parts.append(chunk.content)
+                yield chunk
+        except GeneratorExit:
+            span.set(closed_early=True)
+            raise
+        except Exception as e:
+            span.end(e)
+            raise
+        finally:
+            if span.duration is None:
+                span.set(response_tokens=count_tokens("".join(parts)))
+                span.end()
+
+    def _stream(self, prompt, use_cache, span, **kwargs):
+        if not use_cache:
+            _count("bypassed")
+            span.set(cache="bypassed")
+            yield from self._llm.stream(prompt, **kwargs)
+            return
+
+        key = self.cache_key(prompt)
+        try:
+            cached = self._lookup(key)
+        except sqlite3.Error as e:
+            print(f"LLM cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            response, latency = cached
+            _count("hits")
+            _count("latency_saved", latency or 0.0)
+            span.set(cache="hit")
+            yield AIMessageChunk(content=response)
+            return
+
+        _count("misses")
+        span.set(cache="miss")
+        start = time.perf_counter()
+        parts = []
+        for chunk in self._llm.stream(prompt, **kwargs):
+            parts.append(chunk.content)
+            yield chunk
+        latency = time.perf_counter() - start
+        try:
+            self._store(key, "".join(parts), latency)
+        except sqlite3.Error as e:
+            print(f"LLM cache store failed: {e}")
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM LLMCache")
+            self._conn.commit()
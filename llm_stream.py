@@ -0,0 +1,68 @@
+import time
+import threading
+from collections import deque
+
+# Most recent calls kept per call site for the latency table
+METRICS_WINDOW = 100
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def stream_llm(llm, prompt, call_site, **kwargs):
+    """
+    Stream a completion as text fragments, recording time to first token and total generation time.
+
+    Args:
+        llm: The chat model (or CachedLLM) to stream from.
+        prompt: A prompt string or a list of messages.
+        call_site (str): Name the timings are recorded under, e.g. "llm_response".
+        **kwargs: Passed to `llm.stream` (e.g. use_cache=False).
+
+    Yields:
+        str: Non-empty text fragments in arrival order.
+    """
+    start = time.perf_counter()
+    first_token = None
+    chars = 0
+    for chunk in llm.stream(prompt, **kwargs):
+        text = getattr(chunk, "content", chunk)
+        if not text:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chars += len(text)
+        yield text
+    total = time.perf_counter() - start
+    record(call_site, first_token if first_token is not None else total, total, chars)
+
+
+def record(call_site, first_token, total, chars=0):
+    """Add one generation to the metrics of `call_site`."""
+    with _metrics_lock:
+        _metrics.setdefault(call_site, deque(maxlen=METRICS_WINDOW)).append((first_token, total, chars))
+    print(f"LLM {call_site}: first token {first_token:.2f}s, total {total:.2f}s, {chars} chars")
+
+
+def get_stream_metrics():
+    """
+    Time to first token and total generation time per call site, over the last METRICS_WINDOW calls.
+
+    Returns:
+        list[dict]: One row per call site with call count and average / worst timings in seconds.
+    """
+    with _metrics_lock:
+        snapshot = {name: list(calls) for name, calls in _metrics.items()}
+    rows = []
+    for name, calls in snapshot.items():
+        first_tokens = [c[0] for c in calls]
+        totals = [c[1] for c in calls]
+        rows.append({
+            "Call site": name,
+            "Calls": len(calls),
+            "Avg first token (s)": round(sum(first_tokens) / len(calls), 2),
+            "Max first token (s)": round(max(first_tokens), 2),
+            "Avg total (s)": round(sum(totals) / len(calls), 2),
+            "Max total (s)": round(max(totals), 2),
+        })
+    return rows
@@ -1,22 +1,33 @@
+import time
+_import_start = time.perf_counter()
 import streamlit as st
-import sqlite3
 import os
-import time
 import pandas as pd
 import threading
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage
-from transformers import pipeline
-import speech_recognition as sr
-from google.oauth2.service_account import Credentials
+from catalog_filter import AttributeIndex, extract_constraints
+from llm_cache import get_cache_stats
+from semantic_cache import SemanticCache, index_version
+from model_server import MODEL_SERVER_ENABLED, RemoteEmbeddings, EMBEDDING_MODEL
+from profile_candidates import load_profile_candidates, profile_key, profile_search, search_profile_candidates
+from llm_stream import stream_llm, get_stream_metrics
+from prompt_builder import (
+    PromptBuilder, compact_notes, get_prompt_stats, NOTES_TOKENS, NOTES_MAX_WORDS, QUESTION_TOKENS,
+    RECOMMENDATIONS_TOKENS, RESPONSE_TOKENS,
+)
+from transcription import transcribe_bytes, NoSpeechError, TranscriptionError
 from audio_recorder_streamlit import audio_recorder
-from utils import analyze_tone, analyze_sentiment
+from utils import analyze_tone, analyze_sentiment, get_llm
 from dotenv import load_dotenv
-from negotiation import handle_input, negotiation_assistant
+from negotiation import handle_input, stream_negotiation_assistant, get_turn_metrics
 from functools import partial  # Import partial to pass arguments
-from state import Sinteraction_history
+from state import get_interaction_history, TONE_LABELS
+from pipeline import Stage, StageError, run_pipeline, timings_table
+from db import fetch_customer_data, add_customer_to_db, update_customer_interaction, fetch_customer_page, count_customers, fetch_customer_notes
+from crm_database_create import migrate
+import resources
+import tracing
+
+resources.record("main.py imports", time.perf_counter() - _import_start)
 
 # Initialize session state for customer_question
 if "customer_question" not in st.session_state:
@@ -26,60 +37,38 @@ if "is_listening" not in st.session_state:
 
 # Function to transcribe audio
 
-def transcribe_audio(audio_file):
-    """Transcribe audio file to text using SpeechRecognition."""
-    recognizer = sr.Recognizer()
+def transcribe_audio(audio_bytes):
+    """Transcribe recorded WAV bytes to text in memory (see transcription.py for the backend)."""
     try:
-        with sr.AudioFile(audio_file) as source:
-            audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio)
-            st.session_state.customer_question = text
-    except sr.UnknownValueError:
-        st.error("Google Speech Recognition could not understand the audio.")
-    except sr.RequestError as e:
-        st.error(f"Could not request results from Google Speech Recognition service; {e}")
+        st.session_state.customer_question = transcribe_bytes(audio_bytes)
+    except NoSpeechError:
+        st.error("Speech recognition could not understand the audio.")
+    except TranscriptionError as e:
+        st.error(f"Could not request results from the speech recognition service; {e}")
 
 
 
 # Load environment variables
 load_dotenv(dotenv_path="config.env")
-
-@st.cache_resource
-def initialize_groq_model(api_key):
-    try:
-        return ChatGroq(model="llama3-8b-8192", api_key=api_key)
-    except Exception as e:
-        st.error(f"Error initializing Groq model: {e}")
-        return None
     
 # Set Hugging Face API key
 os.environ["HUGGINGFACE_API_KEY"] = os.getenv("HUGGINGFACE_API_KEY")
 
-# Initialize models
-llm = initialize_groq_model(api_key=os.environ["GROQ_API_KEY"])
-#sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-#tone_analyzer = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base")
-
-
 # Paths
-DB_PATH = "SalesCRM.db"
 VECTOR_STORE_PATH = "vector_store_index"
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
-SERVICE_ACCOUNT_FILE = "alert.json"
 
-# Google Sheets Authentication
-credentials = Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
+def load_embeddings():
+    """Load the mpnet embedding model; query embeddings share the on-disk cache with indexing.py."""
+    from embedding_cache import CachedEmbeddings
+
+    if MODEL_SERVER_ENABLED:
+        return CachedEmbeddings(RemoteEmbeddings())
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return CachedEmbeddings(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL))
 
-# Load vector store
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
 
-@st.cache_resource
 def load_vector_store(path, _embeddings):
     """
     Load or create a FAISS vector store.
@@ -91,10 +80,20 @@ def load_vector_store(path, _embeddings):
     Returns:
         FAISS: An instance of the FAISS vector store.
     """
+    from langchain_community.vectorstores import FAISS
+    from ann_index import load_config as load_index_config, apply_search_params
+
     try:
         if os.path.exists(path):
-            print("Loading existing vector store index...")
-            return FAISS.load_local(path, _embeddings, allow_dangerous_deserialization=True)
+            # The saved index can be flat, IVF-Flat, IVF-PQ or HNSW; FAISS restores whichever was written
+            # Read first, so an index saved while this one loads is picked up by the next check
+            version = index_version(path)
+            config = load_index_config(path)
+            print(f"Loading existing {config['type']} vector store index...")
+            store = FAISS.load_local(path, _embeddings, allow_dangerous_deserialization=True)
+            apply_search_params(store.index, config)
+            store.index_version = version
+            return store
         else:
             print("No existing index found. Initializing a new vector store...")
             return FAISS.from_texts([], _embeddings)
@@ -102,134 +101,41 @@ def load_vector_store(path, _embeddings):
         raise RuntimeError(f"Failed to load or create vector store: {e}")
 
 
-vector_store = load_vector_store(VECTOR_STORE_PATH, embeddings)
-
-
-# Initialize the database with WAL mode
-def get_db_connection():
+def load_attribute_index(path, _vector_store):
     """
-    Create a new SQLite database connection.
-    Enables Write-Ahead Logging (WAL) mode for better concurrency.
+    Load the structured attribute index saved by indexing.py and align it with the vector store.
+    Returns None when the index was built without one.
     """
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;")  # Enable WAL mode
-    return conn
+    attribute_index = AttributeIndex.load(path)
+    if attribute_index is None or _vector_store is None:
+        return None
+    return attribute_index.bind(_vector_store.index_to_docstore_id)
 
 
-# to get customer details
-def fetch_customer_data(customer_name):
+def current_vector_store():
     """
-    Fetch customer details and interaction history from the database.
-    Returns the data as a dictionary or None if the customer is not found.
+    Return the vector store, reloading it and the resources derived from it when indexing.py
+    has saved a new index since it was loaded. indexing.py runs in its own process, so the
+    manifest version on disk is how the app finds out.
     """
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT c.CustomerID, c.Name, c.Email, c.Phone, 
-                   ih.LastDealStatus, ih.InteractionDate, ih.Notes, ih.Sentiment, ih.Tone, ih.Intention, r.RecommendedDeal
-            FROM Customers c
-            LEFT JOIN InteractionHistory ih ON c.CustomerID = ih.CustomerID
-            LEFT JOIN Recommendations r ON c.CustomerID = r.CustomerID
-            WHERE c.Name = ?
-            ORDER BY ih.InteractionDate DESC, r.Date DESC
-            LIMIT 1
-            """,
-            (customer_name,),
-        )
-        customer = cursor.fetchone()
-        if customer:
-            columns = [
-                "CustomerID", "Name", "Email", "Phone", "LastDealStatus",
-                "InteractionDate", "Notes", "Sentiment", "Tone", "Intention",
-                "RecommendedDeal"
-            ]
-            return dict(zip(columns, customer))
-        return None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-    finally:
-        conn.close()
-
-
-def execute_with_retry(cursor, query, params=(), retries=5, delay=1):
-    for attempt in range(retries):
-        try:
-            cursor.execute(query, params)
-            break  # Exit loop if query succeeds
-        except sqlite3.OperationalError as e:
-            if "database is locked" in str(e):
-                time.sleep(delay)  # Wait before retrying
-            else:
-                raise
-    else:
-        raise RuntimeError("Database operation failed after multiple retries.")
-
-
-# to insert new customer details
-def add_customer_to_db(name, email, phone, sentiment, tone, intention, notes, recommendations):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Assign a new CustomerID by finding the current max ID
-    execute_with_retry(
-        cursor,
-        "SELECT IFNULL(MAX(CustomerID), 0) + 1 FROM Customers"
-    )
-    new_customer_id = cursor.fetchone()[0]
-
-    # Insert the new customer into the Customers table
-    execute_with_retry(
-        cursor,
-        """
-        INSERT INTO Customers (CustomerID, Name, Email, Phone)
-        VALUES (?, ?, ?, ?)
-        """,
-        (new_customer_id, name, email, phone)
-    )
-
-    # Insert interaction data for the new customer
-    execute_with_retry(
-        cursor,
-        """
-        INSERT INTO InteractionHistory (CustomerID, LastDealStatus, InteractionDate, Notes, Sentiment, Tone, Intention)
-        VALUES (?, ?, DATETIME('now'), ?, ?, ?, ?)
-        """,
-        (new_customer_id, "New", notes, sentiment, tone, intention)
-    )
-
-    execute_with_retry(
-        cursor,
-        """
-        INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date)
-        VALUES (?, ?, datetime('now'))
-        """,
-        (new_customer_id, recommendations)
-    )
-
-    conn.commit()
-    conn.close()
-
-
-
-#def analyze_sentiment(text):
-#    try:
-#       result = sentiment_analyzer(text)[0]
-#        print(result)
-#        return result["label"]
-#    except Exception as e:
-#        print(f"Error in sentiment analysis: {e}")
-#        return "UNKNOWN"
-#def analyze_tone(text):
-#    try:
-#        result = tone_analyzer(text)[0]
-#        print(result)
-#        return result["label"]
-#    except Exception as e:
-#        print(f"Error in tone analysis: {e}")
-#        return "UNKNOWN"
+    vector_store = resources.get("vector_store")
+    if vector_store is not None and index_version(VECTOR_STORE_PATH) != getattr(vector_store, "index_version", None):
+        print("Vector index changed on disk, reloading it.")
+        resources.reset("vector_store", "attribute_index", "profile_candidates")
+        vector_store = resources.get("vector_store")
+    return vector_store
+
+
+# Heavy resources load on first use; the warm-up below loads them in the background
+resources.register("embeddings", load_embeddings)
+resources.register("vector_store", lambda: load_vector_store(VECTOR_STORE_PATH, resources.get("embeddings")))
+resources.register("attribute_index", lambda: load_attribute_index(VECTOR_STORE_PATH, resources.get("vector_store")))
+resources.register("crm_schema", migrate)
+resources.register("recommendation_cache", SemanticCache)
+resources.register("profile_candidates", lambda: load_profile_candidates(VECTOR_STORE_PATH))
+resources.register("trace_metrics", tracing.start_metrics_server)
+# The metrics writer goes first: it is cheap to start and drains rows spooled by earlier runs
+WARM_UP_ORDER = ["metrics_writer", "llm", "sentiment_analyzer", "tone_analyzer", "embeddings", "vector_store", "attribute_index"]
 
 
 def analyze_intention(text):
@@ -248,7 +154,7 @@ def analyze_intention(text):
     
     try:
         # Invoke the LLM to get the response
-        response = llm.invoke(prompt)
+        response = get_llm().invoke(prompt)
         # Extract and clean the response
         intention = response.content.strip().split("\n")[0]  # Ensures single-word output
         return intention
@@ -257,14 +163,43 @@ def analyze_intention(text):
         return "Unknown"
 
 
+def format_recommendations(customer_data, customer_question, detailed_results):
+    """Have the LLM pick and format recommendations for the customer from the search results."""
+    builder = PromptBuilder("recommend_deals")
+    results_summary = builder.lines(detailed_results)
+    notes = builder.section(customer_data.get('Notes'), NOTES_TOKENS, 'No notes available')
+    question = builder.section(customer_question, QUESTION_TOKENS, 'No specific query provided')
+
+    prompt = builder.finish(f"""
+    You are an AI assistant tasked with creating personalized recommendations for a customer based on their preferences and query. 
+
+    Customer Profile:
+    - Name: {customer_data.get('Name', 'Unknown')}
+    - Tone: {customer_data.get('Tone', 'Neutral')}
+    - Intention: {customer_data.get('Intention', 'General Inquiry')}
+    - Last Deal Status: {customer_data.get('LastDealStatus', 'None')}
+    - Sentiment: {customer_data.get('Sentiment', 'Neutral')}
+    - Notes: {notes}
+
+    Customer Query: {question}
+
+    Search Results from Vector Store:
+    {results_summary}
+
+    Generate a short list of 2 recommended cars and show cars full details in one line and without adding unnecessary introductions or conclusions.
+    """)
+    response = get_llm().invoke(prompt)
+    return response.content.strip()
+
+
 def recommend_deals(customer_data, customer_question=None):
     """
     Generate personalized car recommendations using LLM and vector store.
     """
-    # Construct a dynamic query based on customer profile and query
-    base_query = f"Customer is interested in second-hand cars. Their tone is {customer_data.get('Tone', 'Neutral')}, intention is {customer_data.get('Intention', 'General Inquiry')}, and sentiment is {customer_data.get('Sentiment', 'Neutral')}."
-    additional_query = f" Query: {customer_question}" if customer_question else ""
-    query = base_query + additional_query
+    # The search combines the customer's profile with their question
+    tone = customer_data.get('Tone', 'Neutral')
+    sentiment = customer_data.get('Sentiment', 'Neutral')
+    intention = customer_data.get('Intention', 'General Inquiry')
 
     # Initialize recommendation results
     recommendations = "No recommendations available."
@@ -272,34 +207,53 @@ def recommend_deals(customer_data, customer_question=None):
 
     try:
         # Perform vector store similarity search
+        vector_store = current_vector_store()
+        attribute_index = resources.get("attribute_index")
         if vector_store and len(vector_store.docstore._dict) > 0:  # FAISS-specific check
-            search_results = vector_store.similarity_search(query, k=10)  # Retrieve top 5 results
+            # Narrow the candidates with hard filters from the question before the vector search
+            positions = None
+            constraints = {}
+            if attribute_index is not None:
+                constraints = extract_constraints(customer_question, attribute_index.locations)
+                if constraints:
+                    positions = attribute_index.candidate_positions(constraints)
+                    print(f"Hard filters {constraints} matched {len(positions)} cars.")
+                    if len(positions) == 0:
+                        positions = None  # Nothing matches: fall back to plain similarity search
+
+            # Near-identical questions from customers with the same profile and hard filters
+            # reuse an earlier search. Only the search results are cached: the formatted
+            # recommendation is written for one customer's name and notes
+            cache = resources.get("recommendation_cache")
+            cache.check_version(getattr(vector_store, "index_version", None))
+            partition = (
+                tone, sentiment, intention,
+                tuple(sorted((name, tuple(sorted(value)) if isinstance(value, set) else value) for name, value in constraints.items())),
+            )
+            question_vector = resources.get("embeddings").embed_query(customer_question) if customer_question else None
+            cached = cache.lookup(partition, question_vector)
+            if cached is not None:
+                value, similarity = cached
+                print(f"Recommendation cache hit (similarity {similarity:.3f}).")
+                return format_recommendations(customer_data, customer_question, value["results"])
+            start = time.perf_counter()
+
+            # Profiles seen at ingest time have precomputed candidates; other profiles are searched
+            # now. Either way the question is searched with the vector embedded for the cache lookup
+            profiles = resources.get("profile_candidates")
+            candidates = profiles.get(profile_key(tone, sentiment, intention)) if profiles else None
+            with tracing.span("vector.search", kind="vector", k=10, filtered=positions is not None) as span:
+                source = "precomputed"
+                if candidates is None:
+                    candidates = search_profile_candidates(vector_store, tone, sentiment, intention, positions=positions)
+                    source = "profile"
+                search_results = profile_search(vector_store, candidates, 10, question_vector, positions)
+                span.set(source=source if question_vector is None else f"{source}+question", results=len(search_results))
             detailed_results = [result.page_content.strip() for result in search_results]
-
-            # Combine the search results into a summary for LLM
-            results_summary = "\n".join(f"{i+1}. {result}" for i, result in enumerate(detailed_results))
+            cache.store(partition, question_vector, {"results": detailed_results}, latency=time.perf_counter() - start)
 
             # Use LLM to refine and format recommendations
-            prompt = f"""
-            You are an AI assistant tasked with creating personalized recommendations for a customer based on their preferences and query. 
-
-            Customer Profile:
-            - Name: {customer_data.get('Name', 'Unknown')}
-            - Tone: {customer_data.get('Tone', 'Neutral')}
-            - Intention: {customer_data.get('Intention', 'General Inquiry')}
-            - Last Deal Status: {customer_data.get('LastDealStatus', 'None')}
-            - Sentiment: {customer_data.get('Sentiment', 'Neutral')}
-            - Notes: {customer_data.get('Notes', 'No notes available')}
-
-            Customer Query: {customer_question or 'No specific query provided'}
-
-            Search Results from Vector Store:
-            {results_summary}
-
-            Generate a short list of 2 recommended cars and show cars full details in one line and without adding unnecessary introductions or conclusions.
-            """
-            response = llm.invoke(prompt)
-            recommendations = response.content.strip()
+            recommendations = format_recommendations(customer_data, customer_question, detailed_results)
 
         else:
             recommendations = "The vector store does not contain data, fallback to generic recommendations."
@@ -311,9 +265,13 @@ def recommend_deals(customer_data, customer_question=None):
     return recommendations
 
     
-def generate_llm_response(customer_data, recommendations, customer_question):
-    """Generate AI response for the sales assistant."""
-    prompt = f"""
+def stream_llm_response(customer_data, recommendations, customer_question):
+    """Stream the AI response for the sales assistant as text fragments."""
+    builder = PromptBuilder("llm_response")
+    notes = builder.section(customer_data.get('Notes'), NOTES_TOKENS, 'No notes available')
+    recommendations = builder.section(recommendations, RECOMMENDATIONS_TOKENS)
+    customer_question = builder.section(customer_question, QUESTION_TOKENS)
+    prompt = builder.finish(f"""
     You are a professional sales assistant. Based on the customer profile and recommendations, 
     generate a concise, point-by-point summary for the salesperson. The response should be easy to read and actionable, 
     focusing on key points relevant to the customer's needs and concerns. The  shorty summary should be concise yet detailed, focusing on key points relevant to the customer's needs and concerns
@@ -338,7 +296,7 @@ def generate_llm_response(customer_data, recommendations, customer_question):
     **Customer Profile**:
     - Name: {customer_data.get('Name', 'Unknown')}
     - Last Deal Status: {customer_data.get('LastDealStatus', 'Unknown')}
-    - Notes: {customer_data.get('Notes', 'No notes available')}
+    - Notes: {notes}
     - Sentiment: {customer_data.get('Sentiment', 'Neutral')}
     - Tone: {customer_data.get('Tone', 'Neutral')}
     - Intention: {customer_data.get('Intention', 'Inquiry')}
@@ -352,71 +310,29 @@ def generate_llm_response(customer_data, recommendations, customer_question):
     ---
 
     Provide a clear, concise, and actionable response for the salesperson.
-    """
+    """)
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        yield from stream_llm(get_llm(), prompt, "llm_response")
     except Exception as e:
         st.error(f"Error generating AI response: {e}")
-        return "Unable to generate a response. Please try again."
-
-# Function to update customer interaction in the database
-def update_customer_interaction(customer_id, last_deal_status, notes, recommendations, sentiment, tone, intention):
-    """
-    Update the customer interaction details in the database for an existing customer.
-    If the customer interaction does not exist, this will update the latest entry for the customer.
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        UPDATE InteractionHistory
-        SET 
-            LastDealStatus = ?, 
-            Notes = ?, 
-            Sentiment = ?, 
-            Tone = ?, 
-            Intention = ?, 
-            InteractionDate = datetime('now')
-        WHERE CustomerID = ?
-        """,
-        (last_deal_status, notes, sentiment, tone, intention, customer_id)
-    )
-    # Check if CustomerID exists in the Recommendations table
-    cursor.execute(
-        """
-        SELECT COUNT(*) FROM Recommendations WHERE CustomerID = ?
-        """,
-        (customer_id,)
-    )
-    exists = cursor.fetchone()[0]  # Fetch the count
-    if exists:
-        cursor.execute(
-            """
-            UPDATE Recommendations
-            SET
-                RecommendedDeal = ?,
-                Date = datetime('now') 
-            WHERE CustomerID = ?      
-            """,
-            (recommendations, customer_id)
-        )
-    
-    else:
-        cursor.execute(
-            """
-            INSERT INTO Recommendations (CustomerID, RecommendedDeal, Date)
-            VALUES (?, ?, datetime('now'))
-            """,
-            (customer_id, recommendations)
-        )
-    
-    conn.commit()
-    conn.close()
+        yield "Unable to generate a response. Please try again."
 
 
-def post_call_summary(customer_data, recommendations, customer_question, llm_response):
-    prompt = f"""
+def generate_llm_response(customer_data, recommendations, customer_question):
+    """Generate AI response for the sales assistant."""
+    return "".join(stream_llm_response(customer_data, recommendations, customer_question))
+
+
+def stream_post_call_summary(customer_data, recommendations, customer_question, llm_response):
+    """Stream the post-call summary as text fragments."""
+    # The profile without its long text fields: the previous notes get their own budgeted section
+    builder = PromptBuilder("post_call_summary")
+    profile = {key: value for key, value in customer_data.items() if key not in ("Notes", "RecommendedDeal")}
+    previous_notes = builder.section(customer_data.get('Notes'), NOTES_TOKENS, 'No notes available')
+    customer_question = builder.section(customer_question, QUESTION_TOKENS)
+    llm_response = builder.section(llm_response, RESPONSE_TOKENS)
+    recommendations = builder.section(recommendations, RECOMMENDATIONS_TOKENS)
+    prompt = builder.finish(f"""
 You are an AI assistant tasked with summarizing customer interactions concisely and effectively. 
 Generate a structured summary that includes:
 
@@ -429,6 +345,7 @@ Ensure that:
 - The summary is brief but provides all critical information for future reference.
 - Incorporate the customer's previous notes, if available, for context.
 - Write the shortest useful summary that can be easily referred to in future interactions.
+- The summary replaces the previous notes: carry over what still matters from them and keep the whole summary under {NOTES_MAX_WORDS} words.
 
 Parameters:
         customer_data (dict): Customer's data, including previous notes and interaction history.
@@ -437,30 +354,84 @@ Parameters:
         llm_response (str): The AI-generated response to the customer's query.
 
 Input Data:
-- Customer Data: {customer_data}
--Previous Notes: {customer_data.get('Notes', 'No notes available')}
+- Customer Data: {profile}
+-Previous Notes: {previous_notes}
 - Customer Query: {customer_question}
 - AI Response: {llm_response}
 - Recommendations: {recommendations}
 
 Generate the structured summary directly without adding unnecessary introductions or conclusions.
-"""
+""")
 
     try:
-        # Invoke the LLM to generate the summary
-        response = llm.invoke(prompt)
-        # Return the stripped content of the response
-        return response.content.strip()
+        # Stream the summary from the LLM
+        yield from stream_llm(get_llm(), prompt, "post_call_summary")
     except Exception as e:
         # Handle errors gracefully and notify the user
         st.error(f"Error generating post-call summary: {e}")
-        return "Summary not available."
+        yield "Summary not available."
+
 
+def post_call_summary(customer_data, recommendations, customer_question, llm_response):
+    # Return the summary bounded to the notes budget, since it becomes the customer's stored notes
+    return compact_notes("".join(stream_post_call_summary(customer_data, recommendations, customer_question, llm_response)))
+
+
+def render_stream(heading, fragments):
+    """
+    Render streamed text under `heading` as it arrives.
+
+    Returns:
+        str: The full text, for the summary and database steps.
+    """
+    st.markdown(heading)
+    return st.write_stream(fragments)
 
 
 
 
 
+
+def run_stages(stages, on_stage_done):
+    """
+    Run the page's pipeline and show its stage timings. A failed stage is reported with
+    st.error under whatever the finished stages already rendered.
+    """
+    try:
+        _, timings = run_pipeline(stages, on_stage_done=on_stage_done)
+    except StageError as e:
+        st.error(f"Step '{e.stage}' failed: {e.__cause__}")
+        timings = e.timings
+    show_stage_timings(timings)
+
+
+def show_stage_timings(timings):
+    """Display per-stage wall-clock timings of the last pipeline run."""
+    with st.expander("Stage timings"):
+        st.dataframe(pd.DataFrame(timings_table(timings)), use_container_width=True)
+
+
+def show_trace_waterfall(trace_id):
+    """Display the spans of a trace as a table and a timeline in the sidebar."""
+    rows = tracing.get_trace(trace_id)
+    if not rows:
+        st.sidebar.caption("No spans recorded for this run.")
+        return
+    import altair as alt
+
+    spans = pd.DataFrame(rows)
+    spans["End (ms)"] = spans["Start (ms)"] + spans["Duration (ms)"]
+    chart = alt.Chart(spans).mark_bar().encode(
+        x=alt.X("Start (ms)", title="ms"),
+        x2="End (ms)",
+        y=alt.Y("Span", sort=None, title=None),
+        color="Kind",
+        tooltip=["Span", "Kind", "Start (ms)", "Duration (ms)", "Prompt tokens", "Response tokens", "Error"],
+    )
+    st.sidebar.altair_chart(chart, use_container_width=True)
+    st.sidebar.dataframe(spans.drop(columns="End (ms)"), use_container_width=True, hide_index=True)
+
+
 # Main App
 
 def home_page():
@@ -484,14 +455,10 @@ def home_page():
         audio_bytes = audio_recorder()
 
         if audio_bytes:
-            # Save the recorded audio to a temporary file
-            with open("temp_audio.wav", "wb") as f:
-                f.write(audio_bytes)
-
-            # Transcribe the audio with a spinner
+            # Transcribe the recording straight from memory with a spinner
             st.write("Transcribing audio...")
             with st.spinner("Transcribing..."):
-                transcribe_audio("temp_audio.wav")
+                transcribe_audio(audio_bytes)
 
         # Display the transcribed text in the text area
         customer_question = st.text_area("Transcribed Query:", value=st.session_state.customer_question)
@@ -511,91 +478,129 @@ def home_page():
                 customer_data = fetch_customer_data(customer_name)
                 
                 if customer_data:
-                    # Customer exists, generate recommendations and responses
-                    recommendations = recommend_deals(customer_data, customer_question)
-                    llm_response = generate_llm_response(customer_data, recommendations, customer_question)
-                    
-                    # Generate post-call summary
-                    summary = post_call_summary(customer_data, recommendations, customer_question, llm_response)
-
-                    # Update database with the post-call summary and latest interaction details
-                    update_customer_interaction(
-                        customer_id=customer_data['CustomerID'],
-                        last_deal_status="Active",
-                        notes=summary,
-                        recommendations=recommendations,
-                        sentiment=analyze_sentiment(customer_question),
-                        tone=analyze_tone(customer_question),
-                        intention=analyze_intention(customer_question),
-                    )
-                    
-                    st.markdown(f"### Recommendations for {customer_name}:")
-                    st.markdown(recommendations)
-                    st.markdown(f"### Assistant Response:\n{llm_response}")
-                    st.write(f"Customer '{customer_name}' successfully updated with last interaction")
+                    # Customer exists: the analyses of the new query only feed the DB update,
+                    # so they run alongside the recommendation search instead of after the summary
+                    stages = [
+                        Stage("sentiment", lambda: analyze_sentiment(customer_question)),
+                        Stage("tone", lambda: analyze_tone(customer_question)),
+                        Stage("intention", lambda: analyze_intention(customer_question)),
+                        Stage("recommendations", lambda: recommend_deals(customer_data, customer_question)),
+                        # Returns the stream; on_stage_done renders it token by token in the script thread
+                        Stage(
+                            "llm_response",
+                            lambda recommendations: stream_llm_response(customer_data, recommendations, customer_question),
+                            deps=("recommendations",),
+                        ),
+                        # Generate post-call summary
+                        Stage(
+                            "summary",
+                            lambda recommendations, llm_response: post_call_summary(
+                                customer_data, recommendations, customer_question, llm_response
+                            ),
+                            deps=("recommendations", "llm_response"),
+                        ),
+                        # Update database with the post-call summary and latest interaction details
+                        Stage(
+                            "update_db",
+                            lambda summary, recommendations, sentiment, tone, intention: update_customer_interaction(
+                                customer_id=customer_data['CustomerID'],
+                                last_deal_status="Active",
+                                notes=summary,
+                                recommendations=recommendations,
+                                sentiment=sentiment,
+                                tone=tone,
+                                intention=intention,
+                            ),
+                            deps=("summary", "recommendations", "sentiment", "tone", "intention"),
+                        ),
+                    ]
+
+                    def on_stage_done(name, result):
+                        # Show each result as soon as its own dependencies are done
+                        if name == "recommendations":
+                            st.markdown(f"### Recommendations for {customer_name}:")
+                            st.markdown(result)
+                        elif name == "llm_response":
+                            return render_stream("### Assistant Response:", result)
+                        elif name == "update_db":
+                            st.write(f"Customer '{customer_name}' successfully updated with last interaction")
+
+                    run_stages(stages, on_stage_done)
                 
                 else:
                     # New customer: Add to the database and process the query
                     st.subheader("New Customer")
                     if customer_question.strip():  # Check if customer query is provided
-                        # Analyze sentiment and tone from the customer query
-                        sentiment = analyze_sentiment(customer_question)
-                        tone = analyze_tone(customer_question)
-                        intention = analyze_intention(customer_question)   
-                        
-                        # Generate recommendations and responses for the new customer
-                        recommendations = recommend_deals(
-                            customer_data={
-                                "Name": customer_name,
-                                "LastDealStatus": "New",
-                                "Notes": "new customer",
-                                "Sentiment": sentiment,
-                                "Tone": tone,
-                                "Intention": intention
-                            },
-                            customer_question=customer_question,
-                        )
-                        llm_response = generate_llm_response(
-                            customer_data={
+                        def new_customer_data(notes, sentiment, tone, intention):
+                            return {
                                 "Name": customer_name,
                                 "LastDealStatus": "New",
-                                "Notes": "No prior interactions.",
-                                "Sentiment": sentiment,
-                                "Tone": tone,
-                                "Intention": intention
-                            },
-                            recommendations=recommendations,
-                            customer_question=customer_question,
-                        )
-                        # Generate post-call summary
-                        summary = post_call_summary(
-                            customer_data={
-                                "Name": customer_name,
-                                "LastDealStatus": "New",
-                                "Notes": "New customer",
+                                "Notes": notes,
                                 "Sentiment": sentiment,
                                 "Tone": tone,
                                 "Intention": intention,
-                            },
-                            recommendations=recommendations,
-                            customer_question=customer_question,
-                            llm_response=llm_response
-                        )
-
-                        # Add the new customer to the database with post-call summary
-                        add_customer_to_db(
-                            name=customer_name,
-                            email="unknown@example.com",
-                            phone="0000000000",
-                            sentiment=sentiment,
-                            tone=tone,
-                            intention=intention,
-                            notes=summary,
-                            recommendations=recommendations  
-                        )
-                        st.write(f"Customer '{customer_name}' added successfully with a new ID!") 
-                        st.write("### Assistant Response:")
-                        st.write(llm_response)
+                            }
+
+                        profile = ("sentiment", "tone", "intention")
+                        stages = [
+                            # Analyze sentiment, tone and intention from the customer query in parallel
+                            Stage("sentiment", lambda: analyze_sentiment(customer_question)),
+                            Stage("tone", lambda: analyze_tone(customer_question)),
+                            Stage("intention", lambda: analyze_intention(customer_question)),
+                            # Generate recommendations and responses for the new customer
+                            Stage(
+                                "recommendations",
+                                lambda sentiment, tone, intention: recommend_deals(
+                                    customer_data=new_customer_data("new customer", sentiment, tone, intention),
+                                    customer_question=customer_question,
+                                ),
+                                deps=profile,
+                            ),
+                            Stage(
+                                "llm_response",
+                                lambda recommendations, sentiment, tone, intention: stream_llm_response(
+                                    customer_data=new_customer_data("No prior interactions.", sentiment, tone, intention),
+                                    recommendations=recommendations,
+                                    customer_question=customer_question,
+                                ),
+                                deps=("recommendations",) + profile,
+                            ),
+                            # Generate post-call summary
+                            Stage(
+                                "summary",
+                                lambda recommendations, llm_response, sentiment, tone, intention: post_call_summary(
+                                    customer_data=new_customer_data("New customer", sentiment, tone, intention),
+                                    recommendations=recommendations,
+                                    customer_question=customer_question,
+                                    llm_response=llm_response,
+                                ),
+                                deps=("recommendations", "llm_response") + profile,
+                            ),
+                            # Add the new customer to the database with post-call summary
+                            Stage(
+                                "add_db",
+                                lambda summary, recommendations, sentiment, tone, intention: add_customer_to_db(
+                                    name=customer_name,
+                                    email="unknown@example.com",
+                                    phone="0000000000",
+                                    sentiment=sentiment,
+                                    tone=tone,
+                                    intention=intention,
+                                    notes=summary,
+                                    recommendations=recommendations,
+                                ),
+                                deps=("summary", "recommendations") + profile,
+                            ),
+                        ]
+
+                        def on_stage_done(name, result):
+                            if name == "llm_response":
+                                return render_stream("### Assistant Response:", result)
+                            if name == "add_db":
+                                st.write(f"Customer '{customer_name}' added successfully with ID {result}!")
+                                cached_customer_count.clear()
+
+                        run_stages(stages, on_stage_done)
                     else:
                         st.warning("Please provide a query or additional information for the new customer.")
         else:
@@ -615,7 +620,7 @@ def home_page():
 
                 if not st.session_state[f'negotiation_history_{customer_id}']:
                     with st.spinner("Generating initial negotiation tips..."):
-                        initial_tips = negotiation_assistant(
+                        initial_tips = st.write_stream(stream_negotiation_assistant(
                         customer_name=customer_data.get('Name', 'Customer'),
                         sentiment=customer_data.get("Sentiment", "Neutral"),
                         tone=customer_data.get("Tone", "Neutral"),
@@ -625,9 +630,8 @@ def home_page():
                         customer_query1="No previous query",
                         his_negotiation="No previous negotiation history.",
                         negotiation_result="newly strated the negotiotion"
-                    )
+                    )).strip()
                     st.session_state[f'negotiation_history_{customer_id}'].append(initial_tips)
-                    st.write(initial_tips)
 
                 
                 
@@ -657,36 +661,57 @@ def home_page():
 
 
         
+# Short-lived result caches for the Customer Info page; the total count changes rarely and is
+# the most expensive query when filtering on the latest interaction
+CUSTOMER_PAGE_SIZE = int(os.getenv("CUSTOMER_PAGE_SIZE", "50"))
+cached_customer_page = st.cache_data(ttl=int(os.getenv("CUSTOMER_PAGE_TTL", "10")), show_spinner=False)(fetch_customer_page)
+cached_customer_count = st.cache_data(ttl=int(os.getenv("CUSTOMER_COUNT_TTL", "60")), show_spinner=False)(count_customers)
+DEAL_STATUSES = ["New", "Active", "Negotiating", "Closed-Won", "Closed-Lost"]
+
+
 # Customer Info Page
 def customer_info():
     st.title("Customer Info")
     st.sidebar.markdown("# Customer Info")
 
-    def fetch_all_customer_info():
-        """
-        Fetch all customer information from the database.
-        """
-        conn = get_db_connection()
-        query = """
-        SELECT c.CustomerID, c.Name, c.Email, c.Phone, 
-               ih.LastDealStatus, ih.InteractionDate, ih.Notes, 
-               ih.Sentiment, ih.Tone, ih.Intention
-        FROM Customers c
-        LEFT JOIN InteractionHistory ih ON c.CustomerID = ih.CustomerID
-        ORDER BY c.Name
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
-
-    # Fetch and display customer data
-    customer_data = fetch_all_customer_info()
+    # Server-side filters
+    col1, col2, col3 = st.columns(3)
+    name = col1.text_input("Name starts with").strip() or None
+    status = col2.selectbox("Deal status", DEAL_STATUSES, index=None, placeholder="Any")
+    sentiment = col3.selectbox("Sentiment", ["POSITIVE", "NEGATIVE"], index=None, placeholder="Any")
+
+    # Keyset cursors of the pages visited so far; reset when the filters change
+    filters = (name, status, sentiment)
+    if st.session_state.get("customer_filters") != filters:
+        st.session_state.customer_filters = filters
+        st.session_state.customer_cursors = [None]
+    cursors = st.session_state.customer_cursors
+
+    total = cached_customer_count(name, status, sentiment)
+    customer_data, next_cursor = cached_customer_page(cursors[-1], CUSTOMER_PAGE_SIZE, name, status, sentiment)
 
     if not customer_data.empty:
         st.subheader("All Customer Information:")
-        st.dataframe(customer_data, use_container_width=True)  # Display as a scrollable table
+        st.caption(f"Page {len(cursors)} of {max(1, -(-total // CUSTOMER_PAGE_SIZE))} ({total} customers)")
+        st.dataframe(customer_data, use_container_width=True, hide_index=True)  # Display as a scrollable table
+
+        prev_col, next_col = st.columns(2)
+        if prev_col.button("Previous page", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        if next_col.button("Next page", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+
+        # Notes are only loaded for the customer being inspected
+        with st.expander("Interaction notes"):
+            customer_ids = {f"{name} (#{customer_id})": customer_id
+                            for name, customer_id in zip(customer_data["Name"], customer_data["CustomerID"])}
+            selected = st.selectbox("Customer", list(customer_ids), index=None, placeholder="Select a customer")
+            if selected:
+                st.dataframe(fetch_customer_notes(int(customer_ids[selected])), use_container_width=True, hide_index=True)
     else:
-        st.warning("No customer information found in the database.")   
+        st.warning("No customer information found in the database.")
     st.link_button("Available Cars", "https://docs.google.com/spreadsheets/d/1-58GuEG2SXQZsKnpgM4yrhFPTrKceV9-YiInbzN2Zks/edit?usp=sharing")
     st.link_button("Performance Metrics", "https://docs.google.com/spreadsheets/d/1J-i0pewj3YqQ4l4TJc0HH8471Sodzop2937c1JHMO9I/edit?usp=sharing")
 
@@ -694,10 +719,48 @@ if __name__ == "__main__":
     st.sidebar.title("Navigation")
     page = st.sidebar.selectbox("Select a page", ["Home", "Customer Info"])
 
+    cache_stats = get_cache_stats()
+    st.sidebar.caption(
+        f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+        f"{cache_stats['latency_saved']:.1f}s saved"
+    )
+    if resources.is_loaded("recommendation_cache"):
+        semantic_stats = resources.get("recommendation_cache").get_stats()
+        st.sidebar.caption(
+            f"Recommendation cache: {semantic_stats['hit_rate']:.0%} hit rate "
+            f"({semantic_stats['hits']} hits), {semantic_stats['latency_saved']:.1f}s saved"
+        )
+    if resources.is_loaded("embeddings"):
+        embedding_stats = resources.get("embeddings").get_stats()
+        st.sidebar.caption(f"Embedding cache: {embedding_stats['hits']} encoder passes avoided")
+
+    # Apply pending schema migrations (a no-op once the database is current)
+    resources.get("crm_schema")
+    # Prometheus /metrics endpoint for the span latencies (served by the first process to claim the port)
+    resources.get("trace_metrics")
+
+    # Render immediately; models keep loading in the background
+    resources.warm_up(WARM_UP_ORDER)
+    with st.sidebar.expander("Startup profile"):
+        st.dataframe(pd.DataFrame(resources.startup_report()), use_container_width=True)
+    with st.sidebar.expander("LLM latency"):
+        st.dataframe(pd.DataFrame(get_stream_metrics()), use_container_width=True)
+    with st.sidebar.expander("Prompt sizes"):
+        st.dataframe(pd.DataFrame(get_prompt_stats()), use_container_width=True)
+    with st.sidebar.expander("Negotiation turns"):
+        st.dataframe(pd.DataFrame(get_turn_metrics()), use_container_width=True)
+
     st.sidebar.header("Interaction History")
-    st.sidebar.line_chart(Sinteraction_history.set_index("Step")[["Sentiment", "Tone"]])
+    st.sidebar.line_chart(get_interaction_history().view())
+    st.sidebar.caption("Sentiment: -1 negative, +1 positive. Tone: " + ", ".join(
+        f"{code} {label}" for code, label in enumerate(TONE_LABELS)))
     
-    if page == "Home":
-        home_page()
-    elif page == "Customer Info":
-        customer_info()
+    # Every script run is one trace; the LLM, model, vector, DB and Sheets spans of the run nest under it
+    with tracing.span(f"page.{page}", kind="request") as root:
+        if page == "Home":
+            home_page()
+        elif page == "Customer Info":
+            customer_info()
+
+    if st.sidebar.checkbox("Show trace waterfall"):
+        show_trace_waterfall(root.trace_id)
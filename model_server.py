@@ -0,0 +1,381 @@
+"""
+Shared model worker: one process owns the embedder and the two classifiers and serves every
+Streamlit process over a Unix domain socket, so the models are loaded once per machine.
+
+Concurrent requests for the same model are coalesced by a micro-batching scheduler: the first
+request waits up to MODEL_SERVER_MAX_WAIT_MS for others, then all of them run as one batch.
+
+Usage:
+    python model_server.py                   # serve on MODEL_SERVER_SOCKET
+    MODEL_SERVER=1 streamlit run main.py     # use it from the app
+
+Wire format: every message is a 4-byte big-endian length followed by a UTF-8 JSON object.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import base64
+import hashlib
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future
+import numpy as np
+
+# Server settings, configurable through config.env
+MODEL_SERVER_ENABLED = os.getenv("MODEL_SERVER", "0") != "0"
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "/tmp/sales_model_server.sock")
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "32"))
+MODEL_SERVER_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_MAX_WAIT_MS", "5"))
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "60"))  # seconds per request
+MODEL_SERVER_IDLE_CONNECTIONS = int(os.getenv("MODEL_SERVER_IDLE_CONNECTIONS", "8"))  # kept open per client
+
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+_HEADER = struct.Struct(">I")
+
+
+class ModelServerError(RuntimeError):
+    """The model server is unreachable or failed to run a request."""
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    """Read one message, or None if the peer closed the connection."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def rss_mb():
+    """Resident memory of this process in MB (Linux; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return 0.0
+
+
+class MicroBatcher:
+    """
+    Runs `fn(texts) -> outputs` on a worker thread, merging the texts of requests that arrive
+    within `max_wait` seconds of the first one (up to `max_batch` texts) into one call.
+    """
+
+    def __init__(self, fn, max_batch=MODEL_SERVER_MAX_BATCH, max_wait=MODEL_SERVER_MAX_WAIT_MS / 1000, name="batcher"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, texts):
+        """Queue `texts` and block until their outputs (in the same order) are ready."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            size = len(items[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                items.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in items for text in item_texts]
+            self.stats["requests"] += len(items)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            try:
+                outputs = self.fn(texts)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future in items:
+                future.set_result(outputs[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class StubClassifier:
+    """
+    Offline stand-in for a classifier pipeline, for benchmarks: each call holds a lock for
+    `latency` plus `per_text` seconds per text, like a model that saturates the CPU per call.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, labels, latency=0.02, per_text=0.002):
+        self.labels = labels
+        self.latency = latency
+        self.per_text = per_text
+
+    def __call__(self, texts, batch_size=8, truncation=True, max_length=512, **kwargs):
+        texts = [texts] if isinstance(texts, str) else texts
+        with self._lock:
+            time.sleep(self.latency + self.per_text * len(texts))
+        return [{"label": self.labels[len(text) % len(self.labels)], "score": 0.9} for text in texts]
+
+
+class StubEmbedder:
+    """
+    Offline stand-in for the embedder: random vectors seeded by a digest of the text, so every
+    process returns the same vector for a text; timed like StubClassifier.
+    """
+
+    _lock = StubClassifier._lock
+
+    def __init__(self, dim=768, latency=0.02, per_text=0.004):
+        self.dim = dim
+        self.latency = latency
+        self.per_text = per_text
+
+    def embed_documents(self, texts):
+        with self._lock:
+            time.sleep(self.latency + self.per_text * len(texts))
+        return [np.random.default_rng(self.seed(text)).standard_normal(self.dim).astype(np.float32) for text in texts]
+
+    @staticmethod
+    def seed(text):
+        # hash() of a str is salted per process (PYTHONHASHSEED)
+        return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ModelServer:
+    """
+    Owns the models and answers "ping", "classify" and "embed" requests.
+
+    Args:
+        stub (bool): Serve StubClassifier / StubEmbedder instead of the real models.
+    """
+
+    def __init__(self, socket_path=MODEL_SERVER_SOCKET, max_batch=MODEL_SERVER_MAX_BATCH,
+                 max_wait_ms=MODEL_SERVER_MAX_WAIT_MS, stub=False):
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._batchers = {}
+        self._batchers_lock = threading.Lock()
+
+        start = time.perf_counter()
+        if stub:
+            self.classifiers = {
+                "sentiment": StubClassifier(["POSITIVE", "NEGATIVE"]),
+                "tone": StubClassifier(["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]),
+            }
+            self.embedder = StubEmbedder()
+        else:
+            from classifier_backends import load_classifier, SENTIMENT_MODEL, TONE_MODEL
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+
+            self.classifiers = {"sentiment": load_classifier(*SENTIMENT_MODEL), "tone": load_classifier(*TONE_MODEL)}
+            self.embedder = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        print(f"Models loaded in {time.perf_counter() - start:.1f}s, {rss_mb():.0f} MB resident.")
+
+    def _batcher(self, key, fn):
+        with self._batchers_lock:
+            if key not in self._batchers:
+                self._batchers[key] = MicroBatcher(fn, self.max_batch, self.max_wait, name="batch-" + "-".join(map(str, key)))
+            return self._batchers[key]
+
+    def dispatch(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return {
+                "pid": os.getpid(),
+                "rss_mb": rss_mb(),
+                "batchers": {"/".join(map(str, key)): dict(b.stats) for key, b in self._batchers.items()},
+            }
+        if op == "classify":
+            task, max_length = request["task"], int(request.get("max_length", 512))
+            classifier = self.classifiers[task]
+            batcher = self._batcher(("classify", task, max_length), lambda texts: classifier(
+                texts, batch_size=self.max_batch, truncation=True, max_length=max_length))
+            return batcher.submit(request["texts"])
+        if op == "embed":
+            vectors = np.asarray(self._batcher(("embed",), self.embedder.embed_documents).submit(request["texts"]), dtype=np.float32)
+            return {"shape": list(vectors.shape), "data": base64.b64encode(vectors.tobytes()).decode("ascii")}
+        raise ValueError(f"Unknown op: {op}")
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # left over from a previous run
+        with _UnixServer(self.socket_path, _Handler) as server:
+            server.model_server = self
+            os.chmod(self.socket_path, 0o600)
+            print(f"Model server listening on {self.socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # every Streamlit thread connects on its first request
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    # One thread per client connection; requests on a connection are answered in order
+    def handle(self):
+        while True:
+            request = recv_message(self.request)
+            if request is None:
+                return
+            try:
+                response = {"result": self.server.model_server.dispatch(request)}
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            send_message(self.request, response)
+
+
+class ModelClient:
+    """
+    Thread-safe client. A request borrows an idle connection (or opens one) and hands it back
+    afterwards; at most `max_idle` idle connections are kept, the rest are closed.
+    """
+
+    def __init__(self, socket_path=MODEL_SERVER_SOCKET, timeout=MODEL_SERVER_TIMEOUT, max_idle=MODEL_SERVER_IDLE_CONNECTIONS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise ModelServerError(
+                f"Model server not reachable at {self.socket_path} ({e}); start it with `python model_server.py`."
+            ) from e
+        return sock
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, sock):
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def call(self, op, **params):
+        """
+        Send one request and return its result. If a pooled connection was dropped (e.g. the
+        server restarted), the request is retried once on a new connection.
+        """
+        for attempt in (1, 2):
+            sock = self._borrow() if attempt == 1 else self._connect()
+            try:
+                send_message(sock, {"op": op, **params})
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionResetError("connection closed by the model server")
+            except OSError as e:
+                sock.close()  # A half-read reply would desynchronise the connection
+                if attempt == 2:
+                    raise ModelServerError(f"Model server request failed: {e}") from e
+                continue
+            except BaseException:
+                sock.close()
+                raise
+            self._release(sock)
+            break
+        if "error" in response:
+            raise ModelServerError(response["error"])
+        return response["result"]
+
+    def ping(self):
+        return self.call("ping")
+
+    def classify(self, task, texts, max_length=512):
+        return self.call("classify", task=task, texts=list(texts), max_length=max_length)
+
+    def embed(self, texts):
+        result = self.call("embed", texts=list(texts))
+        return np.frombuffer(base64.b64decode(result["data"]), dtype=np.float32).reshape(result["shape"])
+
+
+class RemoteClassifier:
+    """Drop-in for a transformers text-classification pipeline, served by the model server."""
+
+    def __init__(self, task, client=None):
+        self.task = task
+        self.client = client or ModelClient()
+
+    def __call__(self, texts, batch_size=None, truncation=True, max_length=512, **kwargs):
+        texts = [texts] if isinstance(texts, str) else texts
+        return self.client.classify(self.task, texts, max_length=max_length)
+
+
+class RemoteEmbeddings:
+    """Drop-in for HuggingFaceEmbeddings (embed_documents / embed_query), served by the model server."""
+
+    model_name = EMBEDDING_MODEL
+
+    def __init__(self, client=None):
+        self.client = client or ModelClient()
+
+    def embed_documents(self, texts):
+        return list(self.client.embed(texts)) if texts else []
+
+    def embed_query(self, text):
+        return self.client.embed([text])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the embedder and classifiers over a Unix socket.")
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=MODEL_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MODEL_SERVER_MAX_WAIT_MS)
+    parser.add_argument("--stub", action="store_true", help="Serve timed stand-ins instead of the real models")
+    args = parser.parse_args()
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("Unix domain sockets are not available on this platform.")
+    ModelServer(args.socket, args.max_batch, args.max_wait_ms, stub=args.stub).serve_forever()
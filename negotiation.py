@@ -1,13 +1,19 @@
-import gspread
 import streamlit as st
 import time
 import pandas as pd
+import os
+import re
+import json
 import uuid
-from utils import analyze_tone, analyze_sentiment, llm
-from googleapiclient.discovery import build
+import threading
+from collections import deque
+from utils import analyze_tone, analyze_sentiment, get_llm
 from langchain.schema import HumanMessage
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from sheets_writer import SheetsWriter, FakeSheet
+from llm_stream import stream_llm
+from prompt_builder import PromptBuilder, count_tokens
+import resources
+import tracing
 
 
 
@@ -17,15 +23,38 @@ SCOPES = [
 ]
 SERVICE_ACCOUNT_FILE = "alert.json"
 
-# Google Sheets Authentication
-credentials = Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-client = gspread.authorize(credentials)
-sheet = client.open("my project").sheet1
 
+def open_metrics_sheet():
+    """
+    Authenticate to Google Sheets and open the performance metrics sheet.
+    Loaded lazily so the app starts even when Sheets is unreachable.
+    """
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    # Google Sheets Authentication
+    credentials = Credentials.from_service_account_file(
+        SERVICE_ACCOUNT_FILE, scopes=SCOPES
+    )
+    client = gspread.authorize(credentials)
+    # Access Google Sheet
+    return client.open("my project").sheet1
+
+
+# "sheets" appends to Google Sheets; "fake" writes to a local CSV for offline runs
+METRICS_BACKEND = os.getenv("METRICS_BACKEND", "sheets")
+
+
+def start_metrics_writer():
+    """Start the background writer that batches metric rows into the sheet."""
+    if METRICS_BACKEND == "fake":
+        fake_sheet = FakeSheet(path="fake_metrics_sheet.csv")
+        return SheetsWriter(lambda: fake_sheet).start()
+    return SheetsWriter(lambda: resources.get("sheet")).start()
 
-# Access Google Sheet
+
+resources.register("sheet", open_metrics_sheet)
+resources.register("metrics_writer", start_metrics_writer)
 
 
 # Function to update performance metrics in Google Sheets
@@ -34,23 +63,20 @@ def update_performance_metrics(sheet_id, customer_name, sales_rep, negotiation_r
         # Define the row data to insert
         row_data = [str(sheet_id), str(customer_name), str(sales_rep), str(negotiation_result), str(tone), str(sentiment), str(notes), time.strftime("%Y-%m-%d %H:%M:%S")]
 
-        # Append data to the Google Sheet
-        sheet.append_row(row_data)
-        st.success("Performance metrics updated successfully!")
+        # Spool the row locally; the writer thread appends it to the Google Sheet in batches
+        resources.get("metrics_writer").enqueue(row_data)
+        st.success("Performance metrics recorded successfully!")
     except Exception as e:
-        st.error(f"Error updating Google Sheets: {e}")
+        st.error(f"Error recording performance metrics: {e}")
 
 
 
 
-def negotiation_assistant(
+def negotiation_prompt(
     customer_name, sentiment, tone, recommendation, current_discount, max_discount, customer_query1, his_negotiation, negotiation_result
 ):
-    """
-    AI generates concise negotiation tips with relevant car details, pricing, and negotiation logic.
-    The LLM calculates discounts and provides seller-focused suggestions to close the deal.
-    """
-    prompt = f"""
+    """Instructions, objectives, customer context and response format shared by both negotiation paths."""
+    return f"""
         INSTRUCTIONS:
         -- You are an AI assistant representing the seller in a car negotiation.
         -- The customer '{customer_name}' has shown interest in the following recommendations:
@@ -75,25 +101,54 @@ def negotiation_assistant(
         2. Justification: Offer one or two strong reasons for the pricing based on features, benefits, and offers.
         3. Seller Recommendation: Suggest one actionable next step to secure the deal.
         4. Tips for the Seller: Provide two concise, actionable tips to help close the deal based on the customer's sentiment and tone.
+    """
+
 
+
+def stream_negotiation_assistant(
+    customer_name, sentiment, tone, recommendation, current_discount, max_discount, customer_query1, his_negotiation, negotiation_result, meter=None
+):
+    """
+    AI generates concise negotiation tips with relevant car details, pricing, and negotiation logic.
+    The LLM calculates discounts and provides seller-focused suggestions to close the deal.
+    Yields the tips as text fragments while they are generated.
+    If a TurnMeter is given, the call is added to it.
+    """
+    prompt = negotiation_prompt(
+        customer_name, sentiment, tone, recommendation, current_discount, max_discount, customer_query1, his_negotiation, negotiation_result
+    ) + """
         BEGIN RESPONSE:
     """
 
     try:
-        # Invoke LLM to handle negotiation logic
-        response = llm.invoke([HumanMessage(content=prompt)])
-        return response.content.strip()
+        # Stream the negotiation logic from the LLM; always fresh so a retried turn can get new tips
+        parts = []
+        for fragment in stream_llm(get_llm(), [HumanMessage(content=prompt)], "negotiation_tips", use_cache=False):
+            parts.append(fragment)
+            yield fragment
+        if meter:
+            meter.add(prompt, "".join(parts))
     except Exception as e:
         st.error(f"Error generating negotiation tips: {e}")
-        return "Unable to generate tips. Please try again."
+        yield "Unable to generate tips. Please try again."
+
+
+def negotiation_assistant(
+    customer_name, sentiment, tone, recommendation, current_discount, max_discount, customer_query1, his_negotiation, negotiation_result
+):
+    """Non-streaming variant of stream_negotiation_assistant; returns the full tips."""
+    return "".join(stream_negotiation_assistant(
+        customer_name, sentiment, tone, recommendation, current_discount, max_discount, customer_query1, his_negotiation, negotiation_result
+    )).strip()
 
 
-def generate_sales(last_message):
+def generate_sales(last_message, meter=None):
     """
     Generates car names and their corresponding prices based on the last message.
     
     Args:
         last_message (str): The last message from the conversation that may contain customer preferences or queries.
+        meter (TurnMeter): Optional; the call is added to it.
     
     Returns:
         list: A list of tuples containing car names and their prices.
@@ -113,13 +168,15 @@ def generate_sales(last_message):
 
     try:
         # Invoke the language model to generate the response
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response = get_llm().invoke([HumanMessage(content=prompt)])
+        if meter:
+            meter.add(prompt, response.content)
         return response.content.strip()
     except Exception as e:
         st.error(f"Error generating car sales information: {e}")
         return []
 
-def generate_notes(last_message):
+def generate_notes(last_message, meter=None):
     """
     Generates a very short summary based on the last message.
     """
@@ -135,15 +192,285 @@ def generate_notes(last_message):
     """
 
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response = get_llm().invoke([HumanMessage(content=prompt)])
+        if meter:
+            meter.add(prompt, response.content)
         return response.content.strip()
     except Exception as e:
         st.error(f"Error generating notes: {e}")
         return "Unable to generate notes."
 
 
+# One LLM call per turn returns the tips, the car/price list and the notes together; set to "0" to
+# go back to three separate calls (tips, generate_sales, generate_notes)
+NEGOTIATION_STRUCTURED = os.getenv("NEGOTIATION_STRUCTURED", "1") != "0"
+
+# Shape of the structured reply. "tips" comes first so it can be shown while the rest is generated.
+NEGOTIATION_TURN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tips": {"type": "string"},
+        "cars": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "price": {"type": "string"}},
+                "required": ["name", "price"],
+            },
+        },
+        "notes": {"type": "string"},
+    },
+    "required": ["tips", "cars", "notes"],
+}
+
+# Last turns kept per path for the comparison table
+TURN_METRICS_WINDOW = 100
+
+# Trailing commas before } or ], a common way for models to break JSON
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_TIPS_KEY = re.compile(r'"tips"\s*:\s*"')
+# How a JSON reply can start (optionally in a code fence), and the prefixes still undecided
+_JSON_OPENING = re.compile(r"\s*(?:```(?:json)?\s*)?\{")
+_JSON_OPENING_PREFIX = re.compile(r"\s*(?:`{0,2}|```(?:j|js|jso|json)?\s*)")
+
+_turn_metrics = {}
+_turn_metrics_lock = threading.Lock()
+
+
+def validate_turn(obj):
+    """
+    Check a decoded reply against NEGOTIATION_TURN_SCHEMA.
+
+    Prices may come back as numbers and are normalised to strings.
+
+    Returns:
+        dict: {"tips": str, "cars": [{"name": str, "price": str}], "notes": str}
+
+    Raises:
+        ValueError: If a required field is missing or has the wrong type.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("Reply is not a JSON object.")
+    for field in NEGOTIATION_TURN_SCHEMA["required"]:
+        if field not in obj:
+            raise ValueError(f"Reply is missing '{field}'.")
+    if not isinstance(obj["tips"], str) or not obj["tips"].strip():
+        raise ValueError("'tips' must be a non-empty string.")
+    if not isinstance(obj["notes"], str):
+        raise ValueError("'notes' must be a string.")
+    if not isinstance(obj["cars"], list):
+        raise ValueError("'cars' must be a list.")
+
+    cars = []
+    for car in obj["cars"]:
+        if not isinstance(car, dict) or not isinstance(car.get("name"), str) or "price" not in car:
+            raise ValueError("Each car needs a 'name' and a 'price'.")
+        if not isinstance(car["price"], (str, int, float)) or isinstance(car["price"], bool):
+            raise ValueError("'price' must be a string or a number.")
+        cars.append({"name": car["name"].strip(), "price": str(car["price"]).strip()})
+    return {"tips": obj["tips"].strip(), "cars": cars, "notes": obj["notes"].strip()}
+
+
+def is_prose(text):
+    """True once the start of a reply shows it is not a JSON object, e.g. plain markdown tips."""
+    return not _JSON_OPENING.match(text) and not _JSON_OPENING_PREFIX.fullmatch(text)
+
+
+def parse_turn(text):
+    """
+    Extract and validate the structured reply from raw model output.
+
+    Tolerates code fences, text around the object and trailing commas.
+
+    Raises:
+        ValueError: If no valid object is found.
+    """
+    text = re.sub(r"```(?:json)?", "", text or "")
+    decoder = json.JSONDecoder()
+    error = ValueError("No JSON object in reply.")
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        start = candidate.find("{")
+        while start != -1:
+            try:
+                obj, _ = decoder.raw_decode(candidate, start)
+                return validate_turn(obj)
+            except ValueError as e:  # JSONDecodeError is a ValueError
+                error = e
+            start = candidate.find("{", start + 1)
+    raise error
+
+
+class _TipsDecoder:
+    """
+    Decodes the "tips" string of a reply that is still being streamed, so the tips can be
+    displayed before the rest of the object (cars, notes) arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None  # offset of the next undecoded character of the tips string
+        self.done = False
+        self.text = ""
+
+    def feed(self, fragment):
+        """Add a fragment of raw output; return the newly decoded part of the tips ("" if none)."""
+        self.buffer += fragment
+        if self.done:
+            return ""
+        if self.position is None:
+            match = _TIPS_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+
+        out = []
+        i, buffer = self.position, self.buffer
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            # Escapes are only decoded once complete; a surrogate pair needs both halves
+            if i + 1 >= len(buffer):
+                break
+            length = 2
+            if buffer[i + 1] == "u":
+                length = 6
+                if buffer[i + 2:i + 4].lower() in ("d8", "d9", "da", "db"):
+                    length = 12
+            if i + length > len(buffer):
+                break
+            try:
+                out.append(json.loads(f'"{buffer[i:i + length]}"'))
+            except ValueError:
+                out.append(buffer[i:i + length])
+            i += length
+        self.position = i
+        decoded = "".join(out)
+        self.text += decoded
+        return decoded
+
+
+class NegotiationTurn:
+    """
+    One structured LLM call for a negotiation turn.
+
+    If the model answers in prose instead of JSON, the prose is streamed as the tips in the
+    same call. If the call fails or the reply ends before the tips are complete, `tips` is
+    empty: the part already shown is not kept as the turn's tips.
+
+    Usage:
+        turn = NegotiationTurn(prompt)
+        st.write_stream(turn.stream())   # shows the tips as they arrive
+        turn.result                      # validated dict, or None if the reply could not be parsed
+    """
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.raw = ""
+        self.tips = ""
+        self.result = None
+        self.error = None
+
+    def stream(self):
+        decoder = _TipsDecoder()
+        parts = []
+        prose = False
+        try:
+            for fragment in stream_llm(get_llm(), [HumanMessage(content=self.prompt)], "negotiation_turn", use_cache=False):
+                parts.append(fragment)
+                if prose:
+                    yield fragment
+                    continue
+                text = decoder.feed(fragment)
+                if text:
+                    yield text
+                elif decoder.position is None and is_prose(decoder.buffer):
+                    prose = True
+                    yield decoder.buffer
+        except Exception as e:
+            self.error = e
+        self.raw = "".join(parts)
+        if prose:
+            self.tips = "" if self.error else self.raw.strip()
+            self.error = self.error or ValueError("Reply is not JSON.")
+            return
+        self.tips = decoder.text.strip() if decoder.done else ""
+        try:
+            self.result = parse_turn(self.raw)
+            self.tips = self.result["tips"]
+        except ValueError as e:
+            self.error = self.error or e
+
+
+def negotiation_turn_prompt(**kwargs):
+    """negotiation_prompt plus the JSON reply format; takes the same arguments."""
+    builder = PromptBuilder("negotiation_turn")
+    return builder.finish(negotiation_prompt(**kwargs) + """
+        Also list each car you mention with its price after the discount, and write one or two
+        sentences of notes summarising the customer's position for the CRM.
+
+        Reply with a single JSON object only, no other text, with "tips" first:
+        {"tips": "<the response above, as markdown>", "cars": [{"name": "<car name>", "price": "<price>"}], "notes": "<notes>"}
+    """)
+
+
+class TurnMeter:
+    """Collects the LLM calls of one negotiation turn; `finish` records them under `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.start = time.perf_counter()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, prompt, completion):
+        self.calls += 1
+        self.prompt_tokens += count_tokens(prompt)
+        self.completion_tokens += count_tokens(completion)
+
+    def finish(self):
+        seconds = time.perf_counter() - self.start
+        with _turn_metrics_lock:
+            _turn_metrics.setdefault(self.path, deque(maxlen=TURN_METRICS_WINDOW)).append(
+                (seconds, self.prompt_tokens, self.completion_tokens, self.calls))
+        print(f"Negotiation turn ({self.path}): {seconds:.2f}s, {self.calls} calls, "
+              f"{self.prompt_tokens} prompt + {self.completion_tokens} completion tokens")
+
+
+def get_turn_metrics():
+    """
+    Negotiation turn latency and token usage per path ("structured", "structured+fallback",
+    "three-call"), over the last TURN_METRICS_WINDOW turns.
+
+    Returns:
+        list[dict]: One row per path with average latency, LLM calls and tokens per turn.
+    """
+    with _turn_metrics_lock:
+        snapshot = {path: list(turns) for path, turns in _turn_metrics.items()}
+    return [
+        {
+            "Path": path,
+            "Turns": len(turns),
+            "Avg latency (s)": round(sum(t[0] for t in turns) / len(turns), 2),
+            "Max latency (s)": round(max(t[0] for t in turns), 2),
+            "Avg calls": round(sum(t[3] for t in turns) / len(turns), 1),
+            "Avg prompt tokens": round(sum(t[1] for t in turns) / len(turns)),
+            "Avg completion tokens": round(sum(t[2] for t in turns) / len(turns)),
+        }
+        for path, turns in snapshot.items()
+    ]
+
+
 
 # Function to handle user input and manage negotiation flow
+@tracing.traced("negotiation.turn", kind="request")
 def handle_input(customer_data):
     # Initialize session state for negotiation history and conversation
     customer_id = customer_data['CustomerID']
@@ -209,8 +536,7 @@ def handle_input(customer_data):
         sentiment = analyze_sentiment(user_input)
         tone = analyze_tone(user_input)
 
-        # Generate updated negotiation tips
-        tips = negotiation_assistant(
+        prompt_args = dict(
             customer_name=customer_name,
             sentiment=sentiment,
             tone=tone,
@@ -221,19 +547,42 @@ def handle_input(customer_data):
             his_negotiation=st.session_state[f'negotiation_history_{customer_id}'][-1] if st.session_state[f'negotiation_history_{customer_id}'] else "",
             negotiation_result="newty strated the negotiotion"
         )
-        st.session_state[f'conversation_{customer_id}'].append(f"### Bot: {tips}")
-        st.session_state[f'negotiation_history_{customer_id}'].append(tips)
 
-        # Display the updated conversation
-        st.write(tips)
+        if NEGOTIATION_STRUCTURED:
+            # One call returns tips, car prices and notes; the tips are displayed as they stream in
+            meter = TurnMeter("structured")
+            turn = NegotiationTurn(negotiation_turn_prompt(**prompt_args))
+            streamed = st.write_stream(turn.stream())
+            meter.add(turn.prompt, turn.raw)
+            tips = turn.tips
+            if turn.error:
+                print(f"Structured negotiation reply rejected, falling back to separate calls: {turn.error}")
+                meter.path = "structured+fallback"
+            if not tips:
+                if streamed:
+                    st.warning("The reply was cut off; generating the tips again.")
+                tips = st.write_stream(stream_negotiation_assistant(**prompt_args, meter=meter)).strip()
+            elif not streamed:
+                st.write(tips)
+            if turn.result:
+                sales_rep = "\n".join(f"- {car['name']}: {car['price']}" for car in turn.result["cars"])
+                notes = turn.result["notes"]
+            else:
+                sales_rep = generate_sales(f"### Bot: {tips}", meter)
+                notes = generate_notes(f"### Bot: {tips}", meter)
+        else:
+            # Generate updated negotiation tips, displayed as they stream in, then the car
+            # prices and notes for the performance metrics in two more calls
+            meter = TurnMeter("three-call")
+            tips = st.write_stream(stream_negotiation_assistant(**prompt_args, meter=meter)).strip()
+            sales_rep = generate_sales(f"### Bot: {tips}", meter)
+            notes = generate_notes(f"### Bot: {tips}", meter)
+        meter.finish()
 
-    
+        st.session_state[f'conversation_{customer_id}'].append(f"### Bot: {tips}")
+        st.session_state[f'negotiation_history_{customer_id}'].append(tips)
 
-    # Generate sales and notes for performance metrics
-    if st.session_state[f'conversation_{customer_id}']:
-        last_message = st.session_state[f'conversation_{customer_id}'][-1]
-        sales_rep = generate_sales(last_message)
-        notes = generate_notes(last_message)
+        # Recorded once per turn (previously every rerun re-generated and re-recorded the last message)
         update_performance_metrics(
             sheet_id="sam",
             customer_name=customer_name,
@@ -0,0 +1,160 @@
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import tracing
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older/newer Streamlit layouts: run stages without a script context
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+log = logging.getLogger(__name__)
+
+
+class StageError(Exception):
+    """
+    A stage raised; the original exception is chained as `__cause__`.
+
+    Attributes:
+        stage (str): Name of the failed stage.
+        results (dict): Results of the stages that finished before the pipeline stopped.
+        timings (dict): Timings of every stage that ran, as returned by run_pipeline.
+    """
+
+    def __init__(self, stage, error, results, timings):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.results = results
+        self.timings = timings
+
+
+class Stage:
+    """
+    A single step of a pipeline.
+
+    Args:
+        name (str): Unique stage name; its result is passed to dependents under this name.
+        func (callable): Called with the results of `deps` as keyword arguments.
+        deps (tuple): Names of the stages that must finish before this one starts.
+    """
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+def _validate(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names must be unique.")
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in names:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'.")
+
+
+def run_pipeline(stages, max_workers=4, on_stage_done=None):
+    """
+    Run stages on a thread pool, starting each one as soon as its dependencies are done.
+
+    Args:
+        stages (list[Stage]): The stages to run.
+        max_workers (int): Maximum number of stages running at the same time.
+        on_stage_done (callable): Optional `callback(name, result)` invoked in the calling
+            thread as each stage finishes, so the page can render partial results early.
+            If it returns something other than None, that replaces the stage's result for its
+            dependents, e.g. a stage returns a text stream and the callback renders it and
+            returns the text. The callback's time counts towards the stage's duration.
+
+    Returns:
+        tuple: (results, timings) where `results` maps stage name to its return value and
+        `timings` maps stage name to {"start", "end", "duration"} in seconds relative to
+        the pipeline start.
+
+    Raises:
+        StageError: When a stage or its callback raised. Stages already running are allowed
+            to finish, but no further stages are started.
+    """
+    _validate(stages)
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+    timings = {}
+    running = {}
+    failed = None  # (stage name, exception) of the first failure
+
+    # Propagate the Streamlit script context so st.* calls inside stages still render
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    t0 = time.perf_counter()
+
+    def run_stage(stage, kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"stage.{stage.name}", kind="stage"):
+                return stage.func(**kwargs)
+        finally:
+            end = time.perf_counter()
+            timings[stage.name] = {
+                "start": start - t0,
+                "end": end - t0,
+                "duration": end - start,
+            }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if failed is None:
+                ready = [s for s in pending.values() if all(dep in results for dep in s.deps)]
+                for stage in ready:
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    # Each stage runs in a copy of the caller's context, so its spans join the caller's trace
+                    running[executor.submit(contextvars.copy_context().run, run_stage, stage, kwargs)] = stage.name
+                    del pending[stage.name]
+            if not running:
+                if pending and failed is None:
+                    raise ValueError(f"Circular dependency between stages: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    if on_stage_done:
+                        rendered = on_stage_done(name, results[name])
+                        if rendered is not None:
+                            results[name] = rendered
+                            end = time.perf_counter() - t0
+                            timings[name].update(end=end, duration=end - timings[name]["start"])
+                except Exception as e:
+                    # Let running stages finish, but do not start their dependents
+                    log.warning("Stage '%s' failed: %s", name, e)
+                    if failed is None:
+                        failed = (name, e)
+
+    log.info("Pipeline timings: %s", ", ".join(
+        f"{name}={t['duration']:.2f}s" for name, t in sorted(timings.items(), key=lambda x: x[1]["start"])
+    ))
+    if failed is not None:
+        name, e = failed
+        raise StageError(name, e, results, timings) from e
+    return results, timings
+
+
+def timings_table(timings):
+    """
+    Convert pipeline timings into rows sorted by start time for display.
+    """
+    return [
+        {
+            "Stage": name,
+            "Start (s)": round(t["start"], 3),
+            "End (s)": round(t["end"], 3),
+            "Duration (s)": round(t["duration"], 3),
+        }
+        for name, t in sorted(timings.items(), key=lambda x: x[1]["start"])
+    ]
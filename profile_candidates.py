@@ -0,0 +1,124 @@
+import os
+import json
+import numpy as np
+from catalog_filter import search_positions
+
+# Saved next to the FAISS index by indexing.save_index
+PROFILE_CANDIDATES_FILE = "profile_candidates.json"
+PROFILE_CANDIDATES_K = int(os.getenv("PROFILE_CANDIDATES_K", "50"))  # candidates kept per profile
+
+# The profile part of the recommendation query comes from small label sets: the emotion and
+# SST-2 classifiers in utils.py (plus the "Neutral" default for missing values) and the
+# intentions the LLM most often returns
+PROFILE_TONES = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+PROFILE_SENTIMENTS = ["POSITIVE", "NEGATIVE", "Neutral"]
+COMMON_INTENTIONS = ["Inquiry", "General Inquiry", "Purchase", "Negotiation", "Complaint", "Comparison", "Financing"]
+
+# Reciprocal rank fusion constant; larger values flatten the advantage of the top ranks
+RRF_K = 60
+
+
+def profile_query(tone, intention, sentiment):
+    """The profile part of the recommendation search query."""
+    return f"Customer is interested in second-hand cars. Their tone is {tone}, intention is {intention}, and sentiment is {sentiment}."
+
+
+def profile_key(tone, sentiment, intention):
+    """Case- and punctuation-insensitive key of a (tone, sentiment, intention) profile."""
+    return "|".join(str(value).strip().strip(".").lower() for value in (tone, sentiment, intention))
+
+
+def _query_vectors(vector_store, queries):
+    embed = getattr(vector_store.embedding_function, "embed_query", vector_store.embedding_function)
+    vectors = np.asarray([embed(query) for query in queries], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def compute_profile_candidates(vector_store, k=PROFILE_CANDIDATES_K):
+    """
+    Search the index once for every (tone, sentiment, common intention) profile.
+
+    Returns:
+        dict: profile_key -> FAISS positions of its nearest `k` products, closest first.
+    """
+    profiles = [(t, s, i) for t in PROFILE_TONES for s in PROFILE_SENTIMENTS for i in COMMON_INTENTIONS]
+    vectors = _query_vectors(vector_store, [profile_query(t, i, s) for t, s, i in profiles])
+    _, found = vector_store.index.search(vectors, min(k, vector_store.index.ntotal))
+    return {
+        profile_key(t, s, i): [int(pos) for pos in row if pos >= 0]
+        for (t, s, i), row in zip(profiles, found)
+    }
+
+
+def search_profile_candidates(vector_store, tone, sentiment, intention, k=PROFILE_CANDIDATES_K, positions=None):
+    """
+    Candidates of a profile that was not precomputed, from one search for its profile query.
+    The query text only depends on the profile, so after the first customer with that profile
+    its embedding comes from the embedding cache.
+
+    Returns:
+        list[int]: FAISS positions of the nearest `k` products (within `positions`), closest first.
+    """
+    vectors = _query_vectors(vector_store, [profile_query(tone, intention, sentiment)])
+    _, found = search_positions(vector_store.index, vectors[0], k, positions)
+    return [int(pos) for pos in found]
+
+
+def save_profile_candidates(index_dir, candidates):
+    with open(os.path.join(index_dir, PROFILE_CANDIDATES_FILE), "w", encoding="utf-8") as f:
+        json.dump(candidates, f)
+
+
+def load_profile_candidates(index_dir):
+    """Load the candidate lists saved with the index, or None if it was built without them."""
+    path = os.path.join(index_dir, PROFILE_CANDIDATES_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fuse_ranked(ranked_lists, k):
+    """Merge ranked position lists by reciprocal rank fusion and return the top `k` positions."""
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, pos in enumerate(ranked):
+            scores[pos] = scores.get(pos, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def profile_search(vector_store, candidates, k=10, question_vector=None, positions=None):
+    """
+    Recommendation search from a profile's precomputed candidates.
+
+    Without a question the candidates are the result, so no embedding or search runs. With a
+    question, only the question is searched and both rankings are fused.
+
+    Args:
+        candidates (list[int]): The profile's precomputed FAISS positions, closest first.
+        question_vector: Embedding of the free-text question, or None.
+        positions: Optional FAISS positions allowed by the hard filters.
+
+    Returns:
+        list: Documents, best first.
+    """
+    if positions is not None:
+        allowed = set(np.asarray(positions).tolist())
+        candidates = [pos for pos in candidates if pos in allowed]
+    ranked = [candidates]
+    if question_vector is not None:
+        vector = np.asarray([question_vector], dtype=np.float32)
+        if getattr(vector_store, "_normalize_L2", False):
+            import faiss
+
+            faiss.normalize_L2(vector)
+        _, found = search_positions(vector_store.index, vector, k, positions)
+        ranked.append([int(pos) for pos in found])
+        found_positions = fuse_ranked(ranked, k)
+    else:
+        found_positions = candidates[:k]
+    return [vector_store.docstore.search(vector_store.index_to_docstore_id[pos]) for pos in found_positions]
@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+from collections import deque
+
+# Per-section token budgets, configurable through config.env
+NOTES_TOKENS = int(os.getenv("PROMPT_NOTES_TOKENS", "300"))
+QUESTION_TOKENS = int(os.getenv("PROMPT_QUESTION_TOKENS", "200"))
+CATALOG_TOKENS = int(os.getenv("PROMPT_CATALOG_TOKENS", "800"))
+CATALOG_LINE_TOKENS = int(os.getenv("PROMPT_CATALOG_LINE_TOKENS", "80"))
+RECOMMENDATIONS_TOKENS = int(os.getenv("PROMPT_RECOMMENDATIONS_TOKENS", "400"))
+RESPONSE_TOKENS = int(os.getenv("PROMPT_RESPONSE_TOKENS", "600"))
+
+# Stored notes are a rolling summary: each post-call summary replaces the previous notes and is
+# kept under this many words (and hard-capped at NOTES_TOKENS) before it is written to the CRM
+NOTES_MAX_WORDS = int(os.getenv("NOTES_MAX_WORDS", "150"))
+
+# Most recent prompts kept per call site for the size table
+STATS_WINDOW = 100
+
+# Words, numbers and single punctuation marks; close to what BPE tokenizers produce for English
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """Approximate the LLM token count of `text` (one token per word or punctuation mark)."""
+    return len(_TOKEN.findall(text or ""))
+
+
+def truncate_tokens(text, budget, marker=" …"):
+    """
+    Cut `text` to at most `budget` tokens, keeping its beginning.
+
+    Returns:
+        str: `text` unchanged if it fits, otherwise its first `budget` tokens plus `marker`.
+    """
+    text = text or ""
+    matches = list(_TOKEN.finditer(text))
+    if len(matches) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    return text[:matches[budget - 1].end()] + marker
+
+
+def compact_notes(notes, budget=NOTES_TOKENS):
+    """Bound a post-call summary before it is stored as the customer's notes."""
+    return truncate_tokens((notes or "").strip(), budget)
+
+
+class PromptBuilder:
+    """
+    Fits prompt sections into token budgets and records the final prompt size per call site.
+
+    Usage:
+        builder = PromptBuilder("llm_response")
+        notes = builder.section(customer_data.get("Notes"), NOTES_TOKENS)
+        prompt = builder.finish(f"... {notes} ...")
+    """
+
+    def __init__(self, call_site):
+        self.call_site = call_site
+        self.trimmed = 0
+
+    def section(self, text, budget, default=""):
+        """Return `text` (or `default` if empty) truncated to `budget` tokens."""
+        text = str(text) if text else default
+        self.trimmed += max(count_tokens(text) - budget, 0)  # the truncation marker is not counted
+        return truncate_tokens(text, budget)
+
+    def lines(self, lines, line_budget=CATALOG_LINE_TOKENS, budget=CATALOG_TOKENS):
+        """
+        Number and join lines (e.g. retrieved catalog entries), truncating each one to
+        `line_budget` tokens and dropping the remaining lines once `budget` is used up.
+        """
+        kept, used = [], 0
+        for i, line in enumerate(lines):
+            short = truncate_tokens(line, line_budget)
+            numbered = f"{i + 1}. {short}"
+            size = count_tokens(numbered)
+            if kept and used + size > budget:
+                self.trimmed += sum(count_tokens(rest) for rest in lines[i:])
+                break
+            self.trimmed += max(count_tokens(line) - line_budget, 0)
+            kept.append(numbered)
+            used += size
+        return "\n".join(kept)
+
+    def finish(self, prompt):
+        """Record the size of the assembled prompt and return it unchanged."""
+        tokens = count_tokens(prompt)
+        with _stats_lock:
+            _stats.setdefault(self.call_site, deque(maxlen=STATS_WINDOW)).append((tokens, self.trimmed))
+        print(f"Prompt {self.call_site}: {tokens} tokens ({self.trimmed} trimmed)")
+        return prompt
+
+
+def get_prompt_stats():
+    """
+    Prompt sizes per call site over the last STATS_WINDOW prompts.
+
+    Returns:
+        list[dict]: One row per call site with average / largest prompt and tokens trimmed by the budgets.
+    """
+    with _stats_lock:
+        snapshot = {name: list(calls) for name, calls in _stats.items()}
+    return [
+        {
+            "Call site": name,
+            "Prompts": len(calls),
+            "Avg tokens": round(sum(c[0] for c in calls) / len(calls)),
+            "Max tokens": max(c[0] for c in calls),
+            "Avg trimmed": round(sum(c[1] for c in calls) / len(calls)),
+        }
+        for name, calls in snapshot.items()
+    ]
@@ -0,0 +1,118 @@
+import time
+import threading
+
+# name -> zero-argument loader, loaded value, per-resource lock and load profile
+_loaders = {}
+_values = {}
+_locks = {}
+_profile = {}
+_registry_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def register(name, loader):
+    """
+    Register a heavy resource to be loaded on first use.
+    Re-registering an existing name is a no-op, so Streamlit reruns of the page script
+    do not reset resources that are already loaded.
+    """
+    with _registry_lock:
+        if name not in _loaders:
+            _loaders[name] = loader
+            _locks[name] = threading.Lock()
+            _profile[name] = {"status": "pending", "seconds": None, "thread": None, "error": None}
+
+
+def get(name):
+    """
+    Return the resource, loading it now if needed.
+    If another thread (e.g. the warm-up thread) is loading it, wait for that load instead.
+    """
+    if name in _values:
+        return _values[name]
+    if name not in _loaders:
+        raise KeyError(f"Unknown resource: {name}")
+
+    with _locks[name]:
+        if name in _values:
+            return _values[name]
+        entry = _profile[name]
+        entry.update(status="loading", thread=threading.current_thread().name, error=None)
+        start = time.perf_counter()
+        try:
+            value = _loaders[name]()
+        except Exception as e:
+            entry.update(status="failed", seconds=time.perf_counter() - start, error=str(e))
+            print(f"Failed to load {name}: {e}")
+            raise
+        entry.update(status="loaded", seconds=time.perf_counter() - start)
+        print(f"Loaded {name} in {entry['seconds']:.2f}s ({entry['thread']}).")
+        _values[name] = value
+        return value
+
+
+def is_loaded(name):
+    return name in _values
+
+
+def reset(*names):
+    """
+    Forget loaded resources so the next get() loads them again, e.g. after their files changed
+    on disk. Callers still holding the old value can keep using it.
+    """
+    for name in names:
+        with _locks[name]:
+            _values.pop(name, None)
+            _profile[name].update(status="pending", seconds=None, thread=None, error=None)
+
+
+def warm_up(names):
+    """
+    Load the given resources one after another in a background thread, so the page can
+    render while models load. Resources that are already loaded are skipped; calling this
+    again while a warm-up is running does nothing.
+    """
+    global _warm_up_thread
+
+    def run():
+        for name in names:
+            if not is_loaded(name):
+                try:
+                    get(name)
+                except Exception:
+                    pass  # Recorded in the profile; first real use will retry and surface the error
+
+    with _registry_lock:
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return _warm_up_thread
+        if all(is_loaded(name) for name in names):
+            return None
+        _warm_up_thread = threading.Thread(target=run, name="resource-warm-up", daemon=True)
+        _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def record(name, seconds):
+    """Add a measured step (e.g. module imports) to the startup profile."""
+    with _registry_lock:
+        _profile[name] = {"status": "done", "seconds": seconds, "thread": threading.current_thread().name, "error": None}
+
+
+def startup_report():
+    """
+    Import and load time per resource, for the startup profiler.
+
+    Returns:
+        list[dict]: One row per resource with its status, seconds, loading thread and error.
+    """
+    with _registry_lock:
+        return [
+            {
+                "Resource": name,
+                "Status": entry["status"],
+                "Seconds": round(entry["seconds"], 2) if entry["seconds"] is not None else None,
+                "Thread": entry["thread"],
+                "Error": entry["error"],
+            }
+            for name, entry in _profile.items()
+        ]
@@ -0,0 +1,146 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Cache settings, configurable through config.env
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+
+class SemanticCache:
+    """
+    Bounded cache of results keyed on a partition plus a query embedding.
+
+    A lookup only considers entries of the same partition (e.g. the customer's tone, sentiment
+    and intention) and returns the one whose query is most similar to the new query, if the
+    cosine similarity reaches `threshold`. Queries without text (vector None) only match other
+    queries without text. The least recently used entry is evicted when the cache is full.
+
+    Entries belong to an index version: `check_version` drops everything when the vector index
+    the results came from changes. Partitions map to integer codes; codes of partitions without
+    entries are forgotten once there are twice as many codes as slots.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.version = None
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim) unit vectors, allocated on the first store
+        self._partitions = np.full(max_entries, -1, dtype=np.int64)  # partition code per slot, -1 = free
+        self._has_text = np.zeros(max_entries, dtype=bool)
+        self._partition_codes = {}
+        self._next_code = 0
+        self._entries = OrderedDict()  # slot -> (value, latency), least recently used first
+        self.stats = {"hits": 0, "misses": 0, "latency_saved": 0.0, "invalidations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _code(self, partition):
+        code = self._partition_codes.get(partition)
+        if code is None:
+            if len(self._partition_codes) >= 2 * self.max_entries:
+                live = set(self._partitions[self._partitions >= 0].tolist())
+                self._partition_codes = {p: c for p, c in self._partition_codes.items() if c in live}
+            code = self._partition_codes[partition] = self._next_code
+            self._next_code += 1
+        return code
+
+    def lookup(self, partition, vector):
+        """
+        Return (value, similarity) of the best matching entry, or None on a miss.
+
+        Args:
+            partition (hashable): Only entries stored under an equal partition can match.
+            vector: The query embedding, or None for a query without text.
+        """
+        with self._lock:
+            code = self._partition_codes.get(partition)
+            candidates = self._partitions == code if code is not None else None
+            slot, similarity = None, None
+            if candidates is not None and candidates.any():
+                if vector is None:
+                    matches = np.flatnonzero(candidates & ~self._has_text)
+                    if len(matches):
+                        slot, similarity = int(matches[0]), 1.0
+                elif self._vectors is not None:
+                    scores = self._vectors @ self._unit(vector)
+                    scores[~(candidates & self._has_text)] = -np.inf
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        slot, similarity = best, float(scores[best])
+
+            if slot is None:
+                self.stats["misses"] += 1
+                return None
+            value, latency = self._entries[slot]
+            self._entries.move_to_end(slot)
+            self.stats["hits"] += 1
+            self.stats["latency_saved"] += latency
+            return value, similarity
+
+    def store(self, partition, vector, value, latency=0.0):
+        """
+        Add a result. `latency` is the time it took to compute, credited as saved on each hit.
+        """
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                slot, _ = self._entries.popitem(last=False)
+            else:
+                slot = int(np.flatnonzero(self._partitions == -1)[0])
+            if vector is not None:
+                unit = self._unit(vector)
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, len(unit)), dtype=np.float32)
+                self._vectors[slot] = unit
+            elif self._vectors is not None:
+                self._vectors[slot] = 0
+            self._partitions[slot] = self._code(partition)
+            self._has_text[slot] = vector is not None
+            self._entries[slot] = (value, latency)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._partitions[:] = -1
+            self._has_text[:] = False
+            self._partition_codes.clear()
+            self.stats["invalidations"] += 1
+
+    def check_version(self, version):
+        """Clear the cache if `version` differs from the index version its entries came from."""
+        if version != self.version:
+            if self._entries:
+                print(f"Vector index changed ({self.version} -> {version}), clearing {len(self._entries)} cached results.")
+                self.clear()
+            self.version = version
+
+    def get_stats(self):
+        """Hit/miss counters, hit rate, latency saved by hits (seconds) and entry count."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def index_version(index_dir):
+    """
+    Identify a saved vector index by its row manifest (rewritten by indexing.save_index on
+    every rebuild), or None if there is none.
+    """
+    path = os.path.join(index_dir, "manifest.json")
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
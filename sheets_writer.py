@@ -0,0 +1,227 @@
+import os
+import csv
+import json
+import time
+import random
+import sqlite3
+import threading
+import tracing
+
+# Writer settings
+METRICS_SPOOL_PATH = os.getenv("METRICS_SPOOL_PATH", "metrics_spool.db")
+METRICS_BATCH_SIZE = int(os.getenv("METRICS_BATCH_SIZE", "50"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # seconds
+METRICS_MAX_BACKOFF = float(os.getenv("METRICS_MAX_BACKOFF", "300"))  # seconds
+LEASE_SECONDS = 120  # a claimed batch is retried by others if its writer dies before deleting it
+
+
+class FakeSheet:
+    """
+    Local stand-in for a gspread worksheet, for offline testing and benchmarks.
+
+    Args:
+        path (str): Optional CSV file that appended rows are written to.
+        latency (float): Seconds each API call sleeps, to mimic a Sheets round trip.
+        fail_every (int): If set, every n-th call raises a quota error.
+    """
+
+    def __init__(self, path=None, latency=0.0, fail_every=0):
+        self.path = path
+        self.latency = latency
+        self.fail_every = fail_every
+        self.rows = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.latency)
+        if self.fail_every and calls % self.fail_every == 0:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: Quota exceeded (fake sheet)")
+        with self._lock:
+            self.rows.extend(values)
+            if self.path:
+                with open(self.path, "a", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerows(values)
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+
+def is_quota_error(error):
+    """True for Sheets rate-limit errors (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return "429" in str(error) or "quota" in str(error).lower()
+
+
+class SheetsWriter:
+    """
+    Background writer that spools metric rows in SQLite and appends them to a sheet in batches.
+
+    Rows are persisted before `enqueue` returns, so they survive restarts and Sheets outages.
+    A flush runs when `batch_size` rows are pending or every `flush_interval` seconds; failed
+    flushes are retried with exponential backoff (longer for quota errors).
+
+    Args:
+        sheet_factory (callable): Returns the worksheet to append to; called lazily in the
+            writer thread so authentication does not block the page.
+    """
+
+    def __init__(self, sheet_factory, spool_path=METRICS_SPOOL_PATH, batch_size=METRICS_BATCH_SIZE,
+                 flush_interval=METRICS_FLUSH_INTERVAL, max_backoff=METRICS_MAX_BACKOFF):
+        self.sheet_factory = sheet_factory
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failures": 0}
+        self._sheet = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS PendingRows (
+                RowID INTEGER PRIMARY KEY AUTOINCREMENT,
+                Payload TEXT NOT NULL,
+                EnqueuedAt REAL,
+                LeaseOwner TEXT,
+                LeaseUntil REAL
+            )
+            """
+        )
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.spool_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        return conn
+
+    def start(self):
+        """Start the background flush thread (pending rows from a previous run are flushed first)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True):
+        """Stop the writer thread, optionally attempting a final flush."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if flush:
+            self.flush()
+
+    @tracing.traced("sheets.enqueue", kind="sheets")
+    def enqueue(self, row):
+        """Persist a row to the spool; it is appended to the sheet by the writer thread."""
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO PendingRows (Payload, EnqueuedAt) VALUES (?, ?)", (json.dumps(row), time.time()))
+            pending = conn.execute("SELECT COUNT(*) FROM PendingRows").fetchone()[0]
+        finally:
+            conn.close()
+        self.stats["enqueued"] += 1
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM PendingRows").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _claim_batch(self, conn):
+        # Lease a batch so concurrent writers (other Streamlit processes) do not append it twice
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """
+                SELECT RowID, Payload FROM PendingRows
+                WHERE LeaseUntil IS NULL OR LeaseUntil < ?
+                ORDER BY RowID LIMIT ?
+                """,
+                (now, self.batch_size),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE PendingRows SET LeaseOwner = ?, LeaseUntil = ? WHERE RowID = ?",
+                    [(self.owner, now + LEASE_SECONDS, row_id) for row_id, _ in rows],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def flush(self):
+        """
+        Append pending rows to the sheet in batches until the spool is empty or a call fails.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        appended = 0
+        conn = self._connect()
+        try:
+            while True:
+                rows = self._claim_batch(conn)
+                if not rows:
+                    break
+                try:
+                    with tracing.span("sheets.append_rows", kind="sheets", rows=len(rows)):
+                        if self._sheet is None:
+                            self._sheet = self.sheet_factory()
+                        self._sheet.append_rows([json.loads(payload) for _, payload in rows])
+                except Exception as e:
+                    conn.execute(
+                        "UPDATE PendingRows SET LeaseOwner = NULL, LeaseUntil = NULL WHERE LeaseOwner = ?",
+                        (self.owner,),
+                    )
+                    self._schedule_retry(e)
+                    break
+                conn.executemany("DELETE FROM PendingRows WHERE RowID = ?", [(row_id,) for row_id, _ in rows])
+                appended += len(rows)
+                self._failures = 0
+                self.stats["flushed"] += len(rows)
+                self.stats["batches"] += 1
+        finally:
+            conn.close()
+        return appended
+
+    def _schedule_retry(self, error):
+        self._failures += 1
+        self.stats["failures"] += 1
+        base = 2.0 if is_quota_error(error) else 1.0
+        delay = min(self.max_backoff, base * 2 ** self._failures) * random.uniform(0.5, 1.0)
+        self._retry_at = time.time() + delay
+        if not is_quota_error(error):
+            self._sheet = None  # Re-authenticate on the next attempt
+        print(f"Sheets flush failed ({error}); retrying in {delay:.1f}s.")
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = max(self._retry_at - time.time(), 0.0) if self._failures else self.flush_interval
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if time.time() < self._retry_at:
+                continue  # Still backing off; enqueued rows stay in the spool
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Sheets writer error: {e}")
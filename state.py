@@ -1,4 +1,106 @@
+import os
+import threading
+import numpy as np
 import pandas as pd
+import streamlit as st
 
-# Shared DataFrame for interaction history
-Sinteraction_history = pd.DataFrame(columns=["Step", "Sentiment", "Tone"])
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Older/newer Streamlit layouts: fall back to the process-wide history
+    get_script_run_ctx = None
+
+# Steps kept per session for the sidebar chart
+HISTORY_CAPACITY = int(os.getenv("HISTORY_CAPACITY", "500"))
+
+# Labels are stored as small ints: sentiment as -1/+1 (0 = unknown), tone as an index into
+# TONE_LABELS (-1 = unknown), so the chart can plot them directly
+SENTIMENT_CODES = {"NEGATIVE": -1, "POSITIVE": 1}
+TONE_LABELS = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+TONE_CODES = {label: code for code, label in enumerate(TONE_LABELS)}
+UNKNOWN = (0, -1)
+
+# Sentiment and tone of one utterance arrive separately (and concurrently, see pipeline.py);
+# they are merged into one row when they arrive within this many steps of each other
+MERGE_WINDOW = 4
+
+
+class InteractionHistory:
+    """
+    Fixed-capacity time series of sentiment and tone codes, one row per analysed utterance.
+
+    Every row is written twice, at slot i and i + capacity, so the last `n` rows are always a
+    contiguous slice: appends are O(1) and `view()` needs no copy, even after wrapping around.
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.capacity = capacity
+        self._codes = np.zeros((2 * capacity, 2), dtype=np.int8)
+        self._steps = np.zeros(2 * capacity, dtype=np.int32)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def _write(self, slot, column, code):
+        self._codes[slot, column] = code
+        self._codes[slot + self.capacity, column] = code
+
+    def record(self, text, sentiment=None, tone=None):
+        """
+        Add the sentiment and/or tone label of an utterance.
+
+        If the other label of the same utterance was recorded in the last MERGE_WINDOW steps,
+        it is filled into that row instead of starting a new one.
+        """
+        key = hash(text)
+        updates = []
+        if sentiment is not None:
+            updates.append((0, SENTIMENT_CODES.get(str(sentiment).upper(), UNKNOWN[0])))
+        if tone is not None:
+            updates.append((1, TONE_CODES.get(str(tone).lower(), UNKNOWN[1])))
+
+        with self._lock:
+            for back in range(1, min(MERGE_WINDOW, len(self)) + 1):
+                slot = (self._count - back) % self.capacity
+                if self._keys[slot] == key and all(self._codes[slot, column] == UNKNOWN[column] for column, _ in updates):
+                    for column, code in updates:
+                        self._write(slot, column, code)
+                    return
+
+            slot = self._count % self.capacity
+            self._keys[slot] = key
+            self._steps[slot] = self._steps[slot + self.capacity] = self._count + 1
+            for column in (0, 1):
+                self._write(slot, column, UNKNOWN[column])
+            for column, code in updates:
+                self._write(slot, column, code)
+            self._count += 1
+
+    def view(self):
+        """
+        The retained rows in order, as a DataFrame indexed by Step over the internal buffer (no copy).
+        Take a copy before modifying it.
+        """
+        with self._lock:
+            n = len(self)
+            start = (self._count - n) % self.capacity
+            codes = self._codes[start:start + n]
+            steps = self._steps[start:start + n]
+        return pd.DataFrame(codes, index=pd.Index(steps, name="Step", copy=False), columns=["Sentiment", "Tone"], copy=False)
+
+
+# Used outside a Streamlit session (scripts, benchmarks)
+_process_history = InteractionHistory()
+_session_lock = threading.Lock()
+
+
+def get_interaction_history():
+    """Return the interaction history of the current Streamlit session, creating it on first use."""
+    if get_script_run_ctx is None or get_script_run_ctx() is None:
+        return _process_history
+    with _session_lock:  # Sentiment and tone stages may ask for it concurrently
+        if "interaction_history" not in st.session_state:
+            st.session_state.interaction_history = InteractionHistory()
+    return st.session_state.interaction_history
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Several modules copy the key from config.env into the environment at import
+os.environ.setdefault("HUGGINGFACE_API_KEY", "test")
+
+
+@pytest.fixture
+def crm(tmp_path, monkeypatch):
+    """A migrated CRM database in a temporary directory, used by the db module's pool."""
+    import db
+    from crm_database_create import migrate
+
+    path = str(tmp_path / "crm.db")
+    migrate(path)
+    monkeypatch.setattr(db, "pool", db.ConnectionPool(path))
+    yield path
+    db.pool.close_all()
@@ -0,0 +1,90 @@
+import importlib
+import pandas as pd
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("dotenv")
+
+DIM = 32
+ROWS = 2600  # enough to train every index type, including IVF-PQ
+
+
+class FakeEmbeddings:
+    def __init__(self, model_name=None):
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+
+        self.model_name = model_name
+        self._fake = DeterministicFakeEmbedding(size=DIM)
+
+    def embed_documents(self, texts):
+        return self._fake.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._fake.embed_query(text)
+
+
+@pytest.fixture(scope="module")
+def indexing(tmp_path_factory):
+    # indexing builds its sentence-transformers model at import; swap in deterministic vectors
+    huggingface = importlib.import_module("langchain.embeddings.huggingface")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(huggingface, "HuggingFaceEmbeddings", FakeEmbeddings)
+    import ann_index
+    import indexing
+    from embedding_cache import EmbeddingStore
+
+    patch.setattr(ann_index, "PQ_M", 8)
+    patch.setattr(indexing, "INGEST_CHECKPOINT_ROWS", 0)
+    indexing.embeddings._store = EmbeddingStore(str(tmp_path_factory.mktemp("embedding_cache")), dim=DIM)
+    yield indexing
+    patch.undo()
+
+
+def catalog(ids):
+    return pd.DataFrame({
+        "ID": ids,
+        "Name": [f"Car {i}" for i in ids],
+        "Location": "Pune",
+        "Year": [2000 + i % 20 for i in ids],
+        "Kilometers_Driven": [1000 * i for i in ids],
+        "Fuel_Type": "Petrol",
+        "Transmission": "Manual",
+        "Owner_Type": "First",
+        "Mileage": "18 kmpl",
+        "Engine": "1197 CC",
+        "Power": "82 bhp",
+        "Seats": 5,
+        "Price": [3 + i % 10 for i in ids],
+    })
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+def test_update_with_deletions_keeps_ids_and_vectors_in_step(indexing, tmp_path, index_type):
+    index_dir = str(tmp_path / "index")
+    path = tmp_path / "catalog.csv"
+    catalog(list(range(ROWS))).to_csv(path, index=False)
+    assert indexing.ingest_product_data(str(path), index_dir, index_type)
+    indexing.save_index(index_dir)
+    assert indexing.index_config["type"] == index_type
+
+    # Remove a few rows, change a few and add new ones
+    updated = catalog([i for i in range(ROWS) if i % 500 != 7] + [ROWS, ROWS + 1])
+    changed = updated["ID"].isin([10, 1200, 2500])
+    updated.loc[changed, "Price"] = 99
+    updated.to_csv(path, index=False)
+    report = indexing.ingest_product_data(str(path), index_dir, index_type)
+    assert report == {"added": 2, "changed": 3, "removed": 6, "unchanged": len(updated) - 5}
+
+    store = indexing.vector_store
+    assert store.index.ntotal == len(store.index_to_docstore_id) == len(store.docstore._dict) == len(updated)
+    assert set(store.index_to_docstore_id.values()) == set(indexing.manifest)
+    assert not {f"{i}#1" for i in range(7, ROWS, 500)} & set(indexing.manifest)
+
+    # Every changed or added row is found by its own vector under its own id and text
+    texts = dict(zip(indexing.row_keys(updated), indexing.product_texts(updated)))
+    for key in ["10#1", "1200#1", "2500#1", f"{ROWS}#1", f"{ROWS + 1}#1"]:
+        vector = indexing.embeddings.embed_query(texts[key])
+        [doc] = store.similarity_search_by_vector(vector, k=1)
+        assert doc.page_content == texts[key]
+        assert store.docstore.search(key).page_content == texts[key]
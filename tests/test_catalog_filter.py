@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from catalog_filter import AttributeIndex, extract_constraints, search_positions
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Any diesel automatic under 8 lakhs?", {"price_max": 8.0, "fuel": {"diesel"}, "transmission": {"automatic"}}),
+    ("between 5 and 7 lakh", {"price_min": 5.0, "price_max": 7.0}),
+    ("my budget of Rs 6,00,000", {"price_max": 6.0}),
+    ("above 3.5 lacs", {"price_min": 3.5}),
+    ("under 50000 km please", {"km_max": 50000.0}),
+    ("less than 40k kms", {"km_max": 40000.0}),
+    ("2015 or newer", {"year_min": 2015}),
+    ("after 2018", {"year_min": 2019}),
+    ("before 2012", {"year_max": 2011}),
+    ("from 20000 km", {}),
+    ("since 20150", {}),
+    ("from 2015 km onwards", {}),
+    ("before 1999km", {}),
+    ("under 9 lakhs from 2016", {"price_max": 9.0, "year_min": 2016}),
+    ("a 7 seater", {"seats_min": 7}),
+    ("manual or automatic, petrol or cng", {"fuel": {"petrol", "cng"}}),
+    ("something reliable", {}),
+    ("", {}),
+    (None, {}),
+])
+def test_extract_constraints(text, expected):
+    assert extract_constraints(text) == expected
+
+
+def test_locations_are_matched_as_whole_words():
+    assert extract_constraints("cars in Pune", ["Pune", "Mumbai"]) == {"location": {"pune"}}
+    assert extract_constraints("computer", ["Pune"]) == {}
+
+
+def attribute_index():
+    data = pd.DataFrame({
+        "Price": [4.5, 9.0, 6.0, None],
+        "Year": [2014, 2019, 2017, 2020],
+        "Kilometers_Driven": [80000, 20000, 45000, 10000],
+        "Seats": [5, 7, 5, 5],
+        "Fuel_Type": ["Petrol", "Diesel", "Diesel", "Petrol"],
+        "Transmission": ["Manual", "Automatic", "Manual", "Manual"],
+        "Location": ["Pune", "Mumbai", "Pune", "Pune"],
+    })
+    return AttributeIndex.from_dataframe(data, ["a", "b", "c", "d"])
+
+
+def test_mask_applies_every_constraint_and_missing_values_fail_bounds():
+    index = attribute_index()
+    assert index.mask({"price_max": 8.0}).tolist() == [True, False, True, False]
+    assert index.mask({"fuel": {"diesel"}, "location": {"pune"}}).tolist() == [False, False, True, False]
+    assert index.mask({"year_min": 2016, "km_max": 50000}).tolist() == [False, True, True, True]
+
+
+def test_candidate_positions_follow_the_faiss_positions(tmp_path):
+    index = attribute_index()
+    index.save(str(tmp_path))
+    loaded = AttributeIndex.load(str(tmp_path)).bind({0: "d", 1: "c", 2: "a"})  # "b" was deleted
+    assert sorted(loaded.candidate_positions({"location": {"pune"}}).tolist()) == [0, 1, 2]
+    assert loaded.candidate_positions({"fuel": {"diesel"}}).tolist() == [1]
+
+
+def test_search_positions_only_returns_allowed_positions():
+    faiss = pytest.importorskip("faiss")
+    vectors = np.random.default_rng(0).random((200, 8), dtype=np.float32)
+    index = faiss.IndexFlatL2(8)
+    index.add(vectors)
+    allowed = np.arange(1, 200, 3)
+    _, found = search_positions(index, vectors[0], 5, allowed)
+    assert len(found) == 5 and set(found.tolist()) <= set(allowed.tolist())
+    _, found = search_positions(index, vectors[0], 5, [])
+    assert len(found) == 0
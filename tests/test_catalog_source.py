@@ -0,0 +1,51 @@
+import re
+import zipfile
+import pandas as pd
+import pytest
+from catalog_source import REQUIRED_COLUMNS, catalog_row_count, product_texts, read_catalog_chunks, row_keys
+
+
+def catalog(rows):
+    data = {column: [f"{column} {i}" for i in range(rows)] for column in REQUIRED_COLUMNS}
+    data["Year"] = [2010 + i % 10 for i in range(rows)]
+    return pd.DataFrame(data)
+
+
+def test_csv_row_count_and_chunks(tmp_path):
+    path = str(tmp_path / "catalog.csv")
+    catalog(25).to_csv(path, index=False)
+    assert catalog_row_count(path) == 25
+    assert [len(chunk) for chunk in read_catalog_chunks(path, chunk_rows=10)] == [10, 10, 5]
+
+
+def test_xlsx_row_count_without_dimension_record(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = str(tmp_path / "catalog.xlsx")
+    catalog(25).to_excel(path, index=False)
+    assert catalog_row_count(path) == 25
+
+    # Some writers leave out the sheet dimension; the count must not silently become unknown
+    stripped = str(tmp_path / "stripped.xlsx")
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(stripped, "w") as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb"<dimension[^>]*/>", b"", data)
+            target.writestr(item, data)
+    assert catalog_row_count(stripped) == 25
+    assert sum(len(chunk) for chunk in read_catalog_chunks(stripped, chunk_rows=10)) == 25
+
+
+def test_row_keys_number_repeated_listings_across_chunks():
+    chunk = catalog(2)
+    seen = {}
+    first = row_keys(pd.concat([chunk, chunk.iloc[:1]], ignore_index=True), seen)
+    second = row_keys(chunk.iloc[:1], seen)
+    assert first[0].endswith("#1") and first[2].endswith("#2")
+    assert second[0] == first[0][:-1] + "3"
+
+
+def test_product_texts_ignore_float_dtype_of_integral_columns():
+    chunk = catalog(2)
+    as_float = chunk.assign(Year=chunk["Year"].astype(float))
+    assert product_texts(chunk) == product_texts(as_float)
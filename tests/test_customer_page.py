@@ -0,0 +1,107 @@
+import sqlite3
+import pytest
+import db
+
+# (name, [(date, status, sentiment), ...]) per customer; the last interaction date is the latest
+CUSTOMERS = [
+    ("Asha", [("2024-01-01", "New", "Positive"), ("2024-03-01", "Active", "negative")]),
+    ("Asha", [("2024-02-01", "Closed-Won", "Positive")]),
+    ("Asha", []),
+    ("Asha", [("2024-01-05", "Active", "Neutral")]),
+    ("Asha", [("2024-01-06", "Active", "POSITIVE")]),
+    ("Ashwin", [("2024-01-07", "New", "Positive")]),
+    ("A\U0001F600 Motors", [("2024-01-08", "Active", "Positive")]),
+    ("B\uffff", [("2024-01-09", "New", "Negative")]),
+    ("Meera", [("2024-02-02", "Negotiating", "Negative"), ("2024-01-01", "Active", "Positive")]),
+    ("Ravi", [("2024-01-10", "Active", "Neutral")]),
+    ("Ravi", [("2024-01-11", "New", "Positive")]),
+    ("ashok", [("2024-01-12", "Active", "Positive")]),
+]
+
+
+@pytest.fixture
+def customers(crm):
+    conn = sqlite3.connect(crm)
+    latest = {}
+    for name, interactions in CUSTOMERS:
+        customer_id = conn.execute("INSERT INTO Customers (Name) VALUES (?)", (name,)).lastrowid
+        for date, status, sentiment in interactions:
+            conn.execute(
+                "INSERT INTO InteractionHistory (CustomerID, InteractionDate, LastDealStatus, Sentiment, Notes) VALUES (?, ?, ?, ?, ?)",
+                (customer_id, date, status, sentiment, f"{name} on {date}"),
+            )
+        latest[customer_id] = (name,) + (max(interactions)[1:] if interactions else (None, None))
+    conn.commit()
+    conn.close()
+    return latest
+
+
+def all_pages(page_size, **filters):
+    ids, after, pages = [], None, 0
+    while True:
+        page, after = db.fetch_customer_page(after=after, page_size=page_size, **filters)
+        assert len(page) <= page_size
+        ids += page["CustomerID"].tolist()
+        pages += 1
+        if after is None:
+            return ids, pages
+        assert len(page) == page_size
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 5, 12, 50])
+def test_pages_return_every_customer_once_in_name_order(customers, page_size):
+    ids, pages = all_pages(page_size)
+    assert sorted(ids) == sorted(customers)
+    assert ids == sorted(customers, key=lambda customer_id: (customers[customer_id][0], customer_id))
+    assert pages == max(1, -(-len(customers) // page_size))  # no empty page after an exact fit
+
+
+def test_last_page_has_no_cursor(customers):
+    page, after = db.fetch_customer_page(page_size=len(customers))
+    assert len(page) == len(customers) and after is None
+    page, after = db.fetch_customer_page(page_size=len(customers) - 1)
+    assert after == (page["Name"].iloc[-1], page["CustomerID"].iloc[-1])
+
+
+@pytest.mark.parametrize("filters", [
+    {"name": "Asha"},
+    {"name": "Ash"},
+    {"name": "A"},
+    {"name": "B"},
+    {"name": "ash"},
+    {"name": "Zed"},
+    {"status": "Active"},
+    {"sentiment": "positive"},
+    {"name": "Asha", "status": "Active", "sentiment": "Negative"},
+    {"name": "R", "sentiment": "Positive"},
+])
+def test_filters_match_the_latest_interaction_and_the_count(customers, filters):
+    expected = sorted(
+        customer_id for customer_id, (name, status, sentiment) in customers.items()
+        if name.startswith(filters.get("name", ""))
+        and filters.get("status", status) == status
+        and (sentiment or "").upper() == filters.get("sentiment", sentiment or "").upper()
+    )
+    ids, _ = all_pages(2, **filters)
+    assert sorted(ids) == expected
+    assert db.count_customers(**filters) == len(expected)
+
+
+def test_name_prefix_includes_characters_above_the_basic_plane(customers):
+    page, _ = db.fetch_customer_page(name="A")
+    assert "A\U0001F600 Motors" in page["Name"].tolist()
+    assert db.count_customers(name="B") == 1
+
+
+def test_prefix_successor():
+    assert db._prefix_successor("Ash") == "Asi"
+    assert db._prefix_successor("A\U0010FFFF") == "B"
+    assert db._prefix_successor("\U0010FFFF") is None
+    assert db._prefix_successor("A\ud7ff") == "A\ue000"
+
+
+def test_customer_notes_are_newest_first(customers):
+    meera = next(customer_id for customer_id, row in customers.items() if row[0] == "Meera")
+    notes = db.fetch_customer_notes(meera)
+    assert notes["Notes"].tolist() == ["Meera on 2024-02-02", "Meera on 2024-01-01"]
+    assert db.fetch_customer_notes(meera, limit=1)["LastDealStatus"].tolist() == ["Negotiating"]
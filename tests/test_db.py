@@ -0,0 +1,113 @@
+import sqlite3
+import pytest
+import db
+from crm_database_create import LATEST_VERSION, migrate
+from db import ConnectionPool, PoolExhaustedError
+
+
+def test_exhausted_pool_raises_an_sqlite_error(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "crm.db"), max_connections=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError, match="connection pool exhausted"):
+            with pool.connection():
+                pass
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert issubclass(PoolExhaustedError, sqlite3.Error)
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "crm.db"), max_connections=2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    with pytest.raises(ValueError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise ValueError("abort")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+
+
+def add_customer(conn, name, interactions=(), recommendations=()):
+    customer_id = conn.execute("INSERT INTO Customers (Name, Email) VALUES (?, ?)", (name, f"{name}@example.com")).lastrowid
+    for date, status, notes in interactions:
+        conn.execute(
+            "INSERT INTO InteractionHistory (CustomerID, InteractionDate, LastDealStatus, Notes) VALUES (?, ?, ?, ?)",
+            (customer_id, date, status, notes),
+        )
+    for date, deal in recommendations:
+        conn.execute("INSERT INTO Recommendations (CustomerID, Date, RecommendedDeal) VALUES (?, ?, ?)", (customer_id, date, deal))
+    return customer_id
+
+
+def test_latest_interaction_and_recommendation_are_chosen_independently(crm):
+    conn = sqlite3.connect(crm)
+    asha = add_customer(
+        conn, "Asha",
+        interactions=[("2024-03-01", "Negotiating", "latest"), ("2024-01-01", "New", "first"), ("2024-02-01", "Active", "middle")],
+        recommendations=[("2024-01-15", "Honda City"), ("2024-04-01", "Hyundai Creta"), ("2024-02-15", "Maruti Swift")],
+    )
+    # Ties on the date go to the row inserted last
+    add_customer(
+        conn, "Ravi",
+        interactions=[("2024-05-01", "Active", "earlier row"), ("2024-05-01", "Closed-Won", "later row")],
+        recommendations=[("2024-05-01", "Tata Nexon"), ("2024-05-01", "Kia Seltos")],
+    )
+    add_customer(conn, "Meera")
+    conn.commit()
+    conn.close()
+
+    asha_row = db.fetch_customer_data("Asha")
+    assert asha_row["CustomerID"] == asha
+    assert (asha_row["LastDealStatus"], asha_row["Notes"], asha_row["InteractionDate"]) == ("Negotiating", "latest", "2024-03-01")
+    assert asha_row["RecommendedDeal"] == "Hyundai Creta"
+
+    ravi_row = db.fetch_customer_data("Ravi")
+    assert (ravi_row["LastDealStatus"], ravi_row["Notes"], ravi_row["RecommendedDeal"]) == ("Closed-Won", "later row", "Kia Seltos")
+
+    meera_row = db.fetch_customer_data("Meera")
+    assert meera_row["Email"] == "Meera@example.com"
+    assert meera_row["Notes"] is None and meera_row["RecommendedDeal"] is None
+    assert db.fetch_customer_data("Nobody") is None
+
+
+def indexes(path):
+    conn = sqlite3.connect(path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")}
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return names, version
+
+
+def test_migrate_is_idempotent_and_records_the_version(tmp_path):
+    path = str(tmp_path / "crm.db")
+    assert migrate(path) == LATEST_VERSION
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO Customers (Name) VALUES ('Asha')")
+    conn.commit()
+    conn.close()
+    assert migrate(path) == LATEST_VERSION
+    assert indexes(path)[1] == LATEST_VERSION
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT Name FROM Customers").fetchall() == [("Asha",)]
+    conn.close()
+
+
+def test_v1_database_is_upgraded_with_the_lookup_indexes(tmp_path):
+    path = str(tmp_path / "crm.db")
+    assert migrate(path, target=1) == 1
+    assert indexes(path) == (set(), 1)
+    # Enough rows that the statistics gathered by the migration favour the indexes
+    conn = sqlite3.connect(path)
+    for i in range(200):
+        add_customer(conn, f"Customer {i}", interactions=[("2024-01-01", "New", "kept")], recommendations=[("2024-01-01", "Honda City")])
+    conn.commit()
+    conn.close()
+
+    assert migrate(path) == 2
+    assert indexes(path) == ({"idx_name", "idx_interaction_customer_date", "idx_recommendation_customer_date"}, 2)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM InteractionHistory WHERE Notes = 'kept'").fetchone() == (200,)
+    plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + db.CUSTOMER_QUERY, ("Customer 7",)))
+    conn.close()
+    assert "idx_name" in plan and "idx_interaction_customer_date" in plan and "idx_recommendation_customer_date" in plan
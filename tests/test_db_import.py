@@ -0,0 +1,59 @@
+import csv
+import sqlite3
+import threading
+import db
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=db.IMPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_import_links_interactions_and_recommendations_to_new_ids(crm, tmp_path):
+    with db.pool.connection() as conn:
+        conn.execute("INSERT INTO Customers (Name) VALUES ('Existing')")
+        conn.execute("INSERT INTO Customers (Name) VALUES ('Deleted')")
+        conn.execute("DELETE FROM Customers WHERE Name = 'Deleted'")
+    path = write_csv(tmp_path / "customers.csv", [
+        {"Name": "Asha", "Notes": "Wants a diesel SUV.", "RecommendedDeal": "Hyundai Creta"},
+        {"Name": "", "Notes": "no name, skipped"},
+        {"Name": "Ravi"},
+        {"Name": "Meera", "LastDealStatus": "Active", "InteractionDate": "2024-01-02 10:00:00"},
+    ])
+    report = db.import_customers_csv(path, batch_size=2)
+    assert report == {"customers": 3, "interactions": 2, "recommendations": 1, "skipped": 1}
+
+    conn = sqlite3.connect(crm)
+    # AUTOINCREMENT never reuses the deleted customer's id
+    assert conn.execute("SELECT Name, CustomerID FROM Customers ORDER BY CustomerID").fetchall() == [
+        ("Existing", 1), ("Asha", 3), ("Ravi", 4), ("Meera", 5)]
+    assert conn.execute(
+        "SELECT c.Name, ih.Notes, ih.LastDealStatus FROM InteractionHistory ih JOIN Customers c USING (CustomerID) ORDER BY c.CustomerID"
+    ).fetchall() == [("Asha", "Wants a diesel SUV.", "New"), ("Meera", None, "Active")]
+    assert conn.execute(
+        "SELECT c.Name, r.RecommendedDeal FROM Recommendations r JOIN Customers c USING (CustomerID)"
+    ).fetchall() == [("Asha", "Hyundai Creta")]
+    conn.close()
+
+
+def test_concurrent_imports_never_share_ids(crm, tmp_path):
+    paths = [write_csv(tmp_path / f"part{i}.csv", [{"Name": f"P{i}-{j}", "Notes": f"note {i}-{j}"} for j in range(50)])
+             for i in range(4)]
+    threads = [threading.Thread(target=db.import_customers_csv, args=(path, 10)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = sqlite3.connect(crm)
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT CustomerID) FROM Customers").fetchone() == (200, 200)
+    # Every interaction belongs to the customer it was imported with
+    mismatched = conn.execute(
+        "SELECT COUNT(*) FROM InteractionHistory ih JOIN Customers c USING (CustomerID) "
+        "WHERE ih.Notes != 'note ' || substr(c.Name, 2)"
+    ).fetchone()[0]
+    assert mismatched == 0
+    conn.close()
@@ -0,0 +1,74 @@
+import hashlib
+import multiprocessing
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+from embedding_cache import KEY_SIZE, EmbeddingStore
+
+DIM = 8
+
+
+def content_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+def vector(text):
+    return np.frombuffer(content_key(text), dtype=np.uint8)[:DIM].astype(np.float32)
+
+
+def put(store, texts):
+    store.put_many([content_key(t) for t in texts], [vector(t) for t in texts])
+
+
+def test_stores_sharing_a_directory_see_each_others_appends(tmp_path):
+    first = EmbeddingStore(str(tmp_path), dim=DIM)
+    second = EmbeddingStore(str(tmp_path), dim=DIM)
+    put(first, ["a", "b"])
+    assert np.array_equal(second.get(content_key("a")), vector("a"))
+    # second appends after first's rows instead of overwriting them
+    put(second, ["c"])
+    assert np.array_equal(first.get(content_key("c")), vector("c"))
+    for text in ["a", "b", "c"]:
+        assert np.array_equal(first.get(content_key(text)), vector(text))
+    assert len(first) == len(second) == 3
+
+
+def test_compaction_in_one_store_is_picked_up_by_the_other(tmp_path):
+    first = EmbeddingStore(str(tmp_path), dim=DIM)
+    second = EmbeddingStore(str(tmp_path), dim=DIM)
+    texts = [f"text {i}" for i in range(20)]
+    put(first, texts)
+    time.sleep(0.01)
+    # Only the other store uses this entry; compaction must still keep it
+    assert second.get(content_key("text 3")) is not None
+    second.flush_access()
+    first.compact(keep=1)
+    assert np.array_equal(second.get(content_key("text 3")), vector("text 3"))
+    assert second.get(content_key("text 4")) is None
+    put(second, ["new"])
+    assert np.array_equal(first.get(content_key("new")), vector("new"))
+    assert np.array_equal(first.get(content_key("text 3")), vector("text 3"))
+
+
+def _put_from_process(path, worker):
+    store = EmbeddingStore(path, dim=DIM)
+    for i in range(300):
+        put(store, [f"{worker}-{i}", f"shared-{i}"])
+
+
+def test_concurrent_processes_do_not_lose_or_mix_rows(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_put_from_process, args=(str(tmp_path), w)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    store = EmbeddingStore(str(tmp_path), dim=DIM)
+    texts = [f"{w}-{i}" for w in range(4) for i in range(300)] + [f"shared-{i}" for i in range(300)]
+    assert len(store) == len(texts)
+    for text, found in zip(texts, store.get_many([content_key(t) for t in texts])):
+        assert np.array_equal(found, vector(text))
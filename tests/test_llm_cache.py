@@ -0,0 +1,74 @@
+import time
+import pytest
+
+pytest.importorskip("langchain")
+from langchain.schema import AIMessage
+from langchain_core.messages import AIMessageChunk
+from llm_cache import CachedLLM, normalize_prompt
+
+
+class CountingLLM:
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+    def stream(self, prompt, **kwargs):
+        self.calls += 1
+        yield AIMessageChunk(content="part ")
+        yield AIMessageChunk(content=f"{self.calls}")
+
+
+@pytest.fixture
+def llm():
+    return CountingLLM()
+
+
+def test_reformatted_prompts_share_an_entry(llm, tmp_path):
+    cached = CachedLLM(llm, db_path=str(tmp_path / "cache.db"))
+    assert normalize_prompt("Hello \n  world") == normalize_prompt("Hello world")
+    assert cached.invoke("Hello \n  world").content == "answer 1"
+    assert cached.invoke("Hello world").content == "answer 1"
+    assert cached.invoke("Hello world", use_cache=False).content == "answer 2"
+    assert llm.calls == 2
+
+
+def test_entries_expire_after_the_ttl(llm, tmp_path):
+    cached = CachedLLM(llm, db_path=str(tmp_path / "cache.db"), ttl=0.05)
+    cached.invoke("prompt")
+    time.sleep(0.1)
+    assert cached.invoke("prompt").content == "answer 2"
+
+
+def test_least_recently_used_entry_is_evicted(llm, tmp_path):
+    cached = CachedLLM(llm, db_path=str(tmp_path / "cache.db"), max_entries=2)
+    cached.invoke("a")
+    time.sleep(0.01)
+    cached.invoke("b")
+    time.sleep(0.01)
+    cached.invoke("a")  # hit: "a" is now more recent than "b"
+    time.sleep(0.01)
+    cached.invoke("c")  # evicts "b"
+    calls = llm.calls
+    assert cached.invoke("a").content == "answer 1"
+    assert cached.invoke("b").content == f"answer {calls + 1}"
+
+
+def test_stream_is_cached_only_when_complete(llm, tmp_path):
+    cached = CachedLLM(llm, db_path=str(tmp_path / "cache.db"))
+    stream = cached.stream("prompt")
+    next(stream)
+    stream.close()  # interrupted: nothing stored
+    assert "".join(chunk.content for chunk in cached.stream("prompt")) == "part 2"
+    assert [chunk.content for chunk in cached.stream("prompt")] == ["part 2"]
+    assert llm.calls == 2
+
+
+def test_cache_persists_across_clients(llm, tmp_path):
+    path = str(tmp_path / "cache.db")
+    CachedLLM(llm, db_path=path).invoke("prompt")
+    assert CachedLLM(CountingLLM(), db_path=path).invoke("prompt").content == "answer 1"
@@ -0,0 +1,79 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import pytest
+
+from model_server import ModelClient, ModelServer, ModelServerError, RemoteEmbeddings, StubEmbedder
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+
+
+@pytest.fixture(scope="module")
+def socket_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("model_server") / "server.sock")
+    server = ModelServer(path, max_wait_ms=1, stub=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, "model server did not start"
+        time.sleep(0.01)
+    return path
+
+
+def test_stub_vectors_do_not_depend_on_the_process_hash_seed():
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); from model_server import StubEmbedder; "
+            "print(StubEmbedder(dim=4).embed_documents(['Swift VDI'])[0].tolist())")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = {
+        subprocess.run([sys.executable, "-c", code, root], capture_output=True, text=True, check=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+    assert outputs.pop().strip() == str(StubEmbedder(dim=4, latency=0, per_text=0).embed_documents(["Swift VDI"])[0].tolist())
+
+
+def test_threads_share_a_bounded_set_of_connections(socket_path):
+    client = ModelClient(socket_path, max_idle=2)
+    results = {}
+
+    def work(i):
+        results[i] = client.classify("sentiment", [f"text {i}"])
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 12
+    assert client._idle.qsize() <= 2
+    # Threads that have exited leave nothing behind beyond the idle pool
+    client.close()
+    assert client._idle.qsize() == 0
+    assert client.ping()["pid"] == os.getpid()
+
+
+def test_remote_embeddings_match_the_stub(socket_path):
+    embeddings = RemoteEmbeddings(ModelClient(socket_path))
+    vectors = embeddings.embed_documents(["a", "b"])
+    expected = StubEmbedder().embed_documents(["a", "b"])
+    assert np.allclose(vectors, expected)
+    assert np.allclose(embeddings.embed_query("a"), expected[0])
+
+
+def test_dropped_pooled_connection_is_retried_on_a_new_one(socket_path):
+    client = ModelClient(socket_path)
+    client.ping()
+    stale = client._idle.get_nowait()
+    stale.shutdown(socket.SHUT_RDWR)
+    client._idle.put_nowait(stale)
+    assert client.ping()["pid"] == os.getpid()
+
+
+def test_unreachable_server_raises_model_server_error(tmp_path):
+    with pytest.raises(ModelServerError):
+        ModelClient(str(tmp_path / "missing.sock")).ping()
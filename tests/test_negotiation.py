@@ -0,0 +1,70 @@
+import json
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("langchain")
+import negotiation
+from negotiation import NegotiationTurn, _TipsDecoder, parse_turn
+
+
+def fake_stream(fragments, error=None):
+    def stream_llm(llm, prompt, call_site, **kwargs):
+        yield from fragments
+        if error:
+            raise error
+    return stream_llm
+
+
+@pytest.fixture
+def reply(monkeypatch):
+    monkeypatch.setattr(negotiation, "get_llm", lambda: None)
+
+    def set_reply(fragments, error=None):
+        monkeypatch.setattr(negotiation, "stream_llm", fake_stream(fragments, error))
+    return set_reply
+
+
+def chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_json_reply_streams_the_tips_and_parses_the_rest(reply):
+    body = {"tips": "Offer **5%** \\u2014 then \"hold\".", "cars": [{"name": "Swift", "price": 450000}], "notes": "Keen."}
+    reply(chunks("```json\n" + json.dumps(body) + "\n```"))
+    turn = NegotiationTurn("prompt")
+    shown = "".join(turn.stream())
+    assert shown == body["tips"]
+    assert turn.error is None
+    assert turn.result == {"tips": body["tips"], "cars": [{"name": "Swift", "price": "450000"}], "notes": "Keen."}
+
+
+def test_prose_reply_is_streamed_as_the_tips_in_the_same_call(reply):
+    text = "1. Key Highlights: the Swift is a good fit.\n2. Tips: stay firm on price."
+    reply(chunks(text))
+    turn = NegotiationTurn("prompt")
+    assert "".join(turn.stream()) == text
+    assert turn.tips == text
+    assert turn.result is None
+    assert isinstance(turn.error, ValueError)
+
+
+def test_tips_cut_off_by_an_error_are_discarded(reply):
+    reply(chunks('{"tips": "Offer a 5% discount and'), error=RuntimeError("connection reset"))
+    turn = NegotiationTurn("prompt")
+    assert "".join(turn.stream()) == "Offer a 5% discount and"
+    assert turn.tips == ""
+    assert isinstance(turn.error, RuntimeError)
+
+
+def test_parse_turn_tolerates_surrounding_text_and_trailing_commas():
+    text = 'Here you go: {"tips": "t", "cars": [{"name": "A", "price": "1"},], "notes": "n",} Thanks!'
+    assert parse_turn(text) == {"tips": "t", "cars": [{"name": "A", "price": "1"}], "notes": "n"}
+    with pytest.raises(ValueError):
+        parse_turn('{"tips": "", "cars": [], "notes": ""}')
+
+
+def test_tips_decoder_waits_for_complete_escapes():
+    decoder = _TipsDecoder()
+    out = [decoder.feed(part) for part in ['{"tips": "a\\', 'n\\ud83d', '\\ude97 b", "cars"']]
+    assert "".join(out) == "a\n\U0001F697 b"
+    assert decoder.done
@@ -0,0 +1,77 @@
+import time
+import threading
+import pytest
+from pipeline import Stage, StageError, run_pipeline
+
+
+def test_dependents_receive_results_and_independent_stages_overlap():
+    started = {}
+
+    def slow(name):
+        started[name] = time.perf_counter()
+        time.sleep(0.1)
+        return name
+
+    stages = [
+        Stage("a", lambda: slow("a")),
+        Stage("b", lambda: slow("b")),
+        Stage("joined", lambda a, b: a + b, deps=("a", "b")),
+    ]
+    results, timings = run_pipeline(stages)
+    assert results == {"a": "a", "b": "b", "joined": "ab"}
+    assert abs(started["a"] - started["b"]) < 0.05
+    assert timings["joined"]["start"] >= max(timings["a"]["end"], timings["b"]["end"])
+
+
+def test_failed_stage_raises_stage_error_and_skips_dependents():
+    ran = []
+
+    def boom():
+        raise RuntimeError("model down")
+
+    stages = [
+        Stage("ok", lambda: ran.append("ok") or 1),
+        Stage("broken", boom),
+        Stage("after", lambda broken: ran.append("after"), deps=("broken",)),
+    ]
+    with pytest.raises(StageError) as excinfo:
+        run_pipeline(stages)
+    assert excinfo.value.stage == "broken"
+    assert isinstance(excinfo.value.__cause__, RuntimeError)
+    assert excinfo.value.results == {"ok": 1}
+    assert "after" not in ran
+
+
+def test_callback_runs_in_calling_thread_and_can_replace_result():
+    threads = []
+
+    def on_stage_done(name, result):
+        threads.append(threading.current_thread())
+        if name == "stream":
+            return "".join(result)
+
+    stages = [
+        Stage("stream", lambda: iter(["to", "kens"])),
+        Stage("length", lambda stream: len(stream), deps=("stream",)),
+    ]
+    results, _ = run_pipeline(stages, on_stage_done=on_stage_done)
+    assert results == {"stream": "tokens", "length": 6}
+    assert set(threads) == {threading.current_thread()}
+
+
+def test_callback_error_is_reported_for_its_stage():
+    def on_stage_done(name, result):
+        raise ValueError("render failed")
+
+    with pytest.raises(StageError) as excinfo:
+        run_pipeline([Stage("only", lambda: 1)], on_stage_done=on_stage_done)
+    assert excinfo.value.stage == "only"
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda: 1), Stage("a", lambda: 2)])
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda missing: 1, deps=("missing",))])
+    with pytest.raises(ValueError):
+        run_pipeline([Stage("a", lambda b: 1, deps=("b",)), Stage("b", lambda a: 1, deps=("a",))])
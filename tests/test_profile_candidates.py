@@ -0,0 +1,47 @@
+import types
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+from profile_candidates import fuse_ranked, profile_query, profile_search, search_profile_candidates
+
+
+class Docstore:
+    def search(self, doc_id):
+        return doc_id
+
+
+def make_store(vectors, embed):
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return types.SimpleNamespace(
+        index=index, embedding_function=embed, docstore=Docstore(),
+        index_to_docstore_id={i: f"doc{i}" for i in range(len(vectors))},
+    )
+
+
+def test_unseen_profile_embeds_only_the_profile_query():
+    vectors = np.eye(4, dtype=np.float32)
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return [1.0, 0.0, 0.0, 0.0]
+
+    store = make_store(vectors, embed)
+    candidates = search_profile_candidates(store, "joy", "POSITIVE", "Purchase", k=2)
+    assert candidates[0] == 0
+    results = profile_search(store, candidates, 2, question_vector=[0.0, 0.0, 1.0, 0.0])
+    assert embedded == [profile_query("joy", "Purchase", "POSITIVE")]
+    assert set(results) == {"doc0", "doc2"}
+
+
+def test_profile_candidates_respect_hard_filters():
+    store = make_store(np.eye(4, dtype=np.float32), lambda text: [1.0, 0.0, 0.0, 0.0])
+    candidates = search_profile_candidates(store, "joy", "POSITIVE", "Purchase", k=4, positions=[1, 3])
+    assert sorted(candidates) == [1, 3]
+
+
+def test_fuse_ranked_prefers_positions_ranked_high_in_both_lists():
+    assert set(fuse_ranked([[1, 2, 3], [2, 1, 4]], 2)) == {1, 2}
+    assert fuse_ranked([[5, 6], [6, 7]], 1) == [6]
@@ -0,0 +1,44 @@
+from prompt_builder import PromptBuilder, compact_notes, count_tokens, get_prompt_stats, truncate_tokens
+
+
+def test_truncate_keeps_the_beginning_within_budget():
+    text = "The Swift, a petrol hatchback, costs 5.5 lakhs."
+    assert truncate_tokens(text, 100) == text
+    short = truncate_tokens(text, 4)
+    assert short == "The Swift, a …"
+    assert count_tokens(short) <= 5  # the marker is one more token
+    assert truncate_tokens(text, 0) == ""
+    assert truncate_tokens(None, 5) == ""
+
+
+def test_section_uses_the_default_and_counts_trimmed_tokens():
+    builder = PromptBuilder("test_section")
+    assert builder.section(None, 10, "No notes available") == "No notes available"
+    kept = builder.section("one two three four five six", 2)
+    assert kept == "one two …"
+    assert builder.trimmed == 4
+
+
+def test_lines_respect_the_per_line_and_total_budgets():
+    builder = PromptBuilder("test_lines")
+    lines = [" ".join(f"w{i}" for i in range(50)) for _ in range(10)]
+    joined = builder.lines(lines, line_budget=10, budget=40)
+    rows = joined.split("\n")
+    assert [row.split(".")[0] for row in rows] == ["1", "2", "3"]
+    assert all(count_tokens(row) <= 13 for row in rows)
+    assert count_tokens(joined) <= 40
+    # The first line is always kept, even when it alone exceeds the total budget
+    assert builder.lines(lines[:1], line_budget=100, budget=5).startswith("1. w0")
+
+
+def test_finish_records_prompt_sizes_per_call_site():
+    builder = PromptBuilder("test_finish")
+    builder.section("a b c d", 2)
+    builder.finish("one two three")
+    [row] = [row for row in get_prompt_stats() if row["Call site"] == "test_finish"]
+    assert row["Prompts"] == 1 and row["Max tokens"] == 3 and row["Avg trimmed"] == 2
+
+
+def test_compact_notes_strips_and_bounds_the_summary():
+    assert compact_notes("  short note  ") == "short note"
+    assert count_tokens(compact_notes("word " * 1000, budget=20)) <= 21
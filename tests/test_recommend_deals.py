@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("audio_recorder_streamlit")
+import main
+import resources
+from semantic_cache import SemanticCache
+
+
+class EchoLLM:
+    """Answers with the prompt itself, so the test sees everything the model was given."""
+
+    def invoke(self, prompt):
+        return SimpleNamespace(content=prompt)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    searches = []
+    store = SimpleNamespace(docstore=SimpleNamespace(_dict={"car": None}), index_version="v1")
+    loaded = {
+        "attribute_index": None,
+        "profile_candidates": None,
+        "recommendation_cache": SemanticCache(threshold=0.9, max_entries=8),
+        "embeddings": SimpleNamespace(embed_query=lambda text: [1.0, 0.0]),
+    }
+
+    def profile_search(vector_store, candidates, k, question_vector, positions):
+        searches.append(question_vector)
+        return [SimpleNamespace(page_content="Name: Hyundai Creta | Price: 12 lakhs")]
+
+    monkeypatch.setattr(resources, "get", loaded.__getitem__)
+    monkeypatch.setattr(main, "current_vector_store", lambda: store)
+    monkeypatch.setattr(main, "search_profile_candidates", lambda *args, **kwargs: [])
+    monkeypatch.setattr(main, "profile_search", profile_search)
+    monkeypatch.setattr(main, "get_llm", EchoLLM)
+    return searches
+
+
+def customer(name, notes, status):
+    return {"Name": name, "Notes": notes, "LastDealStatus": status,
+            "Tone": "Joy", "Sentiment": "Positive", "Intention": "Purchase"}
+
+
+def test_customers_sharing_a_partition_do_not_see_each_others_details(app):
+    first = main.recommend_deals(customer("Asha", "Asked about a loan for her son.", "Active"), "a diesel SUV")
+    second = main.recommend_deals(customer("Ravi", "Prefers automatic gearboxes.", "New"), "a diesel SUV")
+
+    assert len(app) == 1  # the second customer's search came from the cache
+    assert "Hyundai Creta" in first and "Hyundai Creta" in second
+    assert "Asha" in first and "Asked about a loan" in first
+    assert "Ravi" in second and "Prefers automatic" in second and "Last Deal Status: New" in second
+    assert "Asha" not in second and "loan" not in second
+    assert "Ravi" not in first and "automatic" not in first
@@ -0,0 +1,51 @@
+import numpy as np
+from semantic_cache import SemanticCache, index_version
+
+
+def test_lookup_matches_similar_queries_within_a_partition():
+    cache = SemanticCache(threshold=0.9, max_entries=4)
+    cache.store("joy", [1.0, 0.0], "sedans")
+    assert cache.lookup("joy", [0.99, 0.05])[0] == "sedans"
+    assert cache.lookup("joy", [0.0, 1.0]) is None
+    assert cache.lookup("anger", [1.0, 0.0]) is None
+    cache.store("joy", None, "no question")
+    assert cache.lookup("joy", None)[0] == "no question"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.9, max_entries=2)
+    cache.store("a", [1.0, 0.0], "a")
+    cache.store("b", [1.0, 0.0], "b")
+    cache.lookup("a", [1.0, 0.0])
+    cache.store("c", [1.0, 0.0], "c")
+    assert cache.lookup("b", [1.0, 0.0]) is None
+    assert cache.lookup("a", [1.0, 0.0])[0] == "a"
+
+
+def test_partition_codes_stay_bounded_and_live_entries_keep_matching():
+    cache = SemanticCache(threshold=0.9, max_entries=3)
+    for i in range(100):
+        cache.store(("profile", i), [1.0, float(i % 2)], i)
+    assert len(cache._partition_codes) <= 2 * cache.max_entries
+    for i in range(97, 100):
+        assert cache.lookup(("profile", i), [1.0, float(i % 2)])[0] == i
+    assert cache.lookup(("profile", 0), [1.0, 0.0]) is None
+
+
+def test_new_index_version_clears_the_cache(tmp_path):
+    assert index_version(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text("{}")
+    first = index_version(str(tmp_path))
+
+    cache = SemanticCache()
+    cache.check_version(first)
+    cache.store("joy", [1.0, 0.0], "old")
+    cache.check_version(first)
+    assert len(cache) == 1
+
+    (tmp_path / "manifest.json").write_text('{"1#1": "abc"}')
+    second = index_version(str(tmp_path))
+    assert second != first
+    cache.check_version(second)
+    assert len(cache) == 0
+    assert cache.lookup("joy", np.array([1.0, 0.0])) is None
@@ -0,0 +1,36 @@
+import time
+from sheets_writer import FakeSheet, SheetsWriter
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_started_writer_drains_rows_spooled_by_an_earlier_run(tmp_path):
+    spool = str(tmp_path / "spool.db")
+    earlier = SheetsWriter(lambda: None, spool_path=spool, batch_size=100)
+    for i in range(3):
+        earlier.enqueue([f"row {i}"])
+
+    sheet = FakeSheet()
+    writer = SheetsWriter(lambda: sheet, spool_path=spool, flush_interval=0.05).start()
+    try:
+        wait_for(lambda: len(sheet.rows) == 3)
+        assert sheet.rows == [["row 0"], ["row 1"], ["row 2"]]
+        assert writer.pending() == 0
+    finally:
+        writer.stop(flush=False)
+
+
+def test_failed_flush_keeps_rows_for_the_retry(tmp_path):
+    sheet = FakeSheet(fail_every=1)
+    writer = SheetsWriter(lambda: sheet, spool_path=str(tmp_path / "spool.db"), batch_size=100)
+    writer.enqueue(["kept"])
+    assert writer.flush() == 0
+    assert writer.pending() == 1
+    sheet.fail_every = 0
+    assert writer.flush() == 1
+    assert sheet.rows == [["kept"]] and writer.pending() == 0
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from state import InteractionHistory, TONE_CODES
+
+
+def test_history_keeps_the_last_rows_in_order_after_wrapping():
+    history = InteractionHistory(capacity=3)
+    for i in range(5):
+        history.record(f"utterance {i}", sentiment="POSITIVE" if i % 2 else "NEGATIVE")
+    view = history.view()
+    assert len(history) == 3
+    assert list(view.index) == [3, 4, 5]
+    assert list(view["Sentiment"]) == [-1, 1, -1]
+    assert list(view["Tone"]) == [-1, -1, -1]
+
+
+def test_sentiment_and_tone_of_one_utterance_share_a_row():
+    history = InteractionHistory(capacity=4)
+    history.record("I want a discount", tone="Anger")
+    history.record("something else", sentiment="POSITIVE")
+    history.record("I want a discount", sentiment="NEGATIVE")
+    view = history.view()
+    assert len(view) == 2
+    assert view.iloc[0].tolist() == [-1, TONE_CODES["anger"]]
+    assert view.iloc[1].tolist() == [1, -1]
+
+
+def test_repeated_utterance_starts_a_new_row_once_its_labels_are_set():
+    history = InteractionHistory(capacity=4)
+    history.record("same", sentiment="POSITIVE", tone="joy")
+    history.record("same", sentiment="NEGATIVE")
+    assert len(history) == 2
+
+
+def test_unknown_labels_are_stored_as_unknown():
+    history = InteractionHistory(capacity=2)
+    history.record("text", sentiment="MIXED", tone="bored")
+    assert history.view().iloc[0].tolist() == [0, -1]
@@ -0,0 +1,46 @@
+import pytest
+import tracing
+
+
+class RerunException(Exception):
+    """Stands in for streamlit's st.rerun() signal, matched by name."""
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+
+
+def finished(trace_id):
+    return {row["Span"].strip(): row for row in tracing.get_trace(trace_id)}
+
+
+def test_child_spans_join_the_parent_trace(enabled):
+    with tracing.span("page.test", kind="request") as root:
+        with tracing.span("vector.search", kind="vector") as child:
+            child.set(results=3)
+    assert child.trace_id == root.trace_id
+    rows = finished(root.trace_id)
+    assert rows["page.test"]["Span"] == "page.test"
+    assert rows["vector.search"]["Span"] == "  vector.search"
+
+
+def test_errors_are_recorded_but_rerun_is_not(enabled):
+    with pytest.raises(ValueError):
+        with tracing.span("page.fails", kind="request") as failed:
+            raise ValueError("boom")
+    with pytest.raises(RerunException):
+        with tracing.span("page.reruns", kind="request") as rerun:
+            raise RerunException()
+    assert finished(failed.trace_id)["page.fails"]["Error"] == "ValueError: boom"
+    assert finished(rerun.trace_id)["page.reruns"]["Error"] is None
+    metrics = tracing.render_metrics()
+    assert 'sales_span_errors_total{name="page.fails",kind="request"} 1' in metrics
+    assert 'name="page.reruns"' not in metrics.split("sales_span_errors_total")[-1]
+
+
+def test_disabled_tracing_yields_a_noop_span(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    with tracing.span("anything") as span:
+        span.set(ignored=True)
+    assert span.trace_id is None
@@ -0,0 +1,123 @@
+import io
+import wave
+import numpy as np
+import pytest
+import transcription
+from transcription import (
+    NoSpeechError, SAMPLE_RATE, StubBackend, TranscriptionBackend, decode_wav, resample,
+    split_on_silence, transcribe_bytes,
+)
+
+
+def tone(seconds, amplitude=0.5, rate=SAMPLE_RATE, frequency=440):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def silence(seconds, rate=SAMPLE_RATE):
+    return np.zeros(int(seconds * rate), dtype=np.float32)
+
+
+def wav_bytes(samples, rate=SAMPLE_RATE, channels=1, width=2):
+    """Encode float samples (frames x channels for stereo) as WAV."""
+    samples = np.asarray(samples, dtype=np.float64)
+    if width == 1:
+        frames = (np.clip(samples, -1, 1) * 127 + 128).astype(np.uint8).tobytes()
+    else:
+        ints = (np.clip(samples, -1, 1) * (2 ** (8 * width - 1) - 1)).astype(np.int64).ravel()
+        frames = b"".join(int(value).to_bytes(width, "little", signed=True) for value in ints)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(width)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("width", [1, 2, 3, 4])
+def test_decode_wav_scales_every_sample_width(width):
+    samples = np.array([0.0, 0.5, -0.5, 0.25])
+    decoded, rate = decode_wav(wav_bytes(samples, rate=8000, width=width))
+    assert rate == 8000
+    assert decoded.dtype == np.float32
+    assert np.allclose(decoded, samples, atol=1 / 100)
+
+
+def test_decode_wav_downmixes_stereo():
+    stereo = np.array([[0.5, -0.5], [0.5, 0.25], [1.0, 0.0]])
+    decoded, _ = decode_wav(wav_bytes(stereo, channels=2))
+    assert np.allclose(decoded, [0.0, 0.375, 0.5], atol=1e-3)
+
+
+def test_decode_wav_rejects_unknown_widths():
+    data = bytearray(wav_bytes(np.zeros(4)))
+    data[34:36] = (40).to_bytes(2, "little")  # 5-byte samples
+    data[32:34] = (5).to_bytes(2, "little")
+    with pytest.raises((ValueError, wave.Error)):
+        decode_wav(bytes(data))
+
+
+@pytest.mark.parametrize("rate", [8000, 16000, 44100, 48000])
+def test_resample_output_length(rate):
+    samples = tone(1.5, rate=rate)
+    out = resample(samples, rate)
+    assert out.dtype == np.float32
+    assert len(out) == int(round(len(samples) * SAMPLE_RATE / rate))
+    assert abs(np.abs(out).max() - 0.5) < 0.05
+
+
+def test_split_on_silence_finds_segments_in_order():
+    clip = np.concatenate([silence(0.5), tone(1.0), silence(1.0), tone(0.6), silence(0.1), tone(0.6), silence(0.5)])
+    segments = split_on_silence(clip)
+    # The 0.1 s pause is shorter than MIN_SILENCE_MS, so the last two tones are one segment
+    assert len(segments) == 2
+    assert segments == sorted(segments)
+    (first_start, first_end), (second_start, second_end) = segments
+    assert first_start < 0.5 * SAMPLE_RATE < first_end <= 1.5 * SAMPLE_RATE + transcription.PAD_MS * SAMPLE_RATE // 1000
+    assert first_end < second_start < 2.5 * SAMPLE_RATE < 3.3 * SAMPLE_RATE < second_end
+
+
+def test_split_on_silence_drops_clicks_and_cuts_long_segments():
+    clip = np.concatenate([tone(0.1), silence(1.0), tone(4.0)])
+    segments = split_on_silence(clip, max_segment_s=1.5)
+    assert segments[0][0] > 0.5 * SAMPLE_RATE  # the 0.1 s click is dropped
+    assert len(segments) == 3
+    assert all(end - start <= 1.5 * SAMPLE_RATE for start, end in segments)
+    assert all(a_end == b_start for (_, a_end), (b_start, _) in zip(segments, segments[1:]))
+    assert segments[-1][1] == len(clip)
+
+
+@pytest.mark.parametrize("clip", [silence(2.0), tone(2.0, amplitude=1e-4)])
+def test_silent_clips_have_no_segments(clip):
+    assert split_on_silence(clip) == []
+
+
+class SilentBackend(TranscriptionBackend):
+    def transcribe(self, samples, rate=SAMPLE_RATE):
+        return ""
+
+
+class LoudnessBackend(TranscriptionBackend):
+    """Names each segment after its peak amplitude, so the test can check the order."""
+
+    def transcribe(self, samples, rate=SAMPLE_RATE):
+        return {2: "two", 5: "five", 9: "nine"}[int(round(np.abs(samples).max() * 10))]
+
+
+def test_transcribe_bytes_joins_segments_in_order():
+    clip = np.concatenate([tone(0.8, 0.9), silence(1.0), tone(0.8, 0.2), silence(1.0), tone(0.8, 0.5)])
+    assert transcribe_bytes(wav_bytes(clip), backend=LoudnessBackend(), max_workers=3) == "nine two five"
+
+
+def test_transcribe_bytes_with_stub_backend_at_another_rate():
+    clip = np.concatenate([tone(1.0, rate=44100), silence(1.0, rate=44100), tone(1.0, rate=44100)])
+    text = transcribe_bytes(wav_bytes(clip, rate=44100), backend=StubBackend(latency=0, real_time_factor=0))
+    assert text.count("[segment") == 2
+
+
+def test_transcribe_bytes_raises_no_speech_error():
+    with pytest.raises(NoSpeechError, match="silent"):
+        transcribe_bytes(wav_bytes(silence(1.0)), backend=LoudnessBackend())
+    with pytest.raises(NoSpeechError, match="No speech"):
+        transcribe_bytes(wav_bytes(tone(1.0)), backend=SilentBackend())
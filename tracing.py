@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tracing settings, configurable through config.env
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")  # e.g. traces.jsonl to log every span; off by default
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+TRACE_METRICS_PORT = int(os.getenv("TRACE_METRICS_PORT", "0"))  # e.g. 9464 to serve /metrics; off by default
+
+# Recent traces kept in memory for the debug waterfall
+TRACES_KEPT = 50
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_traces = OrderedDict()  # trace_id -> finished span records, oldest trace first
+_histograms = {}  # (name, kind) -> [bucket counts..., sum, count]
+_errors = {}  # (name, kind) -> count
+_tokens = {}  # (name, direction) -> count
+_log = None
+_server = None
+
+
+class Span:
+    """
+    One timed operation. Spans opened while another span is current become its children and
+    share its trace id; a span opened with no current span starts a new trace.
+    """
+
+    def __init__(self, name, kind, parent=None, attrs=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = dict(attrs or {})
+        self.error = None
+        self.start = time.time()
+        self.duration = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs):
+        """Attach attributes, e.g. span.set(prompt_tokens=812, cache="hit")."""
+        self.attrs.update(attrs)
+
+    def end(self, error=None):
+        self.duration = time.perf_counter() - self._t0
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+            **self.attrs,
+        }
+
+
+class _NoopSpan:
+    trace_id = span_id = duration = None
+
+    def set(self, **attrs):
+        pass
+
+    def end(self, error=None):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+# Raised by st.rerun() and st.stop() to end the page script early; they are not failures.
+# Matched by name so this module does not import Streamlit.
+CONTROL_FLOW_EXCEPTIONS = ("RerunException", "StopException")
+
+
+def _end(span, error):
+    # End a span that exited through `error`, unless the exception is only control flow
+    if isinstance(error, GeneratorExit) or type(error).__name__ in CONTROL_FLOW_EXCEPTIONS:
+        span.set(stopped_by=type(error).__name__)
+        span.end()
+    else:
+        span.end(error)
+
+
+def current_span():
+    """The innermost open span of this thread / task, or None."""
+    return _current.get()
+
+
+@contextmanager
+def span(name, kind="internal", **attrs):
+    """
+    Time the enclosed block as a span.
+
+    Usage:
+        with tracing.span("vector.search", kind="vector", k=10) as s:
+            results = store.similarity_search(query, k=10)
+            s.set(results=len(results))
+
+    Exceptions are recorded on the span and re-raised; Streamlit's rerun/stop signals are not
+    counted as errors.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+    current = Span(name, kind, _current.get(), attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        _end(current, e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current.reset(token)
+
+
+def start_span(name, kind="internal", **attrs):
+    """
+    Open a span without making it current, for work that is suspended and resumed, such as a
+    generator (its body runs in whichever context iterates it). The caller must call `end()`.
+    """
+    if not TRACING_ENABLED:
+        return _NOOP
+    return Span(name, kind, _current.get(), attrs)
+
+
+def _traced_generator(func, name, kind):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        current = start_span(name, kind)
+        try:
+            yield from func(*args, **kwargs)
+        except GeneratorExit:
+            current.set(closed_early=True)
+            current.end()
+            raise
+        except BaseException as e:
+            _end(current, e)
+            raise
+        else:
+            current.end()
+    return wrapper
+
+
+def traced(name=None, kind="internal"):
+    """
+    Decorator form of `span`; the span is named "<kind>.<function name>" unless `name` is given.
+    Generator functions are timed until the generator is exhausted.
+    """
+    def decorate(func):
+        span_name = name or f"{kind}.{func.__name__}"
+        if inspect.isgeneratorfunction(func):
+            return _traced_generator(func, span_name, kind)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _get_log():
+    # One JSON object per line; the handler rotates the file at TRACE_LOG_MAX_BYTES
+    global _log
+    if _log is None and TRACE_LOG_PATH:
+        with _lock:
+            if _log is None:
+                log = logging.getLogger("tracing.spans")
+                log.propagate = False
+                log.setLevel(logging.INFO)
+                handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                log.addHandler(handler)
+                _log = log
+    return _log
+
+
+def _export(span):
+    record = span.to_dict()
+    key = (span.name, span.kind)
+    with _lock:
+        _traces.setdefault(span.trace_id, []).append(record)
+        _traces.move_to_end(span.trace_id)
+        while len(_traces) > TRACES_KEPT:
+            _traces.popitem(last=False)
+
+        histogram = _histograms.setdefault(key, [0] * (len(DURATION_BUCKETS) + 2))
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if span.duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += span.duration
+        histogram[-1] += 1
+        if span.error:
+            _errors[key] = _errors.get(key, 0) + 1
+        for direction in ("prompt", "response"):
+            tokens = span.attrs.get(f"{direction}_tokens")
+            if tokens:
+                _tokens[(span.name, direction)] = _tokens.get((span.name, direction), 0) + tokens
+
+    try:
+        log = _get_log()
+        if log:
+            log.info(json.dumps(record, default=str))
+    except OSError as e:
+        print(f"Could not write span log: {e}")
+
+
+def get_trace(trace_id):
+    """
+    The finished spans of a trace as waterfall rows, in start order.
+
+    Returns:
+        list[dict]: Span name (indented by depth), kind, offset from the trace start and
+        duration in milliseconds, token counts and error.
+    """
+    with _lock:
+        records = list(_traces.get(trace_id, []))
+    if not records:
+        return []
+    t0 = min(r["start"] for r in records)
+    parents = {r["span_id"]: r["parent_id"] for r in records}
+
+    def depth(record):
+        level, parent = 0, record["parent_id"]
+        while parent in parents:
+            level, parent = level + 1, parents[parent]
+        return level
+
+    return [
+        {
+            "Span": "  " * depth(r) + r["name"],
+            "Kind": r["kind"],
+            "Start (ms)": round((r["start"] - t0) * 1000, 1),
+            "Duration (ms)": round(r["duration"] * 1000, 1),
+            "Prompt tokens": r.get("prompt_tokens"),
+            "Response tokens": r.get("response_tokens"),
+            "Error": r["error"],
+        }
+        for r in sorted(records, key=lambda r: r["start"])
+    ]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    """Span latency histograms, error counts and LLM token totals in the Prometheus text format."""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        errors = dict(_errors)
+        tokens = dict(_tokens)
+
+    lines = [
+        "# HELP sales_span_duration_seconds Duration of traced operations.",
+        "# TYPE sales_span_duration_seconds histogram",
+    ]
+    for (name, kind), values in sorted(histograms.items()):
+        labels = f'name="{_label(name)}",kind="{_label(kind)}"'
+        for bound, count in zip(DURATION_BUCKETS, values):
+            lines.append(f'sales_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'sales_span_duration_seconds_bucket{{{labels},le="+Inf"}} {values[-1]}')
+        lines.append(f"sales_span_duration_seconds_sum{{{labels}}} {values[-2]:.6f}")
+        lines.append(f"sales_span_duration_seconds_count{{{labels}}} {values[-1]}")
+
+    lines += ["# HELP sales_span_errors_total Traced operations that raised.", "# TYPE sales_span_errors_total counter"]
+    for (name, kind), count in sorted(errors.items()):
+        lines.append(f'sales_span_errors_total{{name="{_label(name)}",kind="{_label(kind)}"}} {count}')
+
+    lines += ["# HELP sales_llm_tokens_total Approximate LLM tokens per call site.", "# TYPE sales_llm_tokens_total counter"]
+    for (name, direction), count in sorted(tokens.items()):
+        lines.append(f'sales_llm_tokens_total{{name="{_label(name)}",direction="{direction}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the console
+
+
+def start_metrics_server(port=TRACE_METRICS_PORT, host="127.0.0.1"):
+    """
+    Serve /metrics on a background thread. Returns None when disabled (port 0) or when the
+    port is taken, e.g. by another Streamlit process that already serves it.
+    """
+    global _server
+    if _server is not None or not port:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Trace metrics endpoint not started on port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="trace-metrics", daemon=True).start()
+    print(f"Trace metrics at http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,222 @@
+import io
+import os
+import time
+import wave
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Transcription settings, configurable through config.env
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "google")  # google, sphinx, whisper or stub
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE", "en-US")
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+
+SAMPLE_RATE = 16000  # what speech recognizers expect
+
+# Silence splitting
+FRAME_MS = 30
+SILENCE_DB = -35.0  # frames this far below the loudest frame count as silence
+SILENCE_FLOOR_DB = -60.0  # frames below this absolute level (dBFS) are always silence
+MIN_SILENCE_MS = 400  # pauses shorter than this do not split a segment
+MIN_SEGMENT_MS = 250  # shorter voiced runs are dropped as clicks / noise
+MAX_SEGMENT_S = 15.0  # longer segments are cut, so no single request dominates
+PAD_MS = 150  # silence kept around each segment so word edges are not clipped
+
+
+class TranscriptionError(Exception):
+    """The recognizer could not be reached or rejected the request."""
+
+
+class NoSpeechError(TranscriptionError):
+    """No segment of the clip contained recognizable speech."""
+
+
+def decode_wav(data):
+    """
+    Decode WAV bytes into mono float32 samples in [-1, 1].
+
+    Returns:
+        tuple: (samples, sample_rate)
+    """
+    with wave.open(io.BytesIO(data)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = np.where(ints >= 1 << 23, ints - (1 << 24), ints).astype(np.float32) / np.float32(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / np.float32(2 ** 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes.")
+
+    # Downmix to mono
+    if channels > 1:
+        samples = samples[: len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def resample(samples, rate, target_rate=SAMPLE_RATE):
+    """Resample by linear interpolation, averaging first when downsampling to limit aliasing."""
+    if rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    if rate > target_rate:
+        width = int(round(rate / target_rate))
+        if width > 1:
+            samples = np.convolve(samples, np.ones(width, dtype=np.float32) / width, mode="same")
+    n_out = int(round(len(samples) * target_rate / rate))
+    positions = np.arange(n_out, dtype=np.float64) * rate / target_rate
+    left = np.minimum(positions.astype(np.int64), len(samples) - 1)
+    right = np.minimum(left + 1, len(samples) - 1)
+    frac = (positions - left).astype(np.float32)
+    return samples[left] * (1 - frac) + samples[right] * frac
+
+
+def split_on_silence(samples, rate=SAMPLE_RATE, frame_ms=FRAME_MS, silence_db=SILENCE_DB,
+                     floor_db=SILENCE_FLOOR_DB, min_silence_ms=MIN_SILENCE_MS, min_segment_ms=MIN_SEGMENT_MS,
+                     max_segment_s=MAX_SEGMENT_S, pad_ms=PAD_MS):
+    """
+    Find the speech segments of a clip from per-frame RMS energy. A frame is voiced when it is
+    within `silence_db` of the loudest frame and above `floor_db`, so a silent clip has no segments.
+
+    Returns:
+        list[tuple]: (start, end) sample offsets of each segment, in order.
+    """
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    rms = np.sqrt(np.mean(samples[: n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced = level > max(level.max() + silence_db, floor_db)
+
+    # Runs of voiced frames, merged across pauses shorter than min_silence_ms
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    segments = []
+    min_gap = max(1, min_silence_ms // frame_ms)
+    for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        if segments and start - segments[-1][1] < min_gap:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+
+    pad = pad_ms // frame_ms
+    max_frames = max(1, int(max_segment_s * 1000 / frame_ms))
+    result = []
+    for start, end in segments:
+        if (end - start) * frame_ms < min_segment_ms:
+            continue
+        start, end = max(0, start - pad), min(n_frames, end + pad)
+        for chunk_start in range(start, end, max_frames):
+            chunk_end = min(end, chunk_start + max_frames)
+            result.append((chunk_start * frame, len(samples) if chunk_end == n_frames else chunk_end * frame))
+    return result
+
+
+def to_pcm16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class TranscriptionBackend:
+    """
+    Interface for speech recognizers. `transcribe` receives one segment as 16 kHz mono float32
+    samples and returns its text ("" if it contains no recognizable speech).
+    """
+
+    name = "base"
+
+    def transcribe(self, samples, rate=SAMPLE_RATE):
+        raise NotImplementedError
+
+
+class RecognizerBackend(TranscriptionBackend):
+    """
+    SpeechRecognition engines: "google" (web API), "sphinx" (offline, needs pocketsphinx) or
+    "whisper" (offline, needs openai-whisper).
+    """
+
+    def __init__(self, engine="google", language=TRANSCRIPTION_LANGUAGE):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.name = engine
+        self.language = language
+        self._recognize = getattr(sr.Recognizer(), f"recognize_{engine}")
+
+    def transcribe(self, samples, rate=SAMPLE_RATE):
+        audio = self.sr.AudioData(to_pcm16(samples), rate, 2)
+        kwargs = {"language": self.language.split("-")[0]} if self.name == "whisper" else {"language": self.language}
+        try:
+            return self._recognize(audio, **kwargs).strip()
+        except self.sr.UnknownValueError:
+            return ""
+        except self.sr.RequestError as e:
+            raise TranscriptionError(str(e)) from e
+
+
+class StubBackend(TranscriptionBackend):
+    """
+    Offline stand-in for tests and benchmarks: sleeps like a web recognizer
+    (`latency` per request plus `real_time_factor` x segment duration) and returns a placeholder.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.4, real_time_factor=0.1, text="segment"):
+        self.latency = latency
+        self.real_time_factor = real_time_factor
+        self.text = text
+
+    def transcribe(self, samples, rate=SAMPLE_RATE):
+        duration = len(samples) / rate
+        time.sleep(self.latency + self.real_time_factor * duration)
+        return f"[{self.text} {duration:.1f}s]"
+
+
+_backends = {}
+
+
+def get_backend(name=TRANSCRIPTION_BACKEND):
+    """Return the shared backend instance for `name`."""
+    if name not in _backends:
+        _backends[name] = StubBackend() if name == "stub" else RecognizerBackend(name)
+    return _backends[name]
+
+
+def transcribe_bytes(data, backend=None, max_workers=TRANSCRIPTION_WORKERS):
+    """
+    Transcribe a WAV clip held in memory.
+
+    The clip is downmixed and resampled to 16 kHz mono, split on silence, and the segments are
+    sent to the backend concurrently; their texts are joined in order.
+
+    Args:
+        data (bytes): WAV file contents.
+        backend (TranscriptionBackend): Recognizer to use; defaults to TRANSCRIPTION_BACKEND.
+        max_workers (int): Segments transcribed at the same time.
+
+    Returns:
+        str: The transcript.
+
+    Raises:
+        NoSpeechError: If no segment contained recognizable speech.
+        TranscriptionError: If the recognizer failed.
+    """
+    backend = backend or get_backend()
+    samples, rate = decode_wav(data)
+    samples = resample(samples, rate)
+    segments = split_on_silence(samples)
+    if not segments:
+        raise NoSpeechError("The recording is silent.")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments)))) as executor:
+        texts = list(executor.map(lambda seg: backend.transcribe(samples[seg[0]:seg[1]]), segments))
+    text = " ".join(t for t in texts if t)
+    if not text:
+        raise NoSpeechError("No speech recognized.")
+    return text
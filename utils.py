@@ -1,27 +1,82 @@
 import streamlit as st
 import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from transformers import pipeline
-from state import Sinteraction_history
+from llm_cache import CachedLLM
+from state import get_interaction_history
 from dotenv import load_dotenv
+import resources
+import tracing
+from classifier_backends import load_classifier, SENTIMENT_MODEL, TONE_MODEL
+from model_server import MODEL_SERVER_ENABLED, RemoteClassifier
 
 load_dotenv(dotenv_path="config.env")
 
-@st.cache_resource
 def initialize_groq_model(api_key):
+    from langchain_groq import ChatGroq
+
     try:
-        return ChatGroq(model="llama3-8b-8192", api_key=api_key)
+        return CachedLLM(ChatGroq(model="llama3-8b-8192", api_key=api_key))
     except Exception as e:
         st.error(f"Error initializing Groq model: {e}")
         return None
 
 os.environ["HUGGINGFACE_API_KEY"] = os.getenv("HUGGINGFACE_API_KEY")
 
-llm = initialize_groq_model(api_key=os.environ["GROQ_API_KEY"])
-sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-tone_analyzer = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base")
 
+# Heavy resources load on first use (or in the background warm-up started by main.py)
+resources.register("llm", lambda: initialize_groq_model(api_key=os.environ["GROQ_API_KEY"]))
+if MODEL_SERVER_ENABLED:
+    # Served by the shared model worker (model_server.py) instead of a copy in every process
+    resources.register("sentiment_analyzer", lambda: RemoteClassifier("sentiment"))
+    resources.register("tone_analyzer", lambda: RemoteClassifier("tone"))
+else:
+    # Classifiers run on CLASSIFIER_BACKEND: fp32 torch, int8 torch or int8 ONNX (see classifier_backends.py)
+    resources.register("sentiment_analyzer", lambda: load_classifier(*SENTIMENT_MODEL))
+    resources.register("tone_analyzer", lambda: load_classifier(*TONE_MODEL))
+
+
+def get_llm():
+    """Return the shared (cached) Groq chat model, creating it on first use."""
+    return resources.get("llm")
+
+# Batch settings for the sentiment and tone classifiers
+CLASSIFIER_BATCH_SIZE = int(os.getenv("CLASSIFIER_BATCH_SIZE", "8"))
+CLASSIFIER_MAX_LENGTH = int(os.getenv("CLASSIFIER_MAX_LENGTH", "512"))
+
+
+def analyze_batch(texts, batch_size=None, max_length=None, tasks=("sentiment", "tone")):
+    """
+    Scores many utterances for sentiment (distilbert SST-2) and tone (distilroberta emotion).
+
+    Texts are sorted by length before batching so each padded batch holds inputs of similar
+    size, then results are returned in the original order.
+
+    Args:
+        texts (list[str]): The utterances to score.
+        batch_size (int): Number of texts per forward pass. Defaults to CLASSIFIER_BATCH_SIZE.
+        max_length (int): Token limit per text; longer inputs are truncated. Defaults to CLASSIFIER_MAX_LENGTH.
+        tasks (tuple): Which of "sentiment" and "tone" to compute.
+
+    Returns:
+        list[dict]: One dict per text with "sentiment"/"sentiment_score" and/or "tone"/"tone_score".
+    """
+    if not texts:
+        return []
+    batch_size = batch_size or CLASSIFIER_BATCH_SIZE
+    max_length = max_length or CLASSIFIER_MAX_LENGTH
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_texts = [str(texts[i]) for i in order]
+    call_kwargs = {"batch_size": batch_size, "truncation": True, "max_length": max_length}
+
+    results = [{} for _ in texts]
+    analyzers = {"sentiment": "sentiment_analyzer", "tone": "tone_analyzer"}
+    for task in tasks:
+        with tracing.span(f"model.{task}", kind="model", texts=len(texts)):
+            outputs = resources.get(analyzers[task])(sorted_texts, **call_kwargs)
+        for i, output in zip(order, outputs):
+            results[i][task] = output["label"]
+            results[i][f"{task}_score"] = output["score"]
+    return results
 
 
 # Analyze Sentiment and display in sidebar
@@ -31,11 +86,11 @@ def analyze_sentiment(text):
     """
     try:
         # Perform sentiment analysis
-        result = sentiment_analyzer(text)[0]
-        sentiment_label = result["label"]
+        result = analyze_batch([text], tasks=("sentiment",))[0]
+        sentiment_label = result["sentiment"]
         
         # Update the interaction history and plot in the sidebar
-        Sinteraction_history.loc[len(Sinteraction_history)] = {"Step": len(Sinteraction_history) + 1, "Sentiment": sentiment_label}
+        get_interaction_history().record(text, sentiment=sentiment_label)
         # Log and return sentiment
         print(f"Sentiment Analysis Result: {result}")
         return sentiment_label
@@ -51,11 +106,11 @@ def analyze_tone(text):
     """
     try:
         # Perform tone analysis
-        result = tone_analyzer(text)[0]
-        tone_label = result["label"]
+        result = analyze_batch([text], tasks=("tone",))[0]
+        tone_label = result["tone"]
         
         # Update the interaction history and plot in the sidebar
-        Sinteraction_history.loc[len(Sinteraction_history)] = {"Step": len(Sinteraction_history) + 1, "Tone": tone_label}
+        get_interaction_history().record(text, tone=tone_label)
         
         # Log and return tone
         print(f"Tone Analysis Result: {result}")